@@ -0,0 +1,174 @@
+import random
+from typing import List, Optional, Tuple
+import numpy as np
+from models import Persona
+from database import SessionLocal, PersonaModel
+from profiles import industry_of, load_rows_by_ids, row_to_persona
+from llm_service import EmbeddingService
+from config import logger
+
+# Prompt-relevant persona fields, from finest to coarsest grouping.
+# Names and company names differ between personas but do not drive decisions.
+GROUPING_LEVELS = [
+    ("role", "industry", "psychographics", "past_behavior"),
+    ("role", "industry", "psychographics"),
+    ("role", "industry"),
+    ("role",)
+]
+
+class PersonaCluster:
+    def __init__(self, key: str, member_ids: List[str]):
+        self.key = key
+        self.member_ids = member_ids
+
+    @property
+    def size(self) -> int:
+        return len(self.member_ids)
+
+# Position of each grouping field in a group's values
+_FIELD_INDEX = {"role": 0, "industry": 1, "psychographics": 2, "past_behavior": 3}
+
+def _load_groups(audience_id: Optional[int]) -> Tuple[dict, int]:
+    """
+    Streams the audience and groups persona ids by their finest grouping values,
+    so only ids and distinct values are held in memory, not every persona's text.
+    Returns {(role, industry, psychographics, past_behavior): [ids]} and the audience size.
+    """
+    db = SessionLocal()
+    try:
+        query = db.query(
+            PersonaModel.id, PersonaModel.role, PersonaModel.company,
+            PersonaModel.psychographics, PersonaModel.past_behavior
+        ).order_by(PersonaModel.id)
+        if audience_id is not None:
+            query = query.filter(PersonaModel.audience_id == audience_id)
+        groups = {}
+        industries = {}
+        total = 0
+        for row in query.yield_per(5000):
+            if row.company not in industries:
+                industries[row.company] = industry_of(row.company)
+            values = (row.role, industries[row.company], row.psychographics, row.past_behavior)
+            groups.setdefault(values, []).append(row.id)
+            total += 1
+    finally:
+        db.close()
+    return groups, total
+
+def _group(groups: dict, fields) -> dict:
+    """Merges the finest groups into groups keyed by `fields` only"""
+    merged = {}
+    for values, ids in groups.items():
+        key = " | ".join(str(values[_FIELD_INDEX[f]]) for f in fields)
+        merged.setdefault(key, []).extend(ids)
+    return merged
+
+def _squared_distances(vectors: np.ndarray, centers: np.ndarray, vector_norms: np.ndarray) -> np.ndarray:
+    """||x - c||^2 for every vector and center as ||x||^2 - 2x.c + ||c||^2, without an n x k x dim array"""
+    distances = vector_norms[:, None] - 2 * (vectors @ centers.T) + (centers ** 2).sum(axis=1)[None, :]
+    return np.maximum(distances, 0.0)
+
+def _weighted_kmeans(vectors: np.ndarray, weights: np.ndarray, k: int, rng: random.Random,
+                     iterations: int = 25) -> np.ndarray:
+    """Weighted k-means (k-means++ seeding) on normalized vectors. Returns a label per vector."""
+    np_rng = np.random.default_rng(rng.randrange(2 ** 32))
+    n = len(vectors)
+    vector_norms = (vectors ** 2).sum(axis=1)
+    centers = vectors[[np_rng.choice(n, p=weights / weights.sum())]]
+    distances = _squared_distances(vectors, centers, vector_norms)[:, 0]
+    for _ in range(1, k):
+        scores = distances * weights
+        if scores.sum() <= 0:
+            break
+        center = vectors[[np_rng.choice(n, p=scores / scores.sum())]]
+        centers = np.vstack([centers, center])
+        distances = np.minimum(distances, _squared_distances(vectors, center, vector_norms)[:, 0])
+    centers = centers.astype(np.float64)
+
+    labels = None
+    for _ in range(iterations):
+        new_labels = _squared_distances(vectors, centers, vector_norms).argmin(axis=1)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for c in range(len(centers)):
+            mask = labels == c
+            if mask.any():
+                centers[c] = np.average(vectors[mask], axis=0, weights=weights[mask])
+    return labels
+
+def _cluster_groups(groups: dict, max_clusters: int, embedding_service: Optional[EmbeddingService],
+                    seed: int) -> List[PersonaCluster]:
+    finest = _group(groups, GROUPING_LEVELS[0])
+    if len(finest) > max_clusters and embedding_service is not None and not embedding_service.use_fallback:
+        keys = sorted(finest)
+        vectors = embedding_service.encode(keys)
+        weights = np.array([len(finest[k]) for k in keys], dtype=np.float64)
+        labels = _weighted_kmeans(vectors, weights, max_clusters, random.Random(seed))
+        merged = {}
+        for key, label in zip(keys, labels):
+            merged.setdefault(int(label), []).append(key)
+        clusters = [
+            PersonaCluster(" / ".join(member_keys[:3]), [pid for k in member_keys for pid in finest[k]])
+            for member_keys in merged.values()
+        ]
+    else:
+        grouped = finest
+        for fields in GROUPING_LEVELS[1:]:
+            if len(grouped) <= max_clusters:
+                break
+            grouped = _group(groups, fields)
+        clusters = [PersonaCluster(k, v) for k, v in grouped.items()]
+        if len(clusters) > max_clusters:
+            # Keep the largest clusters and pool the long tail into one
+            clusters.sort(key=lambda c: c.size, reverse=True)
+            tail = clusters[max_clusters - 1:]
+            clusters = clusters[:max_clusters - 1] + [
+                PersonaCluster("other", [pid for c in tail for pid in c.member_ids])
+            ]
+    clusters.sort(key=lambda c: c.key)
+    return clusters
+
+def cluster_audience(audience_id: Optional[int], max_clusters: int,
+                     embedding_service: Optional[EmbeddingService] = None,
+                     seed: int = 0) -> Tuple[List[PersonaCluster], int]:
+    """
+    Groups an audience into at most `max_clusters` clusters of near-identical personas.
+    Personas are grouped by their prompt-relevant fields. If there are still too many
+    groups, they are merged with size-weighted k-means on their embeddings, or by
+    coarser grouping when embeddings are unavailable.
+    Returns the clusters and the audience size.
+    """
+    if max_clusters < 1:
+        raise ValueError("max_clusters must be at least 1")
+    groups, total = _load_groups(audience_id)
+    clusters = _cluster_groups(groups, max_clusters, embedding_service, seed)
+    logger.info(f"Clustered {total} personas into {len(clusters)} clusters")
+    return clusters, total
+
+def _representative_weights(clusters: List[PersonaCluster], per_cluster: int,
+                            rng: random.Random) -> List[Tuple[str, float]]:
+    """(persona id, weight) pairs; the weights of a cluster's picks add up to its size"""
+    if per_cluster < 1:
+        raise ValueError("per_cluster must be at least 1")
+    chosen = []
+    for cluster in clusters:
+        picks = rng.sample(cluster.member_ids, min(per_cluster, cluster.size))
+        chosen.extend((pid, cluster.size / len(picks)) for pid in picks)
+    return chosen
+
+def pick_representatives(clusters: List[PersonaCluster], per_cluster: int,
+                         seed: int = 0) -> List[Tuple[Persona, float]]:
+    """
+    Picks up to `per_cluster` random members of each cluster.
+    Each representative is weighted by the number of personas it stands for.
+    """
+    chosen = _representative_weights(clusters, per_cluster, random.Random(seed))
+
+    db = SessionLocal()
+    try:
+        rows = load_rows_by_ids(db, [pid for pid, _ in chosen])
+    finally:
+        db.close()
+    weights = dict(chosen)
+    return [(row_to_persona(r), weights[r.id]) for r in rows]
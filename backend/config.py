@@ -14,6 +14,76 @@ LLM_BASE_URL = os.getenv("LLM_BASE_URL", "http://127.0.0.1:1234/v1")
 LLM_API_KEY = os.getenv("LLM_API_KEY", "lm-studio")
 LLM_TIMEOUT = int(os.getenv("LLM_TIMEOUT", "30"))
 LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))  # Cap in seconds of the jittered retry backoff
+# Stream completions and stop reading once a complete JSON object has arrived
+LLM_STREAMING = os.getenv("LLM_STREAMING", "false").lower() == "true"
+
+# HTTP connections to the LLM servers
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100"))  # Open connections, all servers together
+LLM_HTTP_MAX_KEEPALIVE = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "50"))  # Idle connections kept open for reuse
+LLM_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "60"))  # Seconds an idle connection is kept
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "false").lower() == "true"  # Needs the h2 package
+LLM_HTTP_SHARED = os.getenv("LLM_HTTP_SHARED", "true").lower() == "true"  # One connection pool for every LLM client
+
+# Several LLM servers as comma-separated "url|weight" entries (weight defaults to 1).
+# When set, requests are balanced over them and LLM_BASE_URL is not used.
+LLM_BASE_URLS = [u.strip() for u in os.getenv("LLM_BASE_URLS", "").split(",") if u.strip()]
+LLM_CIRCUIT_FAILURES = int(os.getenv("LLM_CIRCUIT_FAILURES", "5"))  # Consecutive failures that take a server out
+LLM_CIRCUIT_RESET = float(os.getenv("LLM_CIRCUIT_RESET", "30"))  # Seconds before a failed server is probed again
+
+# Process-wide LLM scheduler: limits shared by every simulation in the process
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "16"))  # Requests on the wire at once, per LLM server
+LLM_RATE_LIMIT = os.getenv("LLM_RATE_LIMIT", "")  # Requests per period, e.g. "100/minute"; empty = unlimited
+LLM_TOKEN_RATE_LIMIT = os.getenv("LLM_TOKEN_RATE_LIMIT", "")  # Estimated prompt tokens per period; empty = unlimited
+
+# Simulation Configuration
+SIMULATION_CONCURRENCY = int(os.getenv("SIMULATION_CONCURRENCY", "8"))  # Personas in flight per run
+MAX_BATCH_VARIANTS = int(os.getenv("MAX_BATCH_VARIANTS", "10"))  # Drafts per /api/simulate/batch
+
+# Pre-screening (EmailDraft.prescreen): personas whose subject relevance score is
+# below the low threshold are marked "ignored" without an LLM call; personas above
+# the high threshold reach the LLM only if prescreen_high_to_llm is set. The defaults
+# fit embedding similarity; with the keyword fallback only thresholds set on the draft apply.
+PRESCREEN_LOW_THRESHOLD = float(os.getenv("PRESCREEN_LOW_THRESHOLD", "0.2"))
+PRESCREEN_HIGH_THRESHOLD = float(os.getenv("PRESCREEN_HIGH_THRESHOLD", "0.6"))
+
+# Adaptive sample size (EmailDraft.adaptive)
+ADAPTIVE_BATCH_SIZE = int(os.getenv("ADAPTIVE_BATCH_SIZE", "16"))  # Personas added per round
+ADAPTIVE_MAX_SAMPLE_SIZE = int(os.getenv("ADAPTIVE_MAX_SAMPLE_SIZE", "200"))  # Budget cap
+
+# Embeddings
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+# LLM Response Cache. Off by default: a cached prompt replays one sampled answer,
+# so repeated runs at a non-zero temperature would no longer average independent samples.
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "false").lower() == "true"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))  # In-memory LRU size
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "86400"))  # Seconds, 0 = never expire
+LLM_CACHE_DB_PATH = os.getenv("LLM_CACHE_DB_PATH", "")  # SQLite file for the disk tier, empty = disabled
+LLM_CACHE_DISK_MAX_ENTRIES = int(os.getenv("LLM_CACHE_DISK_MAX_ENTRIES", "100000"))
+
+# Result persistence (background writer)
+PERSIST_QUEUE_SIZE = int(os.getenv("PERSIST_QUEUE_SIZE", "10000"))  # Pending writes before producers wait
+PERSIST_BATCH_SIZE = int(os.getenv("PERSIST_BATCH_SIZE", "500"))  # Writes applied per transaction
+# Only one server process uses the database: runs left 'running' at startup were
+# interrupted. Turn off when several workers or hosts share it.
+SINGLE_INSTANCE = os.getenv("SINGLE_INSTANCE", "true").lower() == "true"
+
+# Idempotent submissions (Idempotency-Key header)
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "3600"))  # Seconds a finished run stays attachable in memory
+IDEMPOTENCY_MAX_RUNS = int(os.getenv("IDEMPOTENCY_MAX_RUNS", "1000"))  # Finished runs kept in memory
+IDEMPOTENCY_DETACH_GRACE = float(os.getenv("IDEMPOTENCY_DETACH_GRACE", "30"))  # Seconds a run without clients waits for a retry before it is cancelled
+
+# Client disconnects are checked this often while a stream has nothing to send
+DISCONNECT_POLL_INTERVAL = float(os.getenv("DISCONNECT_POLL_INTERVAL", "0.5"))
+
+# Background simulation jobs (/api/jobs)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))  # Jobs running at the same time
+JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", "1000"))  # Submissions beyond this are rejected with 429
+# Running jobs are heartbeated this often (seconds); a job whose heartbeat is three intervals
+# old belonged to a process that died and goes back to the queue
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "10"))
+JOB_EVENT_RETENTION_HOURS = float(os.getenv("JOB_EVENT_RETENTION_HOURS", "168"))  # Events of finished jobs are deleted after this, 0 = kept
 
 # Email Validation
 MAX_SUBJECT_LENGTH = 200
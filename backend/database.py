@@ -1,7 +1,9 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, ForeignKey, Float, JSON
+from sqlalchemy import create_engine, event, inspect, text, Index, Column, Integer, String, Text, ForeignKey, Float, JSON, LargeBinary
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship
 import json
+import logging
 import time
+import zlib
 
 Base = declarative_base()
 
@@ -12,6 +14,7 @@ class AudienceModel(Base):
     name = Column(String)
     type = Column(String) # B2B, B2C, etc.
     description = Column(String)
+    revision = Column(Integer, default=0) # Bumped whenever personas are written, so cached panels reload
     
     personas = relationship("PersonaModel", back_populates="audience")
 
@@ -28,6 +31,9 @@ class PersonaModel(Base):
     past_behavior = Column(Text)
     
     audience = relationship("AudienceModel", back_populates="personas")
+
+    # Serves audience filters and keyset pagination by id within an audience
+    __table_args__ = (Index('ix_personas_audience_id_id', 'audience_id', 'id'),)
     
     def to_dict(self):
         return {
@@ -40,6 +46,26 @@ class PersonaModel(Base):
             "pastBehavior": self.past_behavior
         }
 
+class PersonaEmbeddingModel(Base):
+    __tablename__ = 'persona_embeddings'
+    
+    persona_id = Column(String, ForeignKey('personas.id'), primary_key=True)
+    model_name = Column(String)
+    content_hash = Column(String) # Hash of the persona context the vector was computed from
+    dim = Column(Integer)
+    vector = Column(LargeBinary) # float32, L2-normalized
+
+class PanelModel(Base):
+    __tablename__ = 'panels'
+    
+    id = Column(String, primary_key=True) # Derived from the panel parameters
+    audience_id = Column(Integer, ForeignKey('audiences.id'))
+    size = Column(Integer)
+    seed = Column(Integer)
+    stratify_by = Column(String) # role, industry, psychographic or None
+    persona_ids = Column(JSON) # Ordered list of persona ids
+    created_at = Column(Integer)
+
 class SimulationModel(Base):
     __tablename__ = 'simulations'
     
@@ -53,36 +79,136 @@ class SimulationModel(Base):
     # Metrics stored as JSON
     metrics = Column(JSON)
     insights = Column(JSON)
+
+    # 'running' while responses are written incrementally, then 'completed',
+    # 'failed' or 'cancelled'; 'interrupted' if the server stopped mid-run
+    status = Column(String, default='completed')
+    error = Column(Text)
+    idempotency_key = Column(String, index=True) # Idempotency-Key of the request that started the run
+    request_fingerprint = Column(String) # runs.fingerprint of that request, to detect a reused key
+    owner = Column(String) # persistence.PROCESS_ID of the server process that ran it
     
     responses = relationship("ResponseModel", back_populates="simulation")
 
+    # History is listed newest first, keyset-paginated on (timestamp, id)
+    __table_args__ = (
+        Index('ix_simulations_timestamp_id', 'timestamp', 'id'),
+        Index('ix_simulations_audience_target_timestamp_id', 'audience_target', 'timestamp', 'id'),
+    )
+
 class ResponseModel(Base):
     __tablename__ = 'responses'
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    simulation_id = Column(String, ForeignKey('simulations.id'))
+    simulation_id = Column(String, ForeignKey('simulations.id'), index=True)
     persona_id = Column(String, ForeignKey('personas.id'))
     
     action = Column(String)
     sentiment = Column(String)
     comment = Column(Text)
     detailed_reasoning = Column(Text)
+    decision_source = Column(String, default='llm') # 'llm' or 'prescreen'
+    weight = Column(Float, default=1.0) # Personas represented (clustered mode)
     
     simulation = relationship("SimulationModel", back_populates="responses")
     persona = relationship("PersonaModel")
 
+class JobModel(Base):
+    __tablename__ = 'jobs'
+
+    id = Column(String, primary_key=True) # ULID, so ordering by id is submission order
+    kind = Column(String) # 'simulate' or 'batch'
+    payload = Column(JSON) # EmailDraft or VariantBatch
+    priority = Column(Integer, default=0) # Higher runs first
+    status = Column(String, default='queued') # queued, running, completed, failed, cancelled
+    simulation_ids = Column(JSON) # Results stored in simulations
+    error = Column(Text)
+    created_at = Column(Float)
+    started_at = Column(Float)
+    finished_at = Column(Float)
+    owner = Column(String) # Id of the JobQueue (process) running the job
+    heartbeat_at = Column(Float) # Refreshed by the owner while the job runs
+
+    # Workers claim the highest priority, oldest queued job
+    __table_args__ = (Index('ix_jobs_status_priority_id', 'status', 'priority', 'id'),)
+
+class JobEventModel(Base):
+    __tablename__ = 'job_events'
+
+    job_id = Column(String, ForeignKey('jobs.id'), primary_key=True)
+    seq = Column(Integer, primary_key=True) # Offset within the job's event stream
+    event = Column(JSON)
+
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# config.logger's logger; not imported from config so the module also loads as backend.database
+logger = logging.getLogger("email_ai_predictor")
+
 # Database Setup
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./email_predictor.db")
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def _crc32(value):
+    return zlib.crc32(value.encode("utf-8")) if value is not None else None
+
+def register_sqlite_functions(sqlite_engine) -> None:
+    """Adds crc32(text), a hash that is stable across processes, to every connection of the engine"""
+    @event.listens_for(sqlite_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        dbapi_connection.create_function("crc32", 1, _crc32, deterministic=True)
+
+if engine.dialect.name == "sqlite":
+    register_sqlite_functions(engine)
+
 def init_db():
     Base.metadata.create_all(bind=engine)
+    _migrate()
+
+# Indexes removed from the models; _migrate drops them from existing databases
+_OBSOLETE_INDEXES = {
+    'personas': ['ix_personas_audience_id']  # Superseded by ix_personas_audience_id_id
+}
+
+def _migrate():
+    """
+    Brings existing databases up to date with the models.
+    create_all() only creates missing tables, so columns added to existing
+    tables later are added here with ALTER TABLE, missing indexes are created and
+    obsolete ones dropped.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+                default = column.default.arg if column.default is not None and column.default.is_scalar else None
+                if isinstance(default, str):
+                    ddl += f" DEFAULT '{default}'"
+                elif default is not None:
+                    ddl += f" DEFAULT {default}"
+                conn.execute(text(ddl))
+                logger.info(f"Migrated: added column {table.name}.{column.name}")
+
+            existing_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(bind=conn)
+                    logger.info(f"Migrated: created index {index.name}")
+            for name in _OBSOLETE_INDEXES.get(table.name, []):
+                if name in existing_indexes:
+                    conn.execute(text(f"DROP INDEX {name}"))
+                    logger.info(f"Migrated: dropped index {name}")
 
 def get_db():
     db = SessionLocal()
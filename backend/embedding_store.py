@@ -0,0 +1,143 @@
+import hashlib
+import sys
+from typing import List, Optional
+from models import Persona
+from database import SessionLocal, PersonaModel, PersonaEmbeddingModel, init_db
+from profiles import PERSONA_COLUMNS, _IN_CHUNK_SIZE, row_to_persona
+from llm_service import EmbeddingService
+from config import logger
+
+def persona_context(persona: Persona) -> str:
+    """Text used to match a persona against an email subject"""
+    return f"{persona.role} {persona.company} {persona.psychographics} {persona.pastBehavior}"
+
+def _content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class PersonaEmbeddingStore:
+    """
+    Persisted persona context embeddings.
+    Each persona is encoded once per content version (tracked by a content hash)
+    and stored in the persona_embeddings table next to PersonaModel.
+    """
+    def __init__(self, embedding_service: EmbeddingService):
+        self.embedding_service = embedding_service
+
+    @property
+    def available(self) -> bool:
+        return not self.embedding_service.use_fallback
+
+    def matrix_for(self, personas: List[Persona]):
+        """
+        Returns a contiguous (len(personas), dim) float32 matrix of normalized
+        embeddings in persona order, or None if the embedding model is unavailable.
+        Missing or stale embeddings are computed in one batch and persisted.
+        """
+        import numpy as np
+
+        if not self.available or not personas:
+            return None
+
+        model_name = self.embedding_service.model_name
+        hashes = [_content_hash(persona_context(p)) for p in personas]
+        ids = [p.id for p in personas]
+        vectors = {}
+
+        db = SessionLocal()
+        try:
+            stored = {}
+            # Chunked IN lists stay under SQLite's bound-parameter limit
+            for start in range(0, len(ids), _IN_CHUNK_SIZE):
+                rows = db.query(
+                    PersonaEmbeddingModel.persona_id,
+                    PersonaEmbeddingModel.content_hash,
+                    PersonaEmbeddingModel.vector
+                ).filter(
+                    PersonaEmbeddingModel.persona_id.in_(ids[start:start + _IN_CHUNK_SIZE]),
+                    PersonaEmbeddingModel.model_name == model_name
+                ).all()
+                stored.update((row.persona_id, row) for row in rows)
+
+            for i, (pid, content_hash) in enumerate(zip(ids, hashes)):
+                row = stored.get(pid)
+                if row is not None and row.content_hash == content_hash:
+                    vectors[i] = np.frombuffer(row.vector, dtype=np.float32)
+
+            missing = [i for i in range(len(personas)) if i not in vectors]
+            if missing:
+                encoded = self.embedding_service.encode([persona_context(personas[i]) for i in missing])
+                for i, vec in zip(missing, encoded):
+                    vectors[i] = vec
+                self._persist(db, [personas[i] for i in missing], [hashes[i] for i in missing], encoded)
+                logger.info(f"Encoded {len(missing)} persona embeddings ({len(personas) - len(missing)} loaded from store)")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Persona embedding store failed: {e}")
+            return None
+        finally:
+            db.close()
+
+        return np.ascontiguousarray(np.stack([vectors[i] for i in range(len(personas))]), dtype=np.float32)
+
+    def _persist(self, db, personas: List[Persona], hashes: List[str], encoded) -> None:
+        # Only store vectors for personas that exist in the DB with the same content,
+        # so randomly generated fallback personas never overwrite real entries.
+        ids = [p.id for p in personas]
+        db_hashes = {}
+        for start in range(0, len(ids), _IN_CHUNK_SIZE):
+            db_rows = db.query(
+                PersonaModel.id, PersonaModel.role, PersonaModel.company,
+                PersonaModel.psychographics, PersonaModel.past_behavior
+            ).filter(PersonaModel.id.in_(ids[start:start + _IN_CHUNK_SIZE])).all()
+            db_hashes.update(
+                (r.id, _content_hash(f"{r.role} {r.company} {r.psychographics} {r.past_behavior}"))
+                for r in db_rows
+            )
+
+        model_name = self.embedding_service.model_name
+        for persona, content_hash, vec in zip(personas, hashes, encoded):
+            if db_hashes.get(persona.id) != content_hash:
+                continue
+            db.merge(PersonaEmbeddingModel(
+                persona_id=persona.id,
+                model_name=model_name,
+                content_hash=content_hash,
+                dim=int(vec.shape[0]),
+                vector=vec.tobytes()
+            ))
+        db.commit()
+
+    def index_audience(self, audience_id: Optional[int] = None, chunk_size: int = 1000) -> int:
+        """Precomputes embeddings for all personas (optionally of one audience). Returns the persona count."""
+        if not self.available:
+            logger.warning("Embedding model unavailable, nothing to index")
+            return 0
+
+        # Keyset pages: the whole audience is never in memory, and no read is
+        # left open while matrix_for writes (SQLite would block the commit)
+        count = 0
+        last_id = None
+        while True:
+            db = SessionLocal()
+            try:
+                query = db.query(*PERSONA_COLUMNS).order_by(PersonaModel.id)
+                if audience_id is not None:
+                    query = query.filter(PersonaModel.audience_id == audience_id)
+                if last_id is not None:
+                    query = query.filter(PersonaModel.id > last_id)
+                personas = [row_to_persona(r) for r in query.limit(chunk_size).all()]
+            finally:
+                db.close()
+            if not personas:
+                break
+            self.matrix_for(personas)
+            count += len(personas)
+            last_id = personas[-1].id
+        logger.info(f"Indexed embeddings for {count} personas")
+        return count
+
+if __name__ == "__main__":
+    # Usage: python embedding_store.py [audience_id]
+    init_db()
+    audience = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    PersonaEmbeddingStore(EmbeddingService()).index_audience(audience)
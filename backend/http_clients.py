@@ -0,0 +1,149 @@
+import threading
+import time
+from config import (
+    LLM_HTTP_MAX_CONNECTIONS, LLM_HTTP_MAX_KEEPALIVE, LLM_HTTP_KEEPALIVE_EXPIRY, LLM_HTTP2, LLM_HTTP_SHARED, logger
+)
+
+# httpx and openai are imported when the first client is built: llm_pool and
+# main import this module at startup, and openai alone takes about half a second
+
+class ConnectionStats:
+    """
+    Requests sent and connections opened by the LLM HTTP clients. Connections
+    are counted through httpcore's trace extension, so requests minus
+    connections is the number of requests that reused a kept-alive connection.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.connect_seconds = 0.0  # TCP connect and TLS handshake time
+
+    def _record(self, requests: int = 0, connections: int = 0, seconds: float = 0.0) -> None:
+        with self._lock:
+            self.requests += requests
+            self.connections += connections
+            self.connect_seconds += seconds
+
+    def _on_trace_event(self, started: dict, name: str) -> None:
+        step, _, phase = name.rpartition(".")
+        if step not in ("connection.connect_tcp", "connection.start_tls"):
+            return
+        if phase == "started":
+            started[step] = time.perf_counter()
+        elif phase == "complete" and step in started:
+            self._record(
+                connections=1 if step == "connection.connect_tcp" else 0,
+                seconds=time.perf_counter() - started.pop(step)
+            )
+
+    def on_request(self, request: "httpx.Request") -> None:
+        self._record(requests=1)
+        started = {}
+        request.extensions["trace"] = lambda name, info: self._on_trace_event(started, name)
+
+    async def on_async_request(self, request: "httpx.Request") -> None:
+        self._record(requests=1)
+        started = {}
+
+        async def trace(name, info):
+            self._on_trace_event(started, name)
+
+        request.extensions["trace"] = trace
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            reused = max(0, self.requests - self.connections)
+            return {
+                "requests": self.requests,
+                "connectionsOpened": self.connections,
+                "reusedRequests": reused,
+                "reuseRatio": round(reused / self.requests, 3) if self.requests else None,
+                "avgConnectMs": round(self.connect_seconds / self.connections * 1000, 1) if self.connections else None
+            }
+
+connection_stats = ConnectionStats()
+
+def _limits() -> "httpx.Limits":
+    import httpx
+
+    return httpx.Limits(
+        max_connections=LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=LLM_HTTP_KEEPALIVE_EXPIRY
+    )
+
+def _http2() -> bool:
+    if not LLM_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        logger.warning("LLM_HTTP2 is set but the h2 package is not installed, using HTTP/1.1")
+        return False
+
+def new_http_client() -> "httpx.Client":
+    """An HTTP client for OpenAI clients with the configured pool limits and keep-alive"""
+    import openai
+
+    return openai.DefaultHttpxClient(
+        limits=_limits(),
+        http2=_http2(),
+        event_hooks={"request": [connection_stats.on_request]}
+    )
+
+def new_async_http_client() -> "httpx.AsyncClient":
+    import openai
+
+    return openai.DefaultAsyncHttpxClient(
+        limits=_limits(),
+        http2=_http2(),
+        event_hooks={"request": [connection_stats.on_async_request]}
+    )
+
+_client = None
+_async_client = None
+_lock = threading.Lock()
+
+def get_http_client() -> "httpx.Client":
+    """
+    The process-wide client, so every LLM client and Simulator draws on one
+    pool of kept-alive connections. A new client if LLM_HTTP_SHARED is off.
+    """
+    global _client
+    if not LLM_HTTP_SHARED:
+        return new_http_client()
+    with _lock:
+        if _client is None:
+            _client = new_http_client()
+        return _client
+
+def get_async_http_client() -> "httpx.AsyncClient":
+    """Async counterpart of get_http_client, for clients used on the application's event loop"""
+    global _async_client
+    if not LLM_HTTP_SHARED:
+        return new_async_http_client()
+    with _lock:
+        if _async_client is None:
+            _async_client = new_async_http_client()
+        return _async_client
+
+async def close_http_clients() -> None:
+    global _client, _async_client
+    with _lock:
+        client, async_client = _client, _async_client
+        _client = _async_client = None
+    if client is not None:
+        client.close()
+    if async_client is not None:
+        await async_client.aclose()
+
+def http_stats() -> dict:
+    return {
+        "shared": LLM_HTTP_SHARED,
+        "http2": LLM_HTTP2,
+        "maxConnections": LLM_HTTP_MAX_CONNECTIONS,
+        "maxKeepalive": LLM_HTTP_MAX_KEEPALIVE,
+        **connection_stats.to_dict()
+    }
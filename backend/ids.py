@@ -0,0 +1,38 @@
+import os
+import threading
+import time
+
+# Crockford base32, as used by ULID
+_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+_lock = threading.Lock()
+_last_ms = -1
+_last_random = 0
+
+def _encode(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        value, index = divmod(value, 32)
+        chars.append(_ALPHABET[index])
+    return "".join(reversed(chars))
+
+def new_id() -> str:
+    """
+    ULID: 48-bit millisecond timestamp followed by 80 random bits, as 26
+    base32 characters. Ids sort by creation time; ids created in the same
+    millisecond increment the random part, so they stay unique and ordered.
+    """
+    global _last_ms, _last_random
+    with _lock:
+        now_ms = int(time.time() * 1000)
+        if now_ms <= _last_ms:
+            now_ms = _last_ms
+            _last_random += 1
+            if _last_random >= 1 << 80:
+                # Random part exhausted within one millisecond: borrow the next one
+                now_ms += 1
+                _last_random = int.from_bytes(os.urandom(10), "big")
+        else:
+            _last_random = int.from_bytes(os.urandom(10), "big")
+        _last_ms = now_ms
+        return _encode(now_ms, 10) + _encode(_last_random, 16)
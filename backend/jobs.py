@@ -0,0 +1,392 @@
+import asyncio
+import threading
+import time
+from typing import Callable, Optional
+from sqlalchemy import delete, func, select, update
+from ids import new_id
+from database import engine as default_engine, JobModel, JobEventModel
+from config import JOB_WORKERS, JOB_MAX_QUEUED, JOB_HEARTBEAT_INTERVAL, JOB_EVENT_RETENTION_HOURS, logger
+
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+# Queued jobs looked at per claim; another process may take some of them first
+_CLAIM_CANDIDATES = 8
+
+class QueueFullError(Exception):
+    """Too many jobs are waiting"""
+
+def _stored_event(event: dict) -> dict:
+    """
+    The event as kept in job_events. Results leave out their responses: those
+    are already in the progress events and in the stored simulation.
+    """
+    if event["type"] in ("result", "variant_result") and "responses" in event.get("data", {}):
+        data = {k: v for k, v in event["data"].items() if k != "responses"}
+        return {**event, "data": data, "responsesOmitted": True}
+    return event
+
+class _ActiveJob:
+    def __init__(self, next_seq: int):
+        self.next_seq = next_seq
+        self.task = None
+        self.cancel_requested = False
+        self.pending = []  # (seq, event) not stored yet
+        self.flusher = None  # Task storing the pending events
+
+class JobQueue:
+    """
+    Simulation jobs in a SQLite-backed queue, run by a bounded pool of worker tasks.
+    `run(kind, payload)` returns the async event stream of one job. Every event is
+    stored in job_events with a sequence number, so a client can attach to a job's
+    stream from any offset, during the run or after it.
+    Several processes may share the queue: each claims jobs under its own id and
+    heartbeats them, and only jobs whose heartbeat went stale are requeued.
+    """
+    def __init__(self, run: Callable, engine=None, workers: int = None, max_queued: int = None,
+                 poll_interval: float = 1.0, heartbeat_interval: float = None, event_retention: float = None):
+        self.run = run
+        self.engine = engine if engine is not None else default_engine
+        self.workers = workers if workers is not None else JOB_WORKERS
+        self.max_queued = max_queued if max_queued is not None else JOB_MAX_QUEUED
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval if heartbeat_interval is not None else JOB_HEARTBEAT_INTERVAL
+        # Seconds the events of a finished job are kept, 0 = forever
+        self.event_retention = event_retention if event_retention is not None else JOB_EVENT_RETENTION_HOURS * 3600
+        self.owner = new_id()
+        self._active = {}
+        self._worker_tasks = []
+        self._maintenance_task = None
+        self._claim_lock = threading.Lock()
+        self._wakeup = None
+        self._changed = None
+
+    # --- Lifecycle ---
+
+    async def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._changed = asyncio.Condition()
+        await asyncio.to_thread(self._maintain)
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._maintenance_task = asyncio.create_task(self._maintenance())
+
+    async def stop(self) -> None:
+        """Stops the workers. Running jobs go back to the queue and restart on the next start()."""
+        tasks = self._worker_tasks + ([self._maintenance_task] if self._maintenance_task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._maintenance_task = None
+
+    # --- API ---
+
+    async def submit(self, kind: str, payload: dict, priority: int = 0) -> dict:
+        job = await asyncio.to_thread(self._insert, kind, payload, priority)
+        self._wakeup.set()
+        return job
+
+    async def cancel(self, job_id: str) -> Optional[str]:
+        """Cancels a queued or running job. Returns the job's status, or None if it does not exist."""
+        active = self._active.get(job_id)
+        if active is not None:
+            active.cancel_requested = True
+            active.task.cancel()
+            try:
+                await asyncio.shield(active.task)
+            except BaseException:
+                pass
+        else:
+            await asyncio.to_thread(self._cancel_queued, job_id)
+            await self._notify()
+        job = await asyncio.to_thread(self.get, job_id)
+        return job["status"] if job else None
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self.engine.connect() as conn:
+            row = conn.execute(JobModel.__table__.select().where(JobModel.__table__.c.id == job_id)).first()
+            if row is None:
+                return None
+            events = conn.execute(
+                select(func.count()).select_from(JobEventModel.__table__)
+                .where(JobEventModel.__table__.c.job_id == job_id)
+            ).scalar()
+            position = None
+            if row.status == "queued":
+                jobs = JobModel.__table__.c
+                # Jobs that will be claimed before this one
+                position = conn.execute(
+                    select(func.count()).select_from(JobModel.__table__).where(
+                        jobs.status == "queued",
+                        (jobs.priority > row.priority) | ((jobs.priority == row.priority) & (jobs.id < row.id))
+                    )
+                ).scalar()
+        return {
+            "id": row.id,
+            "kind": row.kind,
+            "status": row.status,
+            "priority": row.priority,
+            "queuePosition": position,
+            "simulationIds": row.simulation_ids or [],
+            "error": row.error,
+            "events": events,
+            "createdAt": row.created_at,
+            "startedAt": row.started_at,
+            "finishedAt": row.finished_at
+        }
+
+    async def events(self, job_id: str, offset: int = 0):
+        """Yields (seq, event) from `offset` on, following the job until it finishes"""
+        while True:
+            status = await asyncio.to_thread(self._status, job_id)
+            if status is None:
+                return
+            rows = await asyncio.to_thread(self._load_events, job_id, offset)
+            for seq, event in rows:
+                offset = seq + 1
+                yield seq, event
+            if rows:
+                continue
+            if status in TERMINAL_STATUSES:
+                return
+            async with self._changed:
+                try:
+                    await asyncio.wait_for(self._changed.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def stats(self) -> dict:
+        with self.engine.connect() as conn:
+            counts = dict(conn.execute(
+                select(JobModel.__table__.c.status, func.count()).group_by(JobModel.__table__.c.status)
+            ).all())
+        return {"workers": self.workers, "running": len(self._active), "byStatus": counts}
+
+    # --- Workers ---
+
+    async def _worker(self) -> None:
+        while True:
+            job = await asyncio.to_thread(self._claim_next)
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            active = _ActiveJob(job["next_seq"])
+            active.task = asyncio.create_task(self._execute(job, active))
+            self._active[job["id"]] = active
+            try:
+                await asyncio.shield(active.task)
+            except asyncio.CancelledError:
+                if active.task.done():
+                    continue  # The job was cancelled, not this worker
+                # Worker shutdown: stop the job, which goes back to the queue
+                active.task.cancel()
+                await asyncio.gather(active.task, return_exceptions=True)
+                raise
+            except Exception as e:
+                logger.error(f"Job {job['id']} crashed: {e}")
+            finally:
+                self._active.pop(job["id"], None)
+
+    async def _maintenance(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await asyncio.to_thread(self._maintain)
+            except Exception as e:
+                logger.error(f"Job queue maintenance failed: {e}")
+
+    def _maintain(self) -> None:
+        """Heartbeats this queue's running jobs, requeues stale ones and deletes expired events"""
+        self._heartbeat()
+        requeued = self._requeue_stale()
+        if requeued:
+            logger.warning(f"Requeued {requeued} jobs of a process that stopped heartbeating")
+        purged = self._purge_events()
+        if purged:
+            logger.info(f"Deleted {purged} events of finished jobs")
+
+    async def _execute(self, job: dict, active: _ActiveJob) -> None:
+        job_id = job["id"]
+        status, error, simulation_ids = "completed", None, []
+        logger.info(f"Job {job_id} started ({job['kind']}, priority {job['priority']})")
+        try:
+            async for event in self.run(job["kind"], job["payload"]):
+                if event["type"] == "start":
+                    simulation_ids = event["ids"] if "ids" in event else [event["id"]]
+                    await asyncio.to_thread(self._set, job_id, simulation_ids=simulation_ids)
+                elif event["type"] == "error":
+                    status, error = "failed", event.get("message")
+                await self._append(job_id, active, event)
+        except asyncio.CancelledError:
+            if active.cancel_requested:
+                status, error = "cancelled", "Cancelled by request"
+            else:
+                status, error = "queued", None
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            status, error = "failed", str(e)
+            await self._append(job_id, active, {"type": "error", "message": str(e)})
+
+        if status == "queued":
+            await self._append(job_id, active, {"type": "requeued"})
+            await self._drain(active)
+            await asyncio.to_thread(self._set, job_id, status="queued", started_at=None, owner=None)
+            raise asyncio.CancelledError()
+        await self._append(job_id, active, {"type": "end", "status": status, "error": error})
+        # Followers stop reading once the status is terminal, so every event is stored first
+        await self._drain(active)
+        await asyncio.to_thread(self._set, job_id, status=status, error=error, finished_at=time.time())
+        await self._notify()
+        logger.info(f"Job {job_id} {status}")
+
+    async def _append(self, job_id: str, active: _ActiveJob, event: dict) -> None:
+        """Buffers an event; a flusher task stores buffered events in batches"""
+        active.pending.append((active.next_seq, _stored_event(event)))
+        active.next_seq += 1
+        if active.flusher is None or active.flusher.done():
+            active.flusher = asyncio.create_task(self._flush(job_id, active))
+
+    async def _flush(self, job_id: str, active: _ActiveJob) -> None:
+        # Events that arrive while a batch is written form the next batch
+        while active.pending:
+            batch, active.pending = active.pending, []
+            try:
+                await asyncio.to_thread(self._store_events, job_id, batch)
+            except Exception as e:
+                logger.error(f"Could not store {len(batch)} events of job {job_id}: {e}")
+            await self._notify()
+
+    async def _drain(self, active: _ActiveJob) -> None:
+        while active.flusher is not None and not active.flusher.done():
+            await asyncio.shield(active.flusher)
+
+    async def _notify(self) -> None:
+        async with self._changed:
+            self._changed.notify_all()
+
+    # --- Storage (called on worker threads) ---
+
+    def _insert(self, kind: str, payload: dict, priority: int) -> dict:
+        jobs = JobModel.__table__
+        with self.engine.begin() as conn:
+            queued = conn.execute(
+                select(func.count()).select_from(jobs).where(jobs.c.status == "queued")
+            ).scalar()
+            if queued >= self.max_queued:
+                raise QueueFullError(f"{queued} jobs are already queued")
+            job_id = new_id()
+            conn.execute(jobs.insert(), [{
+                "id": job_id,
+                "kind": kind,
+                "payload": payload,
+                "priority": priority,
+                "status": "queued",
+                "created_at": time.time()
+            }])
+        return self.get(job_id)
+
+    def _claim_next(self) -> Optional[dict]:
+        jobs = JobModel.__table__
+        with self._claim_lock, self.engine.begin() as conn:
+            rows = conn.execute(
+                jobs.select().where(jobs.c.status == "queued")
+                .order_by(jobs.c.priority.desc(), jobs.c.id)
+                .limit(_CLAIM_CANDIDATES)
+            ).all()
+            for row in rows:
+                now = time.time()
+                result = conn.execute(
+                    update(jobs).where(jobs.c.id == row.id, jobs.c.status == "queued")
+                    .values(status="running", started_at=now, owner=self.owner, heartbeat_at=now)
+                )
+                # Another process claimed it between the select and the update
+                if result.rowcount == 1:
+                    break
+            else:
+                return None
+            next_seq = conn.execute(
+                select(func.coalesce(func.max(JobEventModel.__table__.c.seq) + 1, 0))
+                .where(JobEventModel.__table__.c.job_id == row.id)
+            ).scalar()
+        return {"id": row.id, "kind": row.kind, "payload": row.payload, "priority": row.priority, "next_seq": next_seq}
+
+    def _cancel_queued(self, job_id: str) -> None:
+        jobs = JobModel.__table__
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                update(jobs).where(jobs.c.id == job_id, jobs.c.status == "queued")
+                .values(status="cancelled", error="Cancelled by request", finished_at=time.time())
+            )
+            if result.rowcount:
+                next_seq = conn.execute(
+                    select(func.coalesce(func.max(JobEventModel.__table__.c.seq) + 1, 0))
+                    .where(JobEventModel.__table__.c.job_id == job_id)
+                ).scalar()
+                conn.execute(JobEventModel.__table__.insert(), [{
+                    "job_id": job_id,
+                    "seq": next_seq,
+                    "event": {"type": "end", "status": "cancelled", "error": "Cancelled by request"}
+                }])
+
+    def _heartbeat(self) -> None:
+        jobs = JobModel.__table__
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(jobs).where(jobs.c.status == "running", jobs.c.owner == self.owner)
+                .values(heartbeat_at=time.time())
+            )
+
+    def _requeue_stale(self) -> int:
+        """Requeues running jobs whose owner has not heartbeated them for three intervals"""
+        jobs = JobModel.__table__
+        cutoff = time.time() - 3 * self.heartbeat_interval
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                update(jobs).where(
+                    jobs.c.status == "running",
+                    jobs.c.owner.is_(None) | (jobs.c.owner != self.owner),
+                    jobs.c.heartbeat_at.is_(None) | (jobs.c.heartbeat_at < cutoff)
+                ).values(status="queued", started_at=None, owner=None)
+            )
+        return result.rowcount
+
+    def _purge_events(self) -> int:
+        if not self.event_retention:
+            return 0
+        jobs, events = JobModel.__table__, JobEventModel.__table__
+        expired = select(jobs.c.id).where(
+            jobs.c.status.in_(TERMINAL_STATUSES), jobs.c.finished_at < time.time() - self.event_retention
+        )
+        with self.engine.begin() as conn:
+            result = conn.execute(delete(events).where(events.c.job_id.in_(expired)))
+        return result.rowcount
+
+    def _set(self, job_id: str, **values) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(update(JobModel.__table__).where(JobModel.__table__.c.id == job_id).values(**values))
+
+    def _status(self, job_id: str) -> Optional[str]:
+        with self.engine.connect() as conn:
+            return conn.execute(
+                select(JobModel.__table__.c.status).where(JobModel.__table__.c.id == job_id)
+            ).scalar()
+
+    def _store_events(self, job_id: str, batch: list) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(
+                JobEventModel.__table__.insert(),
+                [{"job_id": job_id, "seq": seq, "event": event} for seq, event in batch]
+            )
+
+    def _load_events(self, job_id: str, offset: int, limit: int = 500) -> list:
+        events = JobEventModel.__table__
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                events.select().where(events.c.job_id == job_id, events.c.seq >= offset)
+                .order_by(events.c.seq).limit(limit)
+            ).all()
+        return [(r.seq, r.event) for r in rows]
@@ -0,0 +1,229 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from llm_service import BaseLLM, AsyncBaseLLM, SYSTEM_PROMPT
+from config import (
+    LLM_CACHE_ENABLED, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL,
+    LLM_CACHE_DB_PATH, LLM_CACHE_DISK_MAX_ENTRIES, logger
+)
+
+class LLMCache:
+    """
+    Content-addressed cache for LLM responses.
+    In-memory LRU tier with an optional SQLite tier that survives restarts.
+    Entries expire after `ttl` seconds (0 disables expiry).
+    Async callers use aget/aset, which touch the disk tier from a worker thread.
+    """
+    # How many disk writes happen between eviction passes
+    DISK_EVICTION_INTERVAL = 100
+
+    def __init__(self, max_entries: int = None, ttl: int = None,
+                 db_path: str = None, disk_max_entries: int = None):
+        self.max_entries = max_entries if max_entries is not None else LLM_CACHE_MAX_ENTRIES
+        self.ttl = ttl if ttl is not None else LLM_CACHE_TTL
+        self.disk_max_entries = disk_max_entries if disk_max_entries is not None else LLM_CACHE_DISK_MAX_ENTRIES
+
+        self._memory = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        # Held during disk I/O, so memory hits never wait on SQLite
+        self._disk_lock = threading.Lock()
+        self._disk_writes = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._conn = None
+        if db_path:
+            try:
+                self._conn = sqlite3.connect(db_path, check_same_thread=False)
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_cache ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                    "stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+                )
+                self._conn.execute(
+                    "CREATE INDEX IF NOT EXISTS ix_llm_cache_accessed_at ON llm_cache (accessed_at)"
+                )
+                self._conn.commit()
+                logger.info(f"LLM disk cache enabled at {db_path}")
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to open LLM disk cache at {db_path}: {e}. Using memory only.")
+                self._conn = None
+
+    @staticmethod
+    def make_key(prompt: str, model: str, temperature: Optional[float]) -> str:
+        payload = json.dumps([model, temperature, SYSTEM_PROMPT, prompt], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl > 0 and now - stored_at > self.ttl
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._get_memory(key)
+        return value if value is not None else self._get_disk(key)
+
+    async def aget(self, key: str) -> Optional[str]:
+        value = self._get_memory(key)
+        if value is not None:
+            return value
+        if self._conn is None:
+            return self._get_disk(key)  # Only counts the miss
+        return await asyncio.to_thread(self._get_disk, key)
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+        self._set_disk(key, value, now)
+
+    async def aset(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+        if self._conn is not None:
+            await asyncio.to_thread(self._set_disk, key, value, now)
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        """Counts a hit; a miss is counted by _get_disk"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if not self._expired(stored_at, now):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+        return None
+
+    def _get_disk(self, key: str) -> Optional[str]:
+        now = time.time()
+        if self._conn is not None:
+            with self._disk_lock:
+                try:
+                    row = self._conn.execute(
+                        "SELECT value, stored_at FROM llm_cache WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is not None:
+                        value, stored_at = row
+                        if not self._expired(stored_at, now):
+                            self._conn.execute(
+                                "UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key)
+                            )
+                            self._conn.commit()
+                            with self._lock:
+                                self._remember(key, stored_at, value)
+                                self.hits += 1
+                            return value
+                        self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                        self._conn.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"LLM disk cache read failed: {e}")
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _set_disk(self, key: str, value: str, now: float) -> None:
+        if self._conn is None:
+            return
+        with self._disk_lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now)
+                )
+                self._disk_writes += 1
+                if self._disk_writes % self.DISK_EVICTION_INTERVAL == 0:
+                    self._evict_disk(now)
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"LLM disk cache write failed: {e}")
+
+    def _remember(self, key: str, stored_at: float, value: str) -> None:
+        self._memory[key] = (stored_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self, now: float) -> None:
+        if self.ttl > 0:
+            self._conn.execute("DELETE FROM llm_cache WHERE stored_at < ?", (now - self.ttl,))
+        self._conn.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            "SELECT key FROM llm_cache ORDER BY accessed_at ASC "
+            "LIMIT MAX(0, (SELECT COUNT(*) FROM llm_cache) - ?))",
+            (self.disk_max_entries,)
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memoryEntries": len(self._memory),
+                "disk": self._conn is not None
+            }
+
+def _model_signature(llm) -> Tuple[str, Optional[float]]:
+    return getattr(llm, "model", type(llm).__name__), getattr(llm, "temperature", None)
+
+class CachedLLM(BaseLLM):
+    """Caching layer around BaseLLM.predict"""
+    def __init__(self, llm: BaseLLM, cache: LLMCache):
+        self.llm = llm
+        self.cache = cache
+        self.model, self.temperature = _model_signature(llm)
+
+    def predict_with_info(self, prompt: str) -> Tuple[str, bool]:
+        """Returns the response and whether it came from the cache"""
+        key = LLMCache.make_key(prompt, self.model, self.temperature)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached, True
+        response = self.llm.predict(prompt)
+        if response:
+            self.cache.set(key, response)
+        return response, False
+
+    def predict(self, prompt: str) -> str:
+        return self.predict_with_info(prompt)[0]
+
+class AsyncCachedLLM(AsyncBaseLLM):
+    """Caching layer around AsyncBaseLLM.predict"""
+    def __init__(self, llm: AsyncBaseLLM, cache: LLMCache):
+        self.llm = llm
+        self.cache = cache
+        self.model, self.temperature = _model_signature(llm)
+
+    async def predict_with_info(self, prompt: str) -> Tuple[str, bool]:
+        """Returns the response and whether it came from the cache"""
+        key = LLMCache.make_key(prompt, self.model, self.temperature)
+        cached = await self.cache.aget(key)
+        if cached is not None:
+            return cached, True
+        response = await self.llm.predict(prompt)
+        if response:
+            await self.cache.aset(key, response)
+        return response, False
+
+    async def predict(self, prompt: str) -> str:
+        return (await self.predict_with_info(prompt))[0]
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_default_cache() -> Optional[LLMCache]:
+    """Process-wide cache shared by all simulators, or None if caching is disabled"""
+    global _default_cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = LLMCache(db_path=LLM_CACHE_DB_PATH or None)
+        return _default_cache
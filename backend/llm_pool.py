@@ -0,0 +1,279 @@
+import asyncio
+import threading
+import time
+from typing import List, Optional, Tuple
+from llm_service import (
+    BaseLLM, AsyncBaseLLM, LLMError, _complete, _acomplete, _backoff, _backoff_delay, _raise_if_cancelled
+)
+from llm_scheduler import LLMScheduler, get_scheduler, estimate_tokens
+from http_clients import get_http_client, get_async_http_client
+from config import (
+    LLM_BASE_URLS, LLM_API_KEY, LLM_TIMEOUT, LLM_MAX_RETRIES, LLM_CIRCUIT_FAILURES, LLM_CIRCUIT_RESET, LLM_STREAMING,
+    logger
+)
+
+CLOSED, OPEN = "closed", "open"
+
+# Weight of the newest sample in the latency average
+LATENCY_EWMA_ALPHA = 0.2
+
+class LLMUnavailableError(LLMError):
+    """Every endpoint of the pool is unavailable (circuit open, or already tried)"""
+    pass
+
+def parse_endpoints(specs: List[str]) -> List[Tuple[str, float]]:
+    """["http://a:1234/v1|2", "http://b:1234/v1"] -> [(url, 2.0), (url, 1.0)]"""
+    endpoints = []
+    for spec in specs:
+        url, _, weight = spec.partition("|")
+        weight = float(weight) if weight.strip() else 1.0
+        if weight <= 0:
+            raise ValueError(f"LLM endpoint weight must be positive: {spec!r}")
+        endpoints.append((url.strip(), weight))
+    return endpoints
+
+def _is_endpoint_failure(e: Exception) -> bool:
+    """Errors that say something about the server: connection problems, timeouts, 5xx and 429"""
+    status = getattr(e, "status_code", None)
+    return status is None or status >= 500 or status == 429
+
+class Endpoint:
+    """One LLM server of a pool: its clients, load, latency and circuit state"""
+    def __init__(self, url: str, weight: float = 1.0, api_key: str = None, timeout: float = None):
+        from openai import OpenAI, AsyncOpenAI
+
+        self.url = url
+        self.weight = weight
+        self.timeout = timeout or LLM_TIMEOUT
+        # Retries are the pool's job: a failed request moves on to another endpoint
+        self.client = OpenAI(base_url=url, api_key=api_key or LLM_API_KEY, timeout=self.timeout, max_retries=0,
+                             http_client=get_http_client())
+        self.async_client = AsyncOpenAI(base_url=url, api_key=api_key or LLM_API_KEY, timeout=self.timeout,
+                                        max_retries=0, http_client=get_async_http_client())
+        self.state = CLOSED
+        self.in_flight = 0
+        self.latency = None  # EWMA of successful request latency, seconds
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def stats(self) -> dict:
+        return {
+            "url": self.url,
+            "weight": self.weight,
+            "state": self.state,
+            "inFlight": self.in_flight,
+            "latencyMs": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "requests": self.requests,
+            "failures": self.failures,
+            "consecutiveFailures": self.consecutive_failures
+        }
+
+class LLMPool:
+    """
+    Routes requests over several LLM servers. Each request goes to the healthy
+    endpoint with the lowest expected wait: (requests in flight + 1) x latency EWMA,
+    divided by the endpoint's weight. After `failure_threshold` consecutive
+    failures an endpoint's circuit opens and it gets no traffic; once
+    `reset_timeout` seconds have passed a single request probes it, and a
+    success closes the circuit again.
+    """
+    def __init__(self, endpoints: List[Endpoint], failure_threshold: int = None, reset_timeout: float = None):
+        if not endpoints:
+            raise ValueError("An LLM pool needs at least one endpoint")
+        self.endpoints = endpoints
+        self.failure_threshold = failure_threshold or LLM_CIRCUIT_FAILURES
+        self.reset_timeout = reset_timeout if reset_timeout is not None else LLM_CIRCUIT_RESET
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, specs: List[str] = None) -> "LLMPool":
+        return cls([Endpoint(url, weight) for url, weight in parse_endpoints(specs or LLM_BASE_URLS)])
+
+    def acquire(self, exclude=()) -> Endpoint:
+        """Picks an endpoint for one request and counts the request as in flight on it"""
+        with self._lock:
+            now = time.monotonic()
+            candidates = []
+            for endpoint in self.endpoints:
+                if endpoint in exclude:
+                    continue
+                if endpoint.state == OPEN and (endpoint.probing or now - endpoint.opened_at < self.reset_timeout):
+                    continue
+                candidates.append(endpoint)
+            if not candidates:
+                raise LLMUnavailableError("No healthy LLM endpoint available")
+
+            known = [e.latency for e in self.endpoints if e.latency is not None]
+            # Endpoints without samples yet are assumed to be average
+            default_latency = sum(known) / len(known) if known else 1.0
+            endpoint = min(
+                candidates,
+                key=lambda e: (e.in_flight + 1) * (e.latency if e.latency is not None else default_latency) / e.weight
+            )
+            if endpoint.state == OPEN:
+                endpoint.probing = True
+                logger.info(f"Probing LLM endpoint {endpoint.url}")
+            endpoint.in_flight += 1
+            return endpoint
+
+    def release(self, endpoint: Endpoint, latency: float = None, error: Exception = None) -> None:
+        """
+        Records the outcome of a request: `latency` on success, `error` on failure.
+        A request that was cancelled passes neither and does not affect the circuit.
+        """
+        with self._lock:
+            endpoint.in_flight -= 1
+            probe = endpoint.probing
+            endpoint.probing = False
+            if latency is not None:
+                endpoint.requests += 1
+                endpoint.consecutive_failures = 0
+                if endpoint.latency is None:
+                    endpoint.latency = latency
+                else:
+                    endpoint.latency = LATENCY_EWMA_ALPHA * latency + (1 - LATENCY_EWMA_ALPHA) * endpoint.latency
+                if endpoint.state == OPEN:
+                    endpoint.state = CLOSED
+                    logger.info(f"LLM endpoint {endpoint.url} recovered, circuit closed")
+            elif error is not None:
+                endpoint.requests += 1
+                if not _is_endpoint_failure(error):
+                    return
+                endpoint.failures += 1
+                endpoint.consecutive_failures += 1
+                if probe or (endpoint.state == CLOSED and endpoint.consecutive_failures >= self.failure_threshold):
+                    endpoint.state = OPEN
+                    endpoint.opened_at = time.monotonic()
+                    logger.warning(f"LLM endpoint {endpoint.url} failing ({error}), circuit open "
+                                   f"for {self.reset_timeout}s")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"endpoints": [e.stats() for e in self.endpoints]}
+
+class _Attempts:
+    """
+    Attempt and failover bookkeeping of one pooled request. Iterating yields the
+    delay before each attempt: a failed endpoint is followed by another one right
+    away, and only once every endpoint has failed does the next attempt back off.
+    """
+    def __init__(self, pool: LLMPool, max_attempts: int):
+        self.pool = pool
+        self.max_attempts = max_attempts
+        self.tried = set()
+        self.last_error = None
+        self.failover = False
+
+    def __iter__(self):
+        for attempt in range(self.max_attempts):
+            delay = _backoff_delay(attempt - 1) if attempt and not self.failover else 0.0
+            self.failover = False
+            yield delay
+
+    def acquire(self) -> Optional[Endpoint]:
+        """An endpoint not tried yet, or None if none is available for this attempt"""
+        try:
+            return self.pool.acquire(exclude=self.tried)
+        except LLMUnavailableError as e:
+            self.last_error = e
+            self.tried.clear()
+            return None
+
+    def succeeded(self, endpoint: Endpoint, started: float) -> None:
+        self.pool.release(endpoint, latency=time.monotonic() - started)
+
+    def failed(self, endpoint: Endpoint, error: Exception) -> None:
+        """Records a failed request. Errors that are not the endpoint's fault are raised."""
+        self.pool.release(endpoint, error=error)
+        if not _is_endpoint_failure(error):
+            raise LLMError(f"LLM prediction failed: {error}")
+        logger.warning(f"LLM endpoint {endpoint.url} failed: {error}")
+        self.last_error = error
+        self.tried.add(endpoint)
+        self.failover = len(self.tried) < len(self.pool.endpoints)
+        if not self.failover:
+            self.tried.clear()
+
+    def exhausted(self) -> LLMError:
+        logger.error(f"Pooled LLM failed after {self.max_attempts} attempts. Last error: {self.last_error}")
+        return LLMError(f"LLM prediction failed after {self.max_attempts} attempts: {self.last_error}")
+
+class _PooledLLMBase:
+    """Pool, scheduler and model settings shared by PooledLLM and AsyncPooledLLM"""
+    def __init__(self, pool: LLMPool = None, scheduler: LLMScheduler = None):
+        self.pool = pool or get_pool()
+        if self.pool is None:
+            raise LLMError("LLM_BASE_URLS is not configured")
+        self.scheduler = scheduler or get_scheduler()
+        self.model = "local-model"
+        self.temperature = 0.7
+        self.streaming = LLM_STREAMING
+        # Enough attempts to try every endpoint once, plus the usual retries
+        self.max_attempts = LLM_MAX_RETRIES + len(self.pool.endpoints) - 1
+
+class PooledLLM(_PooledLLMBase, BaseLLM):
+    """OpenAILLM counterpart that spreads requests over an LLMPool and fails over between its endpoints"""
+    def predict(self, prompt: str) -> str:
+        attempts = _Attempts(self.pool, self.max_attempts)
+        for delay in attempts:
+            if delay:
+                _backoff(delay)
+            _raise_if_cancelled()
+            with self.scheduler.slot(estimate_tokens(prompt), abort=_raise_if_cancelled):
+                endpoint = attempts.acquire()
+                if endpoint is None:
+                    continue
+                started = time.monotonic()
+                try:
+                    content = _complete(endpoint.client, self.model, self.temperature, prompt, self.streaming)
+                except Exception as e:
+                    attempts.failed(endpoint, e)
+                    continue
+                except BaseException:
+                    self.pool.release(endpoint)
+                    raise
+                attempts.succeeded(endpoint, started)
+                return content
+        raise attempts.exhausted()
+
+class AsyncPooledLLM(_PooledLLMBase, AsyncBaseLLM):
+    """Non-blocking counterpart of PooledLLM"""
+    async def predict(self, prompt: str) -> str:
+        attempts = _Attempts(self.pool, self.max_attempts)
+        for delay in attempts:
+            if delay:
+                await asyncio.sleep(delay)
+            async with self.scheduler.aslot(estimate_tokens(prompt)):
+                endpoint = attempts.acquire()
+                if endpoint is None:
+                    continue
+                started = time.monotonic()
+                try:
+                    content = await _acomplete(endpoint.async_client, self.model, self.temperature, prompt,
+                                               self.streaming)
+                except Exception as e:
+                    attempts.failed(endpoint, e)
+                    continue
+                except BaseException:
+                    self.pool.release(endpoint)
+                    raise
+                attempts.succeeded(endpoint, started)
+                return content
+        raise attempts.exhausted()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> Optional[LLMPool]:
+    """The pool over LLM_BASE_URLS, or None when a single LLM_BASE_URL is used"""
+    global _pool
+    if not LLM_BASE_URLS:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = LLMPool.from_config()
+            logger.info(f"LLM pool over {len(_pool.endpoints)} endpoints")
+        return _pool
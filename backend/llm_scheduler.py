@@ -0,0 +1,263 @@
+import asyncio
+import contextvars
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable, Optional, Tuple
+from config import LLM_MAX_IN_FLIGHT, LLM_RATE_LIMIT, LLM_TOKEN_RATE_LIMIT, LLM_BASE_URLS, logger
+
+# Simulation the current LLM call is made for. Queued calls are granted
+# round-robin between simulations, so a large run cannot starve a small one.
+current_run = contextvars.ContextVar("llm_current_run", default=None)
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+# Waiters re-check cancellation this often while queued
+_ABORT_POLL_INTERVAL = 0.25
+
+def parse_rate(spec: str) -> Optional[Tuple[float, float]]:
+    """'100/minute' -> (100, 60). Empty or zero limits return None (unlimited)."""
+    spec = (spec or "").strip()
+    if not spec:
+        return None
+    count, _, period = spec.partition("/")
+    period = period.strip().lower().rstrip("s") or "second"
+    if period not in _PERIODS:
+        raise ValueError(f"Unknown rate limit period in {spec!r}")
+    count = float(count)
+    if count <= 0:
+        return None
+    return count, _PERIODS[period]
+
+def estimate_tokens(prompt: str) -> int:
+    """Rough prompt size in tokens (about four characters per token)"""
+    return max(1, len(prompt) // 4)
+
+class TokenBucket:
+    """
+    Holds up to `capacity` tokens, refilled continuously at `rate` tokens per second.
+    Not thread-safe: LLMScheduler only touches it under its lock.
+    """
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    @classmethod
+    def from_spec(cls, spec: str) -> Optional["TokenBucket"]:
+        rate = parse_rate(spec)
+        if rate is None:
+            return None
+        count, period = rate
+        return cls(count / period, count)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available, 0 if they are now"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+class _Waiter:
+    __slots__ = ("run", "cost", "wake", "granted", "limited", "enqueued_at")
+
+    def __init__(self, run, cost: int, wake: Callable):
+        self.run = run
+        self.cost = cost
+        self.wake = wake
+        self.granted = False
+        self.limited = False
+        self.enqueued_at = time.monotonic()
+
+class LLMScheduler:
+    """
+    Process-wide gate in front of the LLM server. At most `max_in_flight`
+    requests are on the wire at once, request and prompt-token rates are held
+    to their token buckets, and queued callers are served one simulation at a
+    time in turn. Used from event loops (aslot) and executor threads (slot).
+    """
+    def __init__(self, max_in_flight: int = None, rate_limit: str = None, token_rate_limit: str = None):
+        if max_in_flight is None:
+            # The in-flight budget grows with the number of LLM servers
+            max_in_flight = LLM_MAX_IN_FLIGHT * max(1, len(LLM_BASE_URLS))
+        self.max_in_flight = max_in_flight
+        self.rate_limit = rate_limit if rate_limit is not None else LLM_RATE_LIMIT
+        self.token_rate_limit = token_rate_limit if token_rate_limit is not None else LLM_TOKEN_RATE_LIMIT
+        self._requests = TokenBucket.from_spec(self.rate_limit)
+        self._tokens = TokenBucket.from_spec(self.token_rate_limit)
+        self._lock = threading.Lock()
+        self._queues = OrderedDict()  # run -> deque of waiters; the first run is served next
+        self._queued = 0
+        self._in_flight = 0
+        self._granted = 0
+        self._rate_limited = 0  # Grants held back by a rate limit
+        self._waits = deque(maxlen=1000)  # Seconds spent queued by recent grants
+
+    # --- Acquiring ---
+
+    @contextmanager
+    def slot(self, cost: int = 1, abort: Callable = None):
+        """
+        Blocks the calling thread until the request may be sent.
+        `abort` is called periodically while waiting and may raise to give up.
+        """
+        event = threading.Event()
+        waiter = self._enqueue(cost, event.set)
+        try:
+            while True:
+                delay = self._dispatch()
+                if waiter.granted:
+                    break
+                if abort is not None:
+                    abort()
+                    delay = min(delay or _ABORT_POLL_INTERVAL, _ABORT_POLL_INTERVAL)
+                event.wait(delay or None)
+                event.clear()
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def aslot(self, cost: int = 1):
+        """Waits on the event loop until the request may be sent"""
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+
+        def wake():
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # The waiter's loop is already closed
+
+        waiter = self._enqueue(cost, wake)
+        try:
+            while True:
+                delay = self._dispatch()
+                if waiter.granted:
+                    break
+                try:
+                    await asyncio.wait_for(event.wait(), delay or None)
+                except asyncio.TimeoutError:
+                    pass
+                event.clear()
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    # --- Scheduling ---
+
+    def _enqueue(self, cost: int, wake: Callable) -> _Waiter:
+        waiter = _Waiter(current_run.get(), cost, wake)
+        with self._lock:
+            self._queues.setdefault(waiter.run, deque()).append(waiter)
+            self._queued += 1
+        return waiter
+
+    def _dispatch(self) -> float:
+        """
+        Grants free slots to queued callers, taking one from each simulation in turn.
+        Returns the seconds until the rate limits allow the next grant, 0 if they do not block it.
+        """
+        woken = []
+        delay = 0.0
+        with self._lock:
+            while self._queues and self._in_flight < self.max_in_flight:
+                run, queue = next(iter(self._queues.items()))
+                waiter = queue[0]
+                delay = max(
+                    self._requests.delay(1) if self._requests else 0.0,
+                    self._tokens.delay(waiter.cost) if self._tokens else 0.0
+                )
+                if delay:
+                    if not waiter.limited:
+                        waiter.limited = True
+                        self._rate_limited += 1
+                    break
+                if self._requests:
+                    self._requests.take(1)
+                if self._tokens:
+                    self._tokens.take(waiter.cost)
+                queue.popleft()
+                # Move the simulation to the back of the line
+                del self._queues[run]
+                if queue:
+                    self._queues[run] = queue
+                self._queued -= 1
+                self._in_flight += 1
+                self._granted += 1
+                self._waits.append(time.monotonic() - waiter.enqueued_at)
+                waiter.granted = True
+                woken.append(waiter)
+        for waiter in woken:
+            waiter.wake()
+        return delay
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+        self._dispatch()
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        with self._lock:
+            if not waiter.granted:
+                queue = self._queues.get(waiter.run)
+                if queue is not None and waiter in queue:
+                    queue.remove(waiter)
+                    self._queued -= 1
+                    if not queue:
+                        del self._queues[waiter.run]
+                return
+        # Granted just as the caller gave up: hand the slot on
+        self._release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            waits = sorted(self._waits)
+            queue_depths = {str(run): len(queue) for run, queue in self._queues.items()}
+            stats = {
+                "maxInFlight": self.max_in_flight,
+                "inFlight": self._in_flight,
+                "queued": self._queued,
+                "queuedBySimulation": queue_depths,
+                "granted": self._granted,
+                "rateLimited": self._rate_limited,
+                "rateLimit": self.rate_limit or None,
+                "tokenRateLimit": self.token_rate_limit or None,
+                "waitMs": {
+                    "avg": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+                    "p95": round(waits[int(len(waits) * 0.95)] * 1000, 1) if waits else 0.0,
+                    "max": round(waits[-1] * 1000, 1) if waits else 0.0
+                }
+            }
+        return stats
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> LLMScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler()
+            logger.info(f"LLM scheduler: {_scheduler.max_in_flight} in flight, "
+                        f"rate limit {_scheduler.rate_limit or 'none'}")
+        return _scheduler
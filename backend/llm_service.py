@@ -1,14 +1,23 @@
 from abc import ABC, abstractmethod
+import asyncio
+import contextvars
 import random
 import json
+import threading
 import time
 from typing import Optional
+import numpy as np
 
 class BaseLLM(ABC):
     @abstractmethod
     def predict(self, prompt: str) -> str:
         pass
 
+class AsyncBaseLLM(ABC):
+    @abstractmethod
+    async def predict(self, prompt: str) -> str:
+        pass
+
 class MockLLM(BaseLLM):
     def predict(self, prompt: str) -> str:
         # Simple heuristic-based mock response
@@ -35,9 +44,59 @@ class MockLLM(BaseLLM):
             
         return "{}"
 
+# Set on executor threads while a sync LLM call runs on behalf of a cancellable run
+_cancel_event = contextvars.ContextVar("llm_cancel_event", default=None)
+
+def _raise_if_cancelled() -> None:
+    event = _cancel_event.get()
+    if event is not None and event.is_set():
+        raise LLMCancelledError("LLM call cancelled")
+
+def _backoff(delay: float) -> None:
+    """Retry sleep of the sync clients; returns early with LLMCancelledError if the run is cancelled"""
+    event = _cancel_event.get()
+    if event is None:
+        time.sleep(delay)
+    elif event.wait(delay):
+        raise LLMCancelledError("LLM call cancelled")
+
+class AsyncLLMAdapter(AsyncBaseLLM):
+    """
+    Exposes a synchronous BaseLLM through the async interface by running it in an executor.
+    cancel() makes calls that have not started yet, and retry sleeps of running
+    ones, raise LLMCancelledError instead of tying up the executor.
+    """
+    def __init__(self, llm: BaseLLM, executor=None):
+        self.llm = llm
+        self.executor = executor
+        self.model = getattr(llm, "model", type(llm).__name__)
+        self.temperature = getattr(llm, "temperature", None)
+        self.cancelled = threading.Event()
+
+    def cancel(self) -> None:
+        self.cancelled.set()
+
+    def _call(self, prompt: str) -> str:
+        token = _cancel_event.set(self.cancelled)
+        try:
+            _raise_if_cancelled()
+            return self.llm.predict(prompt)
+        finally:
+            _cancel_event.reset(token)
+
+    async def predict(self, prompt: str) -> str:
+        loop = asyncio.get_running_loop()
+        # The executor thread sees the caller's context (e.g. which simulation the call is for)
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self.executor, context.run, self._call, prompt)
+
 import os
 from dotenv import load_dotenv
-from config import LLM_BASE_URL, LLM_API_KEY, LLM_TIMEOUT, LLM_MAX_RETRIES, logger
+from config import (
+    LLM_BASE_URL, LLM_API_KEY, LLM_TIMEOUT, LLM_MAX_RETRIES, LLM_BACKOFF_MAX, LLM_STREAMING, EMBEDDING_BATCH_SIZE, logger
+)
+from llm_streaming import JSONObjectScanner, PhaseTimer, latency_stats
+from llm_scheduler import get_scheduler, estimate_tokens
 
 load_dotenv()
 
@@ -49,17 +108,143 @@ class LLMTimeoutError(LLMError):
     """Exception for LLM timeout errors"""
     pass
 
+class LLMCancelledError(LLMError):
+    """The run the LLM call belonged to was cancelled"""
+    pass
+
+SYSTEM_PROMPT = "You are a helpful assistant simulating a specific persona. Always respond in valid JSON when requested."
+
+def _build_messages(prompt: str) -> list:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+def _chunk_text(chunk):
+    """(text, finished) of a streamed chat completion chunk"""
+    if not chunk.choices:
+        return None, False
+    choice = chunk.choices[0]
+    return choice.delta.content, choice.finish_reason is not None
+
+def _complete(client, model: str, temperature: float, prompt: str, streaming: bool, **kwargs) -> str:
+    """
+    One chat completion. When streaming, tokens are scanned as they arrive and the
+    stream is closed as soon as a complete JSON object is in, so text a verbose
+    model adds after the answer is neither waited for nor parsed.
+    """
+    timer = PhaseTimer()
+    if not streaming:
+        response = client.chat.completions.create(
+            model=model, messages=_build_messages(prompt), temperature=temperature, **kwargs
+        )
+        timer.done()
+        return response.choices[0].message.content
+
+    scanner = JSONObjectScanner()
+    result, finished = None, False
+    stream = client.chat.completions.create(
+        model=model, messages=_build_messages(prompt), temperature=temperature, stream=True, **kwargs
+    )
+    try:
+        for chunk in stream:
+            text, finished = _chunk_text(chunk)
+            if not text:
+                continue
+            timer.first_token()
+            result = scanner.feed(text)
+            if result is not None:
+                timer.json_complete()
+                break
+    finally:
+        stream.close()
+    timer.done()
+    latency_stats.record_stream(stopped_early=result is not None and not finished)
+    # Without a complete object the whole text goes to the lenient parser as before
+    return result if result is not None else scanner.text
+
+async def _acomplete(client, model: str, temperature: float, prompt: str, streaming: bool, **kwargs) -> str:
+    """Async counterpart of _complete"""
+    timer = PhaseTimer()
+    if not streaming:
+        response = await client.chat.completions.create(
+            model=model, messages=_build_messages(prompt), temperature=temperature, **kwargs
+        )
+        timer.done()
+        return response.choices[0].message.content
+
+    scanner = JSONObjectScanner()
+    result, finished = None, False
+    stream = await client.chat.completions.create(
+        model=model, messages=_build_messages(prompt), temperature=temperature, stream=True, **kwargs
+    )
+    try:
+        async for chunk in stream:
+            text, finished = _chunk_text(chunk)
+            if not text:
+                continue
+            timer.first_token()
+            result = scanner.feed(text)
+            if result is not None:
+                timer.json_complete()
+                break
+    finally:
+        await stream.close()
+    timer.done()
+    latency_stats.record_stream(stopped_early=result is not None and not finished)
+    return result if result is not None else scanner.text
+
+def _backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter, so requests that failed together do not retry together"""
+    return random.uniform(0, min(LLM_BACKOFF_MAX, 2 ** attempt))
+
+def _retry_delay(e: Exception, attempt: int, max_retries: int) -> float:
+    """
+    Classifies an LLM client error.
+    Returns the backoff delay before the next attempt, or raises if the error is final.
+    """
+    error_type = type(e).__name__
+    
+    # Check for timeout errors
+    if "timeout" in str(e).lower() or "timed out" in str(e).lower():
+        logger.warning(f"LLM timeout on attempt {attempt + 1}: {str(e)}")
+        if attempt < max_retries - 1:
+            wait_time = _backoff_delay(attempt)
+            logger.info(f"Retrying in {wait_time:.1f} seconds...")
+            return wait_time
+        logger.error(f"LLM timeout after {max_retries} attempts")
+        raise LLMTimeoutError(f"LLM request timed out after {max_retries} attempts")
+    
+    # Check for connection errors
+    if "connection" in str(e).lower() or "network" in str(e).lower():
+        logger.warning(f"LLM connection error on attempt {attempt + 1}: {str(e)}")
+        if attempt < max_retries - 1:
+            wait_time = _backoff_delay(attempt)
+            logger.info(f"Retrying in {wait_time:.1f} seconds...")
+            return wait_time
+        logger.error(f"LLM connection failed after {max_retries} attempts")
+        raise LLMError(f"Failed to connect to LLM service: {str(e)}")
+    
+    # For other errors, log and raise
+    logger.error(f"LLM error ({error_type}): {str(e)}")
+    raise LLMError(f"LLM prediction failed: {str(e)}")
+
 class OpenAILLM(BaseLLM):
     def __init__(self, base_url: str = None, api_key: str = None):
         from openai import OpenAI
+        from http_clients import get_http_client
         
         self.base_url = base_url or LLM_BASE_URL
         self.api_key = api_key or LLM_API_KEY
         self.timeout = LLM_TIMEOUT
         self.max_retries = LLM_MAX_RETRIES
+        self.model = "local-model"
+        self.temperature = 0.7
+        self.streaming = LLM_STREAMING
         
         try:
-            self.client = OpenAI(base_url=self.base_url, api_key=self.api_key, timeout=self.timeout)
+            self.client = OpenAI(base_url=self.base_url, api_key=self.api_key, timeout=self.timeout,
+                                 http_client=get_http_client())
             logger.info(f"OpenAI LLM initialized with base_url: {self.base_url}")
         except Exception as e:
             logger.error(f"Failed to initialize OpenAI client: {str(e)}")
@@ -70,55 +255,23 @@ class OpenAILLM(BaseLLM):
         last_error = None
         
         for attempt in range(self.max_retries):
+            _raise_if_cancelled()
             try:
                 logger.debug(f"LLM predict attempt {attempt + 1}/{self.max_retries}")
                 
-                response = self.client.chat.completions.create(
-                    model="local-model",  # LM Studio usually ignores this, but it's required
-                    messages=[
-                        {"role": "system", "content": "You are a helpful assistant simulating a specific persona. Always respond in valid JSON when requested."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.7,
-                    timeout=self.timeout
-                )
+                with get_scheduler().slot(estimate_tokens(prompt), abort=_raise_if_cancelled):
+                    # LM Studio usually ignores the model name, but it's required
+                    content = _complete(self.client, self.model, self.temperature, prompt, self.streaming,
+                                        timeout=self.timeout)
                 
-                content = response.choices[0].message.content
                 logger.debug(f"LLM response received: {len(content)} chars")
                 return content
                 
+            except LLMCancelledError:
+                raise
             except Exception as e:
-                error_type = type(e).__name__
                 last_error = e
-                
-                # Check for timeout errors
-                if "timeout" in str(e).lower() or "timed out" in str(e).lower():
-                    logger.warning(f"LLM timeout on attempt {attempt + 1}: {str(e)}")
-                    if attempt < self.max_retries - 1:
-                        wait_time = 2 ** attempt  # Exponential backoff
-                        logger.info(f"Retrying in {wait_time} seconds...")
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        logger.error(f"LLM timeout after {self.max_retries} attempts")
-                        raise LLMTimeoutError(f"LLM request timed out after {self.max_retries} attempts")
-                
-                # Check for connection errors
-                elif "connection" in str(e).lower() or "network" in str(e).lower():
-                    logger.warning(f"LLM connection error on attempt {attempt + 1}: {str(e)}")
-                    if attempt < self.max_retries - 1:
-                        wait_time = 2 ** attempt
-                        logger.info(f"Retrying in {wait_time} seconds...")
-                        time.sleep(wait_time)
-                        continue
-                    else:
-                        logger.error(f"LLM connection failed after {self.max_retries} attempts")
-                        raise LLMError(f"Failed to connect to LLM service: {str(e)}")
-                
-                # For other errors, log and raise
-                else:
-                    logger.error(f"LLM error ({error_type}): {str(e)}")
-                    raise LLMError(f"LLM prediction failed: {str(e)}")
+                _backoff(_retry_delay(e, attempt, self.max_retries))
         
         # If all retries failed
         logger.error(f"LLM failed after {self.max_retries} attempts. Last error: {str(last_error)}")
@@ -139,52 +292,165 @@ class OpenAILLM(BaseLLM):
                 "error": True
             })
 
-class EmbeddingService:
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+class AsyncOpenAILLM(AsyncBaseLLM):
+    """Non-blocking counterpart of OpenAILLM built on openai.AsyncOpenAI"""
+    def __init__(self, base_url: str = None, api_key: str = None):
+        from openai import AsyncOpenAI
+        from http_clients import get_async_http_client
+        
+        self.base_url = base_url or LLM_BASE_URL
+        self.api_key = api_key or LLM_API_KEY
+        self.timeout = LLM_TIMEOUT
+        self.max_retries = LLM_MAX_RETRIES
+        self.model = "local-model"
+        self.temperature = 0.7
+        self.streaming = LLM_STREAMING
+        
         try:
-            from sentence_transformers import SentenceTransformer
-            self.model = SentenceTransformer(model_name)
-            self.use_fallback = False
-            logger.info(f"Loaded embedding model: {model_name}")
-        except ImportError:
-            logger.warning("sentence-transformers not found, using fallback.")
-            self.use_fallback = True
+            self.client = AsyncOpenAI(base_url=self.base_url, api_key=self.api_key, timeout=self.timeout,
+                                      http_client=get_async_http_client())
+            logger.info(f"Async OpenAI LLM initialized with base_url: {self.base_url}")
         except Exception as e:
-            logger.warning(f"Error loading embedding model: {e}, using fallback.")
-            self.use_fallback = True
+            logger.error(f"Failed to initialize async OpenAI client: {str(e)}")
+            raise LLMError(f"Failed to initialize LLM client: {str(e)}")
+
+    async def predict(self, prompt: str) -> str:
+        """Predict with retry logic; backoff sleeps do not block the event loop"""
+        last_error = None
+        
+        for attempt in range(self.max_retries):
+            try:
+                logger.debug(f"Async LLM predict attempt {attempt + 1}/{self.max_retries}")
+                
+                async with get_scheduler().aslot(estimate_tokens(prompt)):
+                    content = await _acomplete(self.client, self.model, self.temperature, prompt, self.streaming,
+                                               timeout=self.timeout)
+                
+                logger.debug(f"LLM response received: {len(content)} chars")
+                return content
+                
+            except Exception as e:
+                last_error = e
+                await asyncio.sleep(_retry_delay(e, attempt, self.max_retries))
+        
+        logger.error(f"LLM failed after {self.max_retries} attempts. Last error: {str(last_error)}")
+        raise LLMError(f"LLM prediction failed after {self.max_retries} attempts")
+
+STOP_WORDS = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with'}
+
+class EmbeddingService:
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", batch_size: int = None, lazy: bool = True):
+        self.model_name = model_name
+        self.batch_size = batch_size or EMBEDDING_BATCH_SIZE
+        # The model is loaded on first use (or by load()) so constructing the
+        # service does not block application startup.
+        self._model = None
+        self._use_fallback = None
+        self._load_lock = threading.Lock()
+        if not lazy:
+            self.load()
+
+    def load(self) -> None:
+        """Loads the embedding model if it has not been loaded yet. Safe to call from several threads."""
+        if self._use_fallback is not None:
+            return
+        with self._load_lock:
+            if self._use_fallback is not None:
+                return
+            try:
+                from sentence_transformers import SentenceTransformer
+                self._model = SentenceTransformer(self.model_name)
+                self._use_fallback = False
+                logger.info(f"Loaded embedding model: {self.model_name}")
+            except ImportError:
+                logger.warning("sentence-transformers not found, using fallback.")
+                self._use_fallback = True
+            except Exception as e:
+                logger.warning(f"Error loading embedding model: {e}, using fallback.")
+                self._use_fallback = True
+
+    @property
+    def loaded(self) -> bool:
+        return self._use_fallback is not None
+
+    @property
+    def model(self):
+        self.load()
+        return self._model
+
+    @model.setter
+    def model(self, value):
+        self._model = value
+
+    @property
+    def use_fallback(self) -> bool:
+        self.load()
+        return self._use_fallback
+
+    @use_fallback.setter
+    def use_fallback(self, value: bool):
+        self._use_fallback = value
         
     def get_similarity(self, text1: str, text2: str) -> float:
         """
         Calculates similarity between two texts.
         Returns a score between 0.0 and 1.0.
         """
+        return float(self.similarity_many_to_many([text1], [text2])[0, 0])
+
+    def similarity_one_to_many(self, query: str, documents: list) -> np.ndarray:
+        """Scores one query against many documents. Returns a (len(documents),) array."""
+        return self.similarity_many_to_many([query], documents)[0]
+
+    def similarity_many_to_many(self, queries: list, documents: list) -> np.ndarray:
+        """Scores every query against every document. Returns a (len(queries), len(documents)) array."""
+        if not queries or not documents:
+            return np.zeros((len(queries), len(documents)), dtype=np.float32)
+
         if self.use_fallback:
-            return self._keyword_similarity(text1, text2)
+            return self._keyword_similarity_matrix(queries, documents)
 
         try:
-            # Generate embeddings
-            embeddings = self.model.encode([text1, text2])
-            vec1 = embeddings[0]
-            vec2 = embeddings[1]
-            
-            return self._cosine_similarity(vec1, vec2)
+            # Encode everything in one batched pass
+            embeddings = self.encode(list(queries) + list(documents))
+            return self._cosine_similarity(embeddings[:len(queries)], embeddings[len(queries):])
         except Exception as e:
             logger.error(f"Embedding calculation failed: {e}")
-            return self._keyword_similarity(text1, text2)
+            return self._keyword_similarity_matrix(queries, documents)
+
+    def similarity_to_embeddings(self, queries: list, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Scores queries against precomputed normalized embeddings (one row per document).
+        Returns a (len(queries), len(embeddings)) array.
+        """
+        return self.encode(queries) @ embeddings.T
+
+    def encode(self, texts: list, batch_size: int = None) -> np.ndarray:
+        """
+        Encodes texts into L2-normalized float32 vectors, one row per text.
+        Only available when the embedding model is loaded.
+        """
+        if self.use_fallback:
+            raise RuntimeError("Embedding model is not available")
+        embeddings = self.model.encode(
+            list(texts),
+            batch_size=batch_size or self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True
+        )
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+    def _cosine_similarity(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        """Cosine similarity between the rows of two L2-normalized matrices"""
+        return a @ b.T
 
-    def _cosine_similarity(self, vec1, vec2) -> float:
-        import numpy as np
-        return float(np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2)))
+    def _keywords(self, text: str) -> set:
+        return set(text.lower().split()) - STOP_WORDS
 
     def _keyword_similarity(self, text1: str, text2: str) -> float:
         # Simple Jaccard similarity on words
-        words1 = set(text1.lower().split())
-        words2 = set(text2.lower().split())
-        
-        # Remove common stop words (very basic list)
-        stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with'}
-        words1 = words1 - stop_words
-        words2 = words2 - stop_words
+        words1 = self._keywords(text1)
+        words2 = self._keywords(text2)
         
         if not words1 or not words2:
             return 0.0
@@ -193,3 +459,36 @@ class EmbeddingService:
         union = words1.union(words2)
         
         return len(intersection) / len(union)
+
+    def _keyword_similarity_matrix(self, queries: list, documents: list) -> np.ndarray:
+        """
+        Vectorized Jaccard similarity. Documents are stored as one flat array of
+        token ids with row offsets (CSR layout), so each query is scored against
+        all documents with a single gather and segmented sum.
+        """
+        vocabulary = {}
+
+        def token_ids(text: str) -> list:
+            return [vocabulary.setdefault(w, len(vocabulary)) for w in self._keywords(text)]
+
+        doc_tokens = [token_ids(d) for d in documents]
+        query_tokens = [token_ids(q) for q in queries]
+
+        doc_sizes = np.fromiter((len(t) for t in doc_tokens), dtype=np.int64, count=len(doc_tokens))
+        offsets = np.zeros(len(doc_tokens), dtype=np.int64)
+        np.cumsum(doc_sizes[:-1], out=offsets[1:])
+        flat = np.fromiter((t for tokens in doc_tokens for t in tokens), dtype=np.int64, count=int(doc_sizes.sum()))
+
+        scores = np.zeros((len(queries), len(documents)), dtype=np.float32)
+        for qi, tokens in enumerate(query_tokens):
+            if not tokens:
+                continue
+            in_query = np.zeros(len(vocabulary), dtype=np.int64)
+            in_query[tokens] = 1
+            # Trailing zero keeps offsets of empty documents at the end in range
+            hits = np.append(in_query[flat], 0)
+            intersection = np.add.reduceat(hits, offsets)
+            intersection[doc_sizes == 0] = 0
+            union = len(tokens) + doc_sizes - intersection
+            scores[qi] = np.where(doc_sizes > 0, intersection / np.maximum(union, 1), 0.0)
+        return scores
@@ -0,0 +1,131 @@
+import contextvars
+import json
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+class JSONObjectScanner:
+    """
+    Finds the first complete top-level JSON object in text that arrives in pieces.
+    Prose and code fences around the object are skipped. Braces inside strings
+    are ignored. A balanced {...} that is not valid JSON is passed over.
+    """
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._start = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, piece: str) -> Optional[str]:
+        """Adds streamed text. Returns the object's text once it is complete, otherwise None."""
+        self.text += piece
+        text = self.text
+        while self._pos < len(text):
+            ch = text[self._pos]
+            self._pos += 1
+            if self._start is None:
+                if ch == "{":
+                    self._start, self._depth = self._pos - 1, 1
+            elif self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    candidate = text[self._start:self._pos]
+                    self._start = None
+                    try:
+                        if isinstance(json.loads(candidate), dict):
+                            return candidate
+                    except json.JSONDecodeError:
+                        pass
+        return None
+
+# Simulation step (inboxScan, takeAction, singlePass, insights) the current LLM
+# call is made for, so latencies are also reported per kind of prompt
+current_prompt = contextvars.ContextVar("llm_current_prompt", default=None)
+
+class LatencyStats:
+    """Recent latencies of LLM requests by phase, in seconds, overall and per prompt kind"""
+    PHASES = ("firstToken", "jsonComplete", "total")
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = self._new_samples()
+        self._by_prompt = {}
+        self.streamed = 0
+        self.stopped_early = 0
+
+    def _new_samples(self) -> dict:
+        return {phase: deque(maxlen=self.window) for phase in self.PHASES}
+
+    def record(self, phase: str, seconds: float, prompt: str = None) -> None:
+        with self._lock:
+            self._samples[phase].append(seconds)
+            if prompt is not None:
+                if prompt not in self._by_prompt:
+                    self._by_prompt[prompt] = self._new_samples()
+                self._by_prompt[prompt][phase].append(seconds)
+
+    def record_stream(self, stopped_early: bool) -> None:
+        with self._lock:
+            self.streamed += 1
+            if stopped_early:
+                self.stopped_early += 1
+
+    @staticmethod
+    def _summary(samples: dict) -> dict:
+        phases = {}
+        for phase, values in samples.items():
+            ordered = sorted(values)
+            phases[phase] = {
+                "count": len(ordered),
+                "avgMs": round(sum(ordered) / len(ordered) * 1000, 1) if ordered else None,
+                "p95Ms": round(ordered[int(len(ordered) * 0.95)] * 1000, 1) if ordered else None
+            }
+        return phases
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "phases": self._summary(self._samples),
+                "byPrompt": {prompt: self._summary(samples) for prompt, samples in self._by_prompt.items()},
+                "streamed": self.streamed,
+                "stoppedEarly": self.stopped_early
+            }
+
+latency_stats = LatencyStats()
+
+class PhaseTimer:
+    """Times one LLM request; phases are measured from the moment the request is sent"""
+    def __init__(self, stats: LatencyStats = None):
+        self.stats = stats or latency_stats
+        self.prompt = current_prompt.get()
+        self.started = time.perf_counter()
+        self._first_token = False
+
+    def _record(self, phase: str) -> None:
+        self.stats.record(phase, time.perf_counter() - self.started, self.prompt)
+
+    def first_token(self) -> None:
+        if not self._first_token:
+            self._first_token = True
+            self._record("firstToken")
+
+    def json_complete(self) -> None:
+        self._record("jsonComplete")
+
+    def done(self) -> None:
+        self._record("total")
@@ -1,11 +1,93 @@
-from fastapi import FastAPI, HTTPException, Depends
+import asyncio
+import threading
+import time
+from typing import List, Literal, Optional
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response, Header
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from models import EmailDraft, SimulationResult
+from fastapi.responses import JSONResponse
+from sqlalchemy import func, or_, tuple_
+from sqlalchemy.orm import Session, selectinload
+from models import EmailDraft, VariantBatch, PanelRequest, JobRequest, SimulationResult
+from persistence import get_writer, mark_interrupted
+from runs import get_registry, fingerprint, IdempotencyConflictError
+from jobs import JobQueue, QueueFullError
+from llm_scheduler import get_scheduler
+from llm_pool import get_pool
+from http_clients import close_http_clients, http_stats
+from llm_streaming import latency_stats
+from panels import get_or_create_panel, load_panel_personas, PanelNotFoundError
 from simulation import Simulator
-from database import get_db, AudienceModel, SimulationModel, PersonaModel, ResponseModel
+from database import get_db, init_db, SessionLocal, AudienceModel, SimulationModel, PersonaModel, ResponseModel
+from config import MAX_BATCH_VARIANTS, DISCONNECT_POLL_INTERVAL, SINGLE_INSTANCE, logger
 
-app = FastAPI(title="Email AI Predictor API")
+# The simulator (LLM clients, embedding model) is built lazily and warmed up
+# in the background, so the app starts serving /health immediately.
+simulator = None
+_simulator_lock = threading.Lock()
+_warmup_task = None
+readiness = {"ready": False, "error": None, "startedAt": None, "readyAt": None}
+
+def get_simulator() -> Simulator:
+    global simulator
+    with _simulator_lock:
+        if simulator is None:
+            simulator = Simulator()
+        return simulator
+
+def _warm_up() -> None:
+    try:
+        get_simulator().warm_up()
+        readiness["ready"] = True
+        readiness["readyAt"] = time.time()
+        logger.info(f"Warm-up finished in {readiness['readyAt'] - readiness['startedAt']:.2f}s")
+    except Exception as e:
+        readiness["error"] = str(e)
+        logger.error(f"Warm-up failed: {e}")
+
+async def ensure_simulator() -> Simulator:
+    """Waits for the warm-up if it is still running, then returns the simulator"""
+    if not readiness["ready"] and _warmup_task is not None:
+        await asyncio.shield(_warmup_task)
+    return await asyncio.to_thread(get_simulator)
+
+async def run_job(kind: str, payload: dict):
+    """Event stream of a queued job (see jobs.JobQueue)"""
+    sim = await ensure_simulator()
+    if kind == "batch":
+        batch = VariantBatch(**payload)
+        stream = persist_events(sim.run_batch_stream_async(batch), batch.variants, cancel_reason="Job cancelled")
+    else:
+        draft = EmailDraft(**payload)
+        stream = persist_events(sim.run_simulation_stream_async(draft), [draft], cancel_reason="Job cancelled")
+    async for event in stream:
+        yield event
+    # The job is marked completed once this stream ends; its results must be stored by then
+    if not await asyncio.to_thread(get_writer().flush):
+        logger.warning("Job finished before the persistence writer caught up")
+
+job_queue = JobQueue(run_job)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _warmup_task
+    readiness.update(ready=False, error=None, startedAt=time.time(), readyAt=None)
+    # Schema creation and migrations run once here instead of on every request
+    await asyncio.to_thread(init_db)
+    if SINGLE_INSTANCE:
+        interrupted = await asyncio.to_thread(mark_interrupted)
+        if interrupted:
+            logger.warning(f"Marked {interrupted} simulations left running by a previous process as interrupted")
+    writer = get_writer()
+    _warmup_task = asyncio.create_task(asyncio.to_thread(_warm_up))
+    await job_queue.start()
+    yield
+    # Running jobs go back to the queue; then write what is still queued before exiting
+    await job_queue.stop()
+    await asyncio.to_thread(writer.stop)
+    await close_http_clients()
+
+app = FastAPI(title="Email AI Predictor API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -13,72 +95,310 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-simulator = Simulator()
-
 from fastapi.responses import StreamingResponse
 import json
 
+async def persist_events(stream, drafts: List[EmailDraft], idempotency_key: str = None,
+                         request_fingerprint: str = None, cancel_reason: str = "Client disconnected"):
+    """
+    Passes simulation events through while the background writer stores them.
+    Runs are recorded as they start and each response as it finishes, so a run
+    that fails or whose client disconnects keeps its partial results.
+    """
+    writer = get_writer()
+    sim_ids = []
+    finished = set()
+    status, error = "cancelled", cancel_reason
+    try:
+        async for event in stream:
+            if event["type"] == "start":
+                sim_ids = event["ids"] if "ids" in event else [event["id"]]
+                for sim_id, draft in zip(sim_ids, drafts):
+                    await writer.put_async("begin", sim_id, draft, idempotency_key, request_fingerprint)
+            elif event["type"] == "progress":
+                await writer.put_async("add_response", sim_ids[event.get("variant", 0)], event["response"])
+            elif event["type"] in ("result", "variant_result"):
+                sim_id = sim_ids[event.get("variant", 0)]
+                await writer.put_async("finish", sim_id, event["data"])
+                finished.add(sim_id)
+            yield event
+    except Exception as e:
+        status, error = "failed", str(e)
+        raise
+    finally:
+        for sim_id in sim_ids:
+            if sim_id not in finished:
+                await writer.put_async("fail", sim_id, error, status=status)
+
+_END = object()
+
+async def stop_on_disconnect(request: Request, events):
+    """
+    Runs the event stream in its own task and cancels it as soon as the client
+    disconnects, rather than at the next failed write, so pending and in-flight
+    LLM calls of an abandoned run are aborted.
+    """
+    queue = asyncio.Queue()
+
+    async def produce():
+        try:
+            async for event in events:
+                await queue.put(event)
+        except Exception as e:
+            await queue.put(e)
+        finally:
+            queue.put_nowait(_END)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), DISCONNECT_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    logger.info("Client disconnected, cancelling its simulation stream")
+                    return
+                continue
+            if item is _END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+
+def load_completed_run(idempotency_key: str, request_fingerprint: str, draft: EmailDraft) -> Optional[dict]:
+    """The stored result of a completed run started with this Idempotency-Key, if any"""
+    db = SessionLocal()
+    try:
+        sim = db.query(SimulationModel.id, SimulationModel.request_fingerprint, SimulationModel.subject,
+                       SimulationModel.body, SimulationModel.cta, SimulationModel.audience_target) \
+            .filter(SimulationModel.idempotency_key == idempotency_key, SimulationModel.status == 'completed') \
+            .order_by(SimulationModel.timestamp.desc()) \
+            .first()
+        if sim is None:
+            return None
+        if sim.request_fingerprint is not None:
+            conflict = sim.request_fingerprint != request_fingerprint
+        else:
+            # Stored before fingerprints were recorded: compare what the row has
+            conflict = (sim.subject, sim.body, sim.cta, sim.audience_target) != \
+                (draft.subject, draft.body, draft.cta, draft.audience)
+        if conflict:
+            raise IdempotencyConflictError("Idempotency-Key was already used with a different request")
+        return load_simulation_detail(db, sim.id)
+    finally:
+        db.close()
+
+async def replay_stored(result: dict):
+    yield {"type": "start", "id": result["id"]}
+    yield {"type": "result", "data": result}
+
 @app.post("/api/simulate")
-async def simulate_email(draft: EmailDraft, db: Session = Depends(get_db)):
-    def event_generator():
-        final_result_data = None
+async def simulate_email(request: Request, draft: EmailDraft, idempotency_key: Optional[str] = Header(None)):
+    """
+    Streams a simulation. The simulation is cancelled if the client disconnects.
+    With an Idempotency-Key header the run is detached from the request: a retry
+    with the same key and body attaches to the in-flight run, or replays the
+    finished one, instead of starting another simulation. A detached run is
+    cancelled once no client has been attached for IDEMPOTENCY_DETACH_GRACE.
+    In-flight runs are tracked per process: with several workers, a retry that
+    reaches another worker before the run finished starts a second run. Finished
+    runs are found in the database by every worker.
+    """
+    request_fingerprint = fingerprint(draft.dict()) if idempotency_key is not None else None
+
+    async def simulation_events():
+        sim = await ensure_simulator()
+        stream = persist_events(sim.run_simulation_stream_async(draft), [draft], idempotency_key, request_fingerprint)
+        async for event in stream:
+            yield event
+
+    events = None
+    if idempotency_key is None:
+        events = simulation_events()
+    else:
+        registry = get_registry()
         try:
-            for event in simulator.run_simulation_stream(draft):
+            run = registry.get(idempotency_key, request_fingerprint)
+            if run is None:
+                stored = await asyncio.to_thread(load_completed_run, idempotency_key, request_fingerprint, draft)
+                if stored is not None:
+                    events = replay_stored(stored)
+                else:
+                    # Another request with this key may have started while the database was checked
+                    run = registry.get(idempotency_key, request_fingerprint) \
+                        or registry.start(idempotency_key, request_fingerprint, simulation_events)
+        except IdempotencyConflictError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        if events is None:
+            events = run.follow()
+
+    async def event_generator():
+        try:
+            async for event in stop_on_disconnect(request, events):
                 yield json.dumps(event) + "\n"
-                if event["type"] == "result":
-                    final_result_data = event["data"]
-            
-            # Save to DB after simulation is done
-            if final_result_data:
-                # Reconstruct SimulationResult object from dict for easier access if needed, 
-                # or just use the dict directly to populate models.
-                # The event["data"] is the .dict() of SimulationResult.
-                
-                res_data = final_result_data
-                
-                sim_model = SimulationModel(
-                    id=res_data['id'],
-                    timestamp=res_data['timestamp'],
-                    subject=draft.subject,
-                    body=draft.body,
-                    cta=draft.cta,
-                    audience_target=draft.audience,
-                    metrics=res_data['metrics'],
-                    insights=res_data['insights']
-                )
-                db.add(sim_model)
-                db.flush()
-                
-                for r in res_data['responses']:
-                    # r is a dict here because we serialized it
-                    # We need to get persona_id. In the dict, persona is a dict too.
-                    persona_id = r['persona']['id']
-                    
-                    resp_model = ResponseModel(
-                        simulation_id=sim_model.id,
-                        persona_id=persona_id,
-                        action=r['action'],
-                        sentiment=r['sentiment'],
-                        comment=r['comment'],
-                        detailed_reasoning=r['detailedReasoning']
-                    )
-                    db.add(resp_model)
-                    
-                db.commit()
-                print("Simulation saved to DB.")
-                
         except Exception as e:
             print(f"Error during simulation stream: {e}")
-            db.rollback()
             yield json.dumps({"type": "error", "message": str(e)}) + "\n"
 
     return StreamingResponse(event_generator(), media_type="application/x-ndjson")
 
+def check_variants(variants: List[EmailDraft]) -> None:
+    """A/B variants share one persona panel: 2..MAX_BATCH_VARIANTS drafts of one audience"""
+    if not 2 <= len(variants) <= MAX_BATCH_VARIANTS:
+        raise HTTPException(status_code=400, detail=f"Provide between 2 and {MAX_BATCH_VARIANTS} variants")
+    if len({v.audience for v in variants}) > 1:
+        raise HTTPException(status_code=400, detail="All variants must target the same audience")
+
+@app.post("/api/simulate/batch")
+async def simulate_batch(request: Request, batch: VariantBatch):
+    """
+    A/B simulation of several drafts against one shared persona panel.
+    Streams per-variant progress and results, then a "comparison" event with
+    paired statistics of each variant against the first one.
+    """
+    check_variants(batch.variants)
+
+    async def event_generator():
+        try:
+            sim = await ensure_simulator()
+            stream = persist_events(sim.run_batch_stream_async(batch), batch.variants)
+            async for event in stop_on_disconnect(request, stream):
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            print(f"Error during batch simulation stream: {e}")
+            yield json.dumps({"type": "error", "message": str(e)}) + "\n"
+
+    return StreamingResponse(event_generator(), media_type="application/x-ndjson")
+
+@app.post("/api/jobs", status_code=202)
+async def submit_job(request: JobRequest):
+    """
+    Queues a simulation (draft) or an A/B batch (variants) and returns the job.
+    Follow it at /api/jobs/{id}/events; the result stays available after the run.
+    """
+    if (request.draft is None) == (request.variants is None):
+        raise HTTPException(status_code=400, detail="Provide either draft or variants")
+    if request.variants is not None:
+        check_variants(request.variants)
+        kind, payload = "batch", VariantBatch(variants=request.variants).dict()
+    else:
+        kind, payload = "simulate", request.draft.dict()
+    try:
+        return await job_queue.submit(kind, payload, request.priority)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/api/jobs/{job_id}/events")
+async def get_job_events(
+    request: Request,
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    format: Literal["ndjson", "sse"] = "ndjson",
+    last_event_id: Optional[int] = Header(None)
+):
+    """
+    The job's events from `offset` on, following the job until it ends.
+    NDJSON lines carry their offset as "seq"; reconnect with offset=seq+1.
+    With format=sse (or Accept: text/event-stream) events are Server-Sent
+    Events whose id is the offset, so EventSource resumes via Last-Event-ID.
+    The last event is {"type": "end", "status": ...}. Result events leave out the
+    responses (they are in the progress events and at /api/jobs/{id}/result), and
+    events of finished jobs are deleted after JOB_EVENT_RETENTION_HOURS.
+    """
+    if await asyncio.to_thread(job_queue.get, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    sse = format == "sse" or "text/event-stream" in request.headers.get("accept", "")
+    if sse and last_event_id is not None:
+        offset = max(offset, last_event_id + 1)
+
+    async def event_generator():
+        async for seq, event in job_queue.events(job_id, offset):
+            if sse:
+                yield f"id: {seq}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+            else:
+                yield json.dumps({"seq": seq, **event}) + "\n"
+
+    media_type = "text/event-stream" if sse else "application/x-ndjson"
+    return StreamingResponse(event_generator(), media_type=media_type)
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    status = await job_queue.cancel(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"id": job_id, "status": status}
+
+@app.get("/api/jobs/{job_id}/result")
+async def get_job_result(job_id: str, compact: bool = False, db: Session = Depends(get_db)):
+    """Stored results of a completed job: the simulation, or every variant of a batch"""
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    results = [load_simulation_detail(db, sim_id, compact) for sim_id in job["simulationIds"]]
+    if job["kind"] == "batch":
+        return {"id": job_id, "variants": results}
+    return results[0]
+
+@app.post("/api/panels")
+async def create_panel(request: PanelRequest):
+    """
+    Builds (or returns the stored) deterministic persona panel for an audience.
+    The same audience, size, seed and stratification always give the same panel id.
+    """
+    try:
+        audience_id = int(request.audience)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid audience id")
+    if request.size < 1:
+        raise HTTPException(status_code=400, detail="Panel size must be positive")
+
+    try:
+        panel = await asyncio.to_thread(
+            get_or_create_panel, audience_id, request.size, request.seed, request.stratify_by
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "id": panel.id,
+        "audience": str(panel.audience_id),
+        "size": len(panel.persona_ids),
+        "seed": panel.seed,
+        "stratifyBy": panel.stratify_by,
+        "createdAt": panel.created_at
+    }
+
+@app.get("/api/panels/{panel_id}")
+async def get_panel(panel_id: str):
+    try:
+        personas = await asyncio.to_thread(load_panel_personas, panel_id)
+    except PanelNotFoundError:
+        raise HTTPException(status_code=404, detail="Panel not found")
+    return {
+        "id": panel_id,
+        "size": len(personas),
+        "personas": [p.dict() for p in personas]
+    }
+
 @app.get("/api/audiences")
 async def get_audiences(db: Session = Depends(get_db)):
-    audiences = db.query(AudienceModel).all()
+    # Legacy full listing; personas of all audiences are loaded in one extra query.
+    # Prefer /api/audiences/summary and /api/audiences/{id}/personas.
+    audiences = db.query(AudienceModel).options(selectinload(AudienceModel.personas)).all()
     return [
         {
             "id": a.id,
@@ -91,16 +411,140 @@ async def get_audiences(db: Session = Depends(get_db)):
         for a in audiences
     ]
 
+@app.get("/api/audiences/summary")
+async def get_audiences_summary(db: Session = Depends(get_db)):
+    """Audiences with persona counts, without the personas themselves"""
+    rows = db.query(
+        AudienceModel.id,
+        AudienceModel.name,
+        AudienceModel.type,
+        func.count(PersonaModel.id).label("size")
+    ).outerjoin(PersonaModel, PersonaModel.audience_id == AudienceModel.id) \
+        .group_by(AudienceModel.id) \
+        .order_by(AudienceModel.id) \
+        .all()
+    return [
+        {
+            "id": r.id,
+            "name": r.name,
+            "type": r.type,
+            "size": r.size,
+            "lastUpdated": "Just now" # Placeholder
+        }
+        for r in rows
+    ]
+
+# API field name -> persona column
+PERSONA_FIELDS = {
+    "id": PersonaModel.id,
+    "name": PersonaModel.name,
+    "role": PersonaModel.role,
+    "company": PersonaModel.company,
+    "avatar": PersonaModel.avatar,
+    "psychographics": PersonaModel.psychographics,
+    "pastBehavior": PersonaModel.past_behavior
+}
+
+@app.get("/api/audiences/{audience_id}/personas")
+async def get_audience_personas(
+    audience_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    fields: Optional[str] = None,
+    q: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    One page of an audience's personas, ordered by id.
+    `cursor` is the `nextCursor` of the previous page, `fields` a comma-separated
+    projection (id is always included) and `q` a substring matched against
+    name, role and company.
+    """
+    names = [f.strip() for f in fields.split(",") if f.strip()] if fields else list(PERSONA_FIELDS)
+    unknown = [f for f in names if f not in PERSONA_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    if "id" not in names:
+        names.insert(0, "id")
+
+    query = db.query(*[PERSONA_FIELDS[f].label(f) for f in names]) \
+        .filter(PersonaModel.audience_id == audience_id)
+    if cursor:
+        query = query.filter(PersonaModel.id > cursor)
+    if q:
+        pattern = f"%{q}%"
+        query = query.filter(or_(
+            PersonaModel.name.ilike(pattern),
+            PersonaModel.role.ilike(pattern),
+            PersonaModel.company.ilike(pattern)
+        ))
+    # One extra row tells whether there is a next page
+    rows = query.order_by(PersonaModel.id).limit(limit + 1).all()
+
+    items = [{f: getattr(r, f) for f in names} for r in rows[:limit]]
+    return {
+        "items": items,
+        "nextCursor": items[-1]["id"] if len(rows) > limit else None
+    }
+
 @app.get("/api/history")
-async def get_history(db: Session = Depends(get_db)):
-    simulations = db.query(SimulationModel).order_by(SimulationModel.timestamp.desc()).all()
+async def get_history(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    audience: Optional[str] = None,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    q: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Simulation summaries, newest first.
+    Pages are keyed on (timestamp, id): pass the X-Next-Cursor header of a page
+    as `cursor` to get the next one. Filters: `audience` (exact), `since`/`until`
+    (timestamps in ms, inclusive) and `q` (substring of the subject).
+    """
+    query = db.query(
+        SimulationModel.id,
+        SimulationModel.timestamp,
+        SimulationModel.subject,
+        SimulationModel.metrics,
+        SimulationModel.audience_target,
+        SimulationModel.status
+    )
+    if cursor:
+        try:
+            cursor_timestamp, cursor_id = cursor.split(":", 1)
+            cursor_timestamp = int(cursor_timestamp)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(
+            tuple_(SimulationModel.timestamp, SimulationModel.id) < tuple_(cursor_timestamp, cursor_id)
+        )
+    if audience is not None:
+        query = query.filter(SimulationModel.audience_target == audience)
+    if since is not None:
+        query = query.filter(SimulationModel.timestamp >= since)
+    if until is not None:
+        query = query.filter(SimulationModel.timestamp <= until)
+    if q:
+        query = query.filter(SimulationModel.subject.ilike(f"%{q}%"))
+
+    # One extra row tells whether there is a next page
+    simulations = query.order_by(SimulationModel.timestamp.desc(), SimulationModel.id.desc()).limit(limit + 1).all()
+    if len(simulations) > limit:
+        simulations = simulations[:limit]
+        last = simulations[-1]
+        response.headers["X-Next-Cursor"] = f"{last.timestamp}:{last.id}"
+
     return [
         {
             "id": s.id,
             "timestamp": s.timestamp,
             "subject": s.subject,
             "metrics": s.metrics,
-            "audience": s.audience_target
+            "audience": s.audience_target,
+            "status": s.status or 'completed'
         }
         for s in simulations
     ]
@@ -117,48 +561,68 @@ async def clear_history(db: Session = Depends(get_db)):
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/history/{sim_id}")
-async def get_simulation_detail(sim_id: str, db: Session = Depends(get_db)):
-    sim = db.query(SimulationModel).filter(SimulationModel.id == sim_id).first()
+# Stand-in for responses whose persona was deleted
+UNKNOWN_PERSONA = {
+    "id": "unknown",
+    "name": "Unknown",
+    "role": "N/A",
+    "company": "N/A",
+    "avatar": "?",
+    "psychographics": "",
+    "pastBehavior": ""
+}
+
+def load_simulation_detail(db: Session, sim_id: str, compact: bool = False) -> Optional[dict]:
+    """A stored simulation with all responses, loaded in two queries"""
+    sim = db.query(
+        SimulationModel.id,
+        SimulationModel.timestamp,
+        SimulationModel.subject,
+        SimulationModel.body,
+        SimulationModel.cta,
+        SimulationModel.metrics,
+        SimulationModel.insights,
+        SimulationModel.status,
+        SimulationModel.error
+    ).filter(SimulationModel.id == sim_id).first()
     if not sim:
-        raise HTTPException(status_code=404, detail="Simulation not found")
-    
-    # Reconstruct SimulationResult
-    # We need to fetch responses and their personas
+        return None
+
+    columns = [
+        ResponseModel.id,
+        ResponseModel.action,
+        ResponseModel.sentiment,
+        ResponseModel.comment,
+        ResponseModel.decision_source,
+        ResponseModel.weight,
+        *[column.label(f"persona_{field}") for field, column in PERSONA_FIELDS.items()]
+    ]
+    if not compact:
+        columns.append(ResponseModel.detailed_reasoning)
+    rows = db.query(*columns) \
+        .outerjoin(PersonaModel, PersonaModel.id == ResponseModel.persona_id) \
+        .filter(ResponseModel.simulation_id == sim_id) \
+        .order_by(ResponseModel.id) \
+        .all()
+
     responses = []
-    for r in sim.responses:
-        # Fetch persona manually or rely on relationship
-        # r.persona is available via relationship
-        p_model = r.persona
-        if p_model:
-            persona_obj = {
-                "id": p_model.id,
-                "name": p_model.name,
-                "role": p_model.role,
-                "company": p_model.company,
-                "avatar": p_model.avatar,
-                "psychographics": p_model.psychographics,
-                "pastBehavior": p_model.past_behavior
-            }
+    for r in rows:
+        if r.persona_id is not None:
+            persona_obj = {field: getattr(r, f"persona_{field}") for field in PERSONA_FIELDS}
         else:
-            # Fallback if persona deleted
-            persona_obj = {
-                "id": "unknown",
-                "name": "Unknown",
-                "role": "N/A",
-                "company": "N/A",
-                "avatar": "?",
-                "psychographics": "",
-                "pastBehavior": ""
-            }
-            
-        responses.append({
+            persona_obj = UNKNOWN_PERSONA
+        response = {
+            "id": r.id,
             "persona": persona_obj,
             "action": r.action,
             "sentiment": r.sentiment,
             "comment": r.comment,
-            "detailedReasoning": r.detailed_reasoning
-        })
+            "decisionSource": r.decision_source or 'llm',
+            "weight": r.weight if r.weight is not None else 1.0
+        }
+        if not compact:
+            response["detailedReasoning"] = r.detailed_reasoning
+        responses.append(response)
 
     return {
         "id": sim.id,
@@ -166,11 +630,61 @@ async def get_simulation_detail(sim_id: str, db: Session = Depends(get_db)):
         "subject": sim.subject,
         "body": sim.body,
         "cta": sim.cta,
-        "metrics": sim.metrics,
-        "insights": sim.insights,
+        # Runs that did not complete have partial responses but no metrics
+        "metrics": sim.metrics or {},
+        "insights": sim.insights or [],
+        "status": sim.status or 'completed',
+        "error": sim.error,
         "responses": responses
     }
 
+@app.get("/api/history/{sim_id}")
+async def get_simulation_detail(sim_id: str, compact: bool = False, db: Session = Depends(get_db)):
+    """
+    A stored simulation with all responses.
+    `compact` leaves out each response's detailedReasoning; fetch it on demand
+    from /api/history/{sim_id}/responses/{response_id}.
+    """
+    detail = load_simulation_detail(db, sim_id, compact)
+    if detail is None:
+        raise HTTPException(status_code=404, detail="Simulation not found")
+    return detail
+
+@app.get("/api/history/{sim_id}/responses/{response_id}")
+async def get_response_reasoning(sim_id: str, response_id: int, db: Session = Depends(get_db)):
+    """The detailedReasoning left out of a compact simulation detail"""
+    row = db.query(ResponseModel.id, ResponseModel.detailed_reasoning) \
+        .filter(ResponseModel.id == response_id, ResponseModel.simulation_id == sim_id) \
+        .first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Response not found")
+    return {"id": row.id, "detailedReasoning": row.detailed_reasoning}
+
 @app.get("/health")
 async def health_check():
-    return {"status": "ok"}
+    """Liveness: the process is up and serving requests. Touches neither the database nor the LLM clients."""
+    return {"status": "ok", "ready": readiness["ready"]}
+
+@app.get("/health/stats")
+async def health_stats():
+    """Persistence, job queue and LLM client statistics, kept off the liveness probe"""
+    pool = get_pool()
+    return {
+        "ready": readiness["ready"],
+        "persistence": get_writer().stats(),
+        "jobs": await asyncio.to_thread(job_queue.stats),
+        "llmScheduler": get_scheduler().stats(),
+        "llmPool": pool.stats() if pool is not None else None,
+        "llmHttp": http_stats(),
+        "llmLatency": latency_stats.to_dict()
+    }
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness: models are loaded and simulations start without delay"""
+    if not readiness["ready"]:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "starting" if not readiness["error"] else "error", "error": readiness["error"]}
+        )
+    return {"status": "ready", "warmupSeconds": round(readiness["readyAt"] - readiness["startedAt"], 2)}
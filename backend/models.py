@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import List, Optional, Literal
+from pydantic import BaseModel, Field, model_validator
+from typing import Dict, List, Optional, Literal
+from config import PRESCREEN_LOW_THRESHOLD, PRESCREEN_HIGH_THRESHOLD
 
 class EmailDraft(BaseModel):
     subject: str
@@ -7,6 +8,57 @@ class EmailDraft(BaseModel):
     cta: str
     audience: str
     sample_size: int = 10
+    # How the persona panel is drawn from the audience (see profiles.generate_personas)
+    sampling: Literal['random', 'id_range', 'stratified_role', 'stratified_industry'] = 'random'
+    # Stored panel (POST /api/panels) to simulate instead of drawing a new sample.
+    # The whole panel is used; sample_size and sampling are ignored.
+    panel_id: Optional[str] = None
+    # 'two_step': inbox scan, then a CTA call for opened emails.
+    # 'single_pass': one call returns both decisions (about half the latency and tokens).
+    decision_mode: Literal['two_step', 'single_pass'] = 'two_step'
+    # Tiered mode: relevance below prescreen_low is decided without the LLM,
+    # the middle band always reaches the LLM, the top band only if prescreen_high_to_llm.
+    prescreen: bool = False
+    prescreen_low: Optional[float] = None  # Defaults to PRESCREEN_LOW_THRESHOLD
+    prescreen_high: Optional[float] = None  # Defaults to PRESCREEN_HIGH_THRESHOLD
+    prescreen_high_to_llm: bool = True
+    # Adaptive mode: sample_size personas first, then batches until the 95% interval
+    # of target_metric is at most ci_width percentage points wide or max_sample_size is reached.
+    adaptive: bool = False
+    target_metric: Literal['openRate', 'clickRate', 'replyRate', 'spamRate'] = 'openRate'
+    ci_width: float = 10.0
+    max_sample_size: Optional[int] = None  # Defaults to ADAPTIVE_MAX_SAMPLE_SIZE
+    # Clustered mode: the whole audience is grouped into at most max_clusters clusters of
+    # near-identical personas; representatives are simulated and weighted by cluster size.
+    # Takes precedence over sample_size, panel_id and adaptive.
+    clustered: bool = False
+    max_clusters: int = Field(50, ge=1)
+    representatives_per_cluster: int = Field(1, ge=1)
+
+    @model_validator(mode='after')
+    def _check_prescreen_band(self):
+        low = self.prescreen_low if self.prescreen_low is not None else PRESCREEN_LOW_THRESHOLD
+        high = self.prescreen_high if self.prescreen_high is not None else PRESCREEN_HIGH_THRESHOLD
+        if low > high:
+            raise ValueError(f"prescreen_low ({low}) must not be above prescreen_high ({high})")
+        return self
+
+class PanelRequest(BaseModel):
+    audience: str
+    size: int = 50
+    seed: int = 0
+    stratify_by: Optional[Literal['role', 'industry', 'psychographic']] = None
+
+class VariantBatch(BaseModel):
+    # The first variant is the baseline. The persona panel (audience, sample_size)
+    # is taken from it and shared by all variants; adaptive mode is not used here.
+    variants: List[EmailDraft]
+
+class JobRequest(BaseModel):
+    # Exactly one of draft (single simulation) or variants (A/B batch)
+    draft: Optional[EmailDraft] = None
+    variants: Optional[List[EmailDraft]] = None
+    priority: int = 0  # Higher runs first
 
 class Persona(BaseModel):
     id: str
@@ -23,12 +75,18 @@ class Response(BaseModel):
     sentiment: Literal['positive', 'neutral', 'negative']
     comment: str
     detailedReasoning: str
+    decisionSource: Literal['llm', 'prescreen'] = 'llm'  # 'prescreen' = decided without an LLM call
+    weight: float = 1.0  # Number of audience personas this response stands for
 
 class Insight(BaseModel):
     type: Literal['positive', 'negative', 'warning']
     title: str
     description: str
 
+class MetricInterval(BaseModel):
+    low: float  # Percent
+    high: float  # Percent
+
 class Metrics(BaseModel):
     openRate: int
     clickRate: int
@@ -37,6 +95,10 @@ class Metrics(BaseModel):
     ignoreRate: int
     forwardRate: int
     readRate: int
+    sampleSize: int = 0  # Simulated personas
+    populationSize: int = 0  # Personas represented (differs from sampleSize in clustered mode)
+    confidenceLevel: float = 0.95
+    intervals: Dict[str, MetricInterval] = {}  # Wilson interval per rate
 
 class SimulationResult(BaseModel):
     id: str
@@ -0,0 +1,131 @@
+import hashlib
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+from sqlalchemy import func, literal
+from models import Persona
+from database import SessionLocal, AudienceModel, PanelModel, PersonaModel
+from profiles import INDUSTRY, allocate_strata, load_rows_by_ids, row_to_persona
+from config import logger
+
+# Stratum of a persona, as a SQL expression; empty values fall into "Other"
+STRATIFY_COLUMNS = {
+    "role": func.coalesce(func.nullif(PersonaModel.role, ''), 'Other'),
+    "industry": INDUSTRY,
+    "psychographic": func.coalesce(func.nullif(PersonaModel.psychographics, ''), 'Other')
+}
+
+# Loaded panels kept in memory, keyed by panel id: (audience id, audience revision, personas)
+_PANEL_CACHE_SIZE = 64
+_panel_cache = OrderedDict()
+_panel_cache_lock = threading.Lock()
+
+class PanelNotFoundError(ValueError):
+    """Raised when a simulation references a panel id that does not exist"""
+    pass
+
+class PanelAudienceMismatchError(ValueError):
+    """Raised when a simulation references a panel drawn from another audience"""
+    pass
+
+def panel_id_for(audience_id: int, size: int, seed: int, stratify_by: Optional[str]) -> str:
+    key = f"{audience_id}:{size}:{seed}:{stratify_by or 'none'}"
+    return "pnl_" + hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+def _draw_panel(db, audience_id: int, size: int, seed: int, stratify_by: Optional[str]) -> List[str]:
+    """
+    Deterministic draw inside the database: strata are counted with GROUP BY and
+    each stratum's personas are ranked by crc32(seed:id), so the same parameters
+    always give the same panel on every worker and every run, and no ids are
+    read beyond the ones drawn. crc32() is registered on SQLite connections by
+    database.register_sqlite_functions; other databases need an equivalent function.
+    """
+    rng = random.Random(seed)
+    stratum = STRATIFY_COLUMNS.get(stratify_by)
+    in_audience = PersonaModel.audience_id == audience_id
+    if stratum is None:
+        strata = {"all": db.query(func.count(PersonaModel.id)).filter(in_audience).scalar()}
+    else:
+        strata = dict(db.query(stratum, func.count(PersonaModel.id)).filter(in_audience).group_by(stratum).all())
+
+    rank = func.crc32(literal(f"{seed}:") + PersonaModel.id)
+    ids = []
+    for key, k in sorted(allocate_strata(strata, size).items()):
+        if k == 0:
+            continue
+        query = db.query(PersonaModel.id).filter(in_audience)
+        if stratum is not None:
+            query = query.filter(stratum == key)
+        ids.extend(pid for (pid,) in query.order_by(rank, PersonaModel.id).limit(k))
+    rng.shuffle(ids)
+    return ids
+
+def get_or_create_panel(audience_id: int, size: int, seed: int = 0, stratify_by: Optional[str] = None) -> PanelModel:
+    """Returns the stored panel for these parameters, drawing and storing it on first use"""
+    if stratify_by is not None and stratify_by not in STRATIFY_COLUMNS:
+        raise ValueError(f"Unknown stratification: {stratify_by}")
+
+    panel_id = panel_id_for(audience_id, size, seed, stratify_by)
+    db = SessionLocal()
+    try:
+        panel = db.query(PanelModel).filter(PanelModel.id == panel_id).first()
+        if panel is None:
+            persona_ids = _draw_panel(db, audience_id, size, seed, stratify_by)
+            if not persona_ids:
+                raise ValueError(f"Audience {audience_id} has no personas")
+            panel = PanelModel(
+                id=panel_id,
+                audience_id=audience_id,
+                size=size,
+                seed=seed,
+                stratify_by=stratify_by,
+                persona_ids=persona_ids,
+                created_at=int(time.time() * 1000)
+            )
+            db.add(panel)
+            db.commit()
+            db.refresh(panel)
+            logger.info(f"Created panel {panel_id} with {len(panel.persona_ids)} personas")
+        db.expunge(panel)
+        return panel
+    finally:
+        db.close()
+
+def _audience_revision(db, audience_id: int) -> int:
+    return db.query(AudienceModel.revision).filter(AudienceModel.id == audience_id).scalar() or 0
+
+def load_panel_personas(panel_id: str, audience: Optional[str] = None) -> List[Persona]:
+    """
+    Personas of a stored panel, in panel order. With `audience`, the panel must
+    have been drawn from that audience. Cached panels are reloaded once personas
+    were written to their audience again (its revision changed).
+    """
+    db = SessionLocal()
+    try:
+        with _panel_cache_lock:
+            cached = _panel_cache.get(panel_id)
+        if cached is not None and cached[1] == _audience_revision(db, cached[0]):
+            audience_id, _, personas = cached
+            with _panel_cache_lock:
+                if panel_id in _panel_cache:
+                    _panel_cache.move_to_end(panel_id)
+        else:
+            panel = db.query(PanelModel.audience_id, PanelModel.persona_ids).filter(PanelModel.id == panel_id).first()
+            if panel is None:
+                raise PanelNotFoundError(f"Panel not found: {panel_id}")
+            audience_id = panel.audience_id
+            revision = _audience_revision(db, audience_id)
+            personas = [row_to_persona(r) for r in load_rows_by_ids(db, panel.persona_ids)]
+            with _panel_cache_lock:
+                _panel_cache[panel_id] = (audience_id, revision, personas)
+                _panel_cache.move_to_end(panel_id)
+                while len(_panel_cache) > _PANEL_CACHE_SIZE:
+                    _panel_cache.popitem(last=False)
+    finally:
+        db.close()
+
+    if audience is not None and str(audience_id) != str(audience):
+        raise PanelAudienceMismatchError(f"Panel {panel_id} was drawn from audience {audience_id}, not {audience}")
+    return list(personas)
@@ -0,0 +1,255 @@
+import asyncio
+import queue
+import threading
+import time
+from typing import Optional
+from sqlalchemy import update
+from models import EmailDraft
+from ids import new_id
+from database import engine as default_engine, SimulationModel, ResponseModel
+from config import PERSIST_QUEUE_SIZE, PERSIST_BATCH_SIZE, logger
+
+_STOP = object()
+
+# Recorded on the runs this process starts, so startup recovery leaves its own runs alone
+PROCESS_ID = new_id()
+
+def _response_row(sim_id: str, r: dict) -> dict:
+    """ResponseModel row from a serialized Response"""
+    return {
+        "simulation_id": sim_id,
+        "persona_id": r['persona']['id'],
+        "action": r['action'],
+        "sentiment": r['sentiment'],
+        "comment": r['comment'],
+        "detailed_reasoning": r['detailedReasoning'],
+        "decision_source": r.get('decisionSource', 'llm'),
+        "weight": r.get('weight', 1.0)
+    }
+
+class SimulationWriter:
+    """
+    Writes simulation results from a background thread.
+    Producers enqueue small operations (run started, response finished, run
+    finished or failed) on a bounded queue; the writer drains up to
+    `batch_size` of them per transaction and inserts responses with one
+    executemany. A run's row is written when it starts and its responses as
+    they finish, so an interrupted run keeps its partial results.
+    """
+    def __init__(self, engine=None, max_queue: int = None, batch_size: int = None, owner: str = None):
+        self.engine = engine if engine is not None else default_engine
+        self.owner = owner or PROCESS_ID
+        self.batch_size = batch_size if batch_size is not None else PERSIST_BATCH_SIZE
+        self._queue = queue.Queue(maxsize=max_queue if max_queue is not None else PERSIST_QUEUE_SIZE)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.applied = 0
+        self.failed = 0
+        self.last_error = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="simulation-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Writes everything still queued, then stops the thread"""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Blocks until all queued operations are applied. Returns False on timeout."""
+        deadline = time.time() + timeout
+        while self._queue.unfinished_tasks:
+            if time.time() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    # --- Producer API. Each call is one queued operation. ---
+
+    def begin(self, sim_id: str, draft: EmailDraft, idempotency_key: str = None,
+              request_fingerprint: str = None) -> None:
+        self._put(self._begin_op(sim_id, draft, idempotency_key, request_fingerprint))
+
+    def add_response(self, sim_id: str, response: dict) -> None:
+        self._put(self._add_response_op(sim_id, response))
+
+    def finish(self, sim_id: str, result: dict) -> None:
+        """Marks a run completed. Its responses must have been added with add_response."""
+        self._put(self._finish_op(sim_id, result))
+
+    def fail(self, sim_id: str, error: str, status: str = "failed") -> None:
+        self._put(self._fail_op(sim_id, error, status))
+
+    async def put_async(self, method: str, *args, **kwargs) -> None:
+        """Calls a producer method without blocking the event loop when the queue is full"""
+        op = getattr(self, f"_{method}_op")(*args, **kwargs)
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait(op)
+        except queue.Full:
+            logger.warning("Persistence queue is full, waiting for the writer")
+            await asyncio.to_thread(self._queue.put, op)
+
+    def _put(self, op) -> None:
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait(op)
+        except queue.Full:
+            # Backpressure: the producer waits for the writer
+            logger.warning("Persistence queue is full, waiting for the writer")
+            self._queue.put(op)
+
+    def _begin_op(self, sim_id: str, draft: EmailDraft, idempotency_key: str = None,
+                  request_fingerprint: str = None) -> tuple:
+        return ("begin", sim_id, {
+            "id": sim_id,
+            "timestamp": int(time.time() * 1000),
+            "subject": draft.subject,
+            "body": draft.body,
+            "cta": draft.cta,
+            "audience_target": draft.audience,
+            "status": "running",
+            "idempotency_key": idempotency_key,
+            "request_fingerprint": request_fingerprint,
+            "owner": self.owner
+        })
+
+    def _add_response_op(self, sim_id: str, response: dict) -> tuple:
+        return ("response", sim_id, _response_row(sim_id, response))
+
+    def _finish_op(self, sim_id: str, result: dict) -> tuple:
+        return ("finish", sim_id, {
+            "timestamp": result['timestamp'],
+            "metrics": result['metrics'],
+            "insights": result['insights'],
+            "status": "completed"
+        })
+
+    def _fail_op(self, sim_id: str, error: str, status: str = "failed") -> tuple:
+        return ("finish", sim_id, {"status": status, "error": error})
+
+    # --- Writer thread ---
+
+    def _run(self) -> None:
+        stopping = False
+        while True:
+            try:
+                # After stop() only what is already queued is written
+                ops = [self._queue.get_nowait() if stopping else self._queue.get()]
+            except queue.Empty:
+                return
+            while len(ops) < self.batch_size:
+                try:
+                    ops.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stopping = stopping or any(op is _STOP for op in ops)
+            writes = [op for op in ops if op is not _STOP]
+            try:
+                self._apply_batch(writes)
+            finally:
+                for _ in ops:
+                    self._queue.task_done()
+
+    def _apply_batch(self, ops) -> None:
+        if not ops:
+            return
+        try:
+            with self.engine.begin() as conn:
+                self._apply(conn, ops)
+            with self._lock:
+                self.applied += len(ops)
+        except Exception as e:
+            logger.error(f"Batched persistence of {len(ops)} operations failed: {e}. Retrying one by one.")
+            # Isolate the failing operations so they do not take the rest down
+            for op in ops:
+                try:
+                    with self.engine.begin() as conn:
+                        self._apply(conn, [op])
+                    with self._lock:
+                        self.applied += 1
+                except Exception as op_error:
+                    self._record_failure(op, op_error)
+
+    def _apply(self, conn, ops) -> None:
+        rows = []
+        for kind, sim_id, payload in ops:
+            if kind == "response":
+                rows.append(payload)
+                continue
+            # Keep operation order: responses queued before this op go in first
+            if rows:
+                conn.execute(ResponseModel.__table__.insert(), rows)
+                rows = []
+            if kind == "begin":
+                conn.execute(SimulationModel.__table__.insert(), [payload])
+            elif kind == "finish":
+                conn.execute(
+                    update(SimulationModel.__table__)
+                    .where(SimulationModel.__table__.c.id == sim_id)
+                    .values(**payload)
+                )
+        if rows:
+            conn.execute(ResponseModel.__table__.insert(), rows)
+
+    def _record_failure(self, op, error: Exception) -> None:
+        kind, sim_id, _ = op
+        with self._lock:
+            self.failed += 1
+            self.last_error = f"{kind} {sim_id}: {error}"
+        logger.error(f"Failed to persist {kind} of simulation {sim_id}: {error}")
+        if kind != "response":
+            return
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(
+                    update(SimulationModel.__table__)
+                    .where(SimulationModel.__table__.c.id == sim_id)
+                    .values(status="failed", error=f"Persistence error: {error}")
+                )
+        except Exception as e:
+            logger.error(f"Could not mark simulation {sim_id} as failed: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "applied": self.applied,
+                "failed": self.failed,
+                "lastError": self.last_error
+            }
+
+def mark_interrupted(engine=None, owner: str = None) -> int:
+    """
+    Marks runs left 'running' by other processes as interrupted. Returns how many were found.
+    Only safe when this is the only server process using the database (SINGLE_INSTANCE):
+    with several, the runs of the others are still in progress.
+    """
+    engine = engine if engine is not None else default_engine
+    sims = SimulationModel.__table__
+    with engine.begin() as conn:
+        result = conn.execute(
+            update(sims)
+            .where(sims.c.status == "running", sims.c.owner.is_(None) | (sims.c.owner != (owner or PROCESS_ID)))
+            .values(status="interrupted", error="Server stopped during the run")
+        )
+    return result.rowcount
+
+_default_writer: Optional[SimulationWriter] = None
+_default_writer_lock = threading.Lock()
+
+def get_writer() -> SimulationWriter:
+    """Process-wide writer, started on first use"""
+    global _default_writer
+    with _default_writer_lock:
+        if _default_writer is None:
+            _default_writer = SimulationWriter()
+            _default_writer.start()
+        return _default_writer
@@ -1,101 +1,341 @@
 from faker import Faker
+import argparse
+import csv
+import json
+import os
 import random
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
 from backend.database import SessionLocal, init_db, AudienceModel, PersonaModel
 
-fake = Faker('ru_RU')
+AUDIENCE_PRESETS = {
+    "tech_leaders": {
+        "name": "Технические лидеры (CTO, VP Eng)",
+        "type": "B2B",
+        "count": 12,
+        "roles": [('CTO', 'Технический директор'), ('VP Engineering', 'VP разработки'), ('Tech Lead', 'Тимлид')],
+        "industries": ['FinTech', 'SaaS', 'CyberSecurity'],
+        "avatars": ['👨‍💻', '🧑‍💻', '👓']
+    },
+    "hr_directors": {
+        "name": "HR Директора",
+        "type": "B2B",
+        "count": 10,
+        "roles": [('HR Director', 'HR Директор'), ('Head of Recruitment', 'Руководитель подбора')],
+        "industries": ['Retail', 'IT', 'Banking'],
+        "avatars": ['👩‍💼', '🧑‍💼', '📋']
+    },
+    "saas_marketers": {
+        "name": "Маркетологи (SaaS)",
+        "type": "B2B",
+        "count": 15,
+        "roles": [('CMO', 'Директор по маркетингу'), ('Growth Manager', 'Менеджер по росту')],
+        "industries": ['SaaS', 'EdTech', 'MarTech'],
+        "avatars": ['🚀', '📈', '👩‍🎨']
+    },
+    "ecommerce_owners": {
+        "name": "E-commerce Owners",
+        "type": "B2C",
+        "count": 10,
+        "roles": [('Founder', 'Основатель'), ('Owner', 'Владелец')],
+        "industries": ['Fashion', 'Electronics', 'Home Decor'],
+        "avatars": ['🛍️', '📦', '💎']
+    }
+}
 
-def populate():
+PSYCHOGRAPHICS = [
+    "Прагматик, ценит краткость и цифры.",
+    "Визионер, ищет новые возможности для роста.",
+    "Скептик, требует доказательств и кейсов.",
+    "Новатор, любит тестировать новые инструменты.",
+    "Консерватор, предпочитает проверенные решения."
+]
+
+PERSONA_FIELDS = ["name", "role", "company", "avatar", "psychographics", "past_behavior"]
+DEFAULT_CHUNK_SIZE = 5000
+
+class PersonaImportError(Exception):
+    """The import file cannot be imported as a whole; nothing was written"""
+
+# One Faker per worker process; creating it is the expensive part
+_fake = None
+
+def _get_fake() -> Faker:
+    global _fake
+    if _fake is None:
+        _fake = Faker('ru_RU')
+    return _fake
+
+def _generate_chunk(args) -> list:
+    """Generates `count` persona rows. Content is seeded per chunk, so it does not depend on the worker count."""
+    config, audience_id, count, seed = args
+    fake = _get_fake()
+    fake.seed_instance(seed)
+    rng = random.Random(seed)
+
+    rows = []
+    for _ in range(count):
+        role_en, role_ru = rng.choice(config["roles"])
+        industry = rng.choice(config["industries"])
+        rows.append({
+            "id": uuid.uuid4().hex,
+            "audience_id": audience_id,
+            "name": fake.name(),
+            "role": role_en,
+            "company": f"{fake.company()} ({industry})",
+            "avatar": rng.choice(config["avatars"]),
+            "psychographics": rng.choice(PSYCHOGRAPHICS),
+            "past_behavior": f"Часто открывает письма про {industry}, но редко отвечает."
+        })
+    return rows
+
+def _bulk_insert(db, rows: list, commit: bool = True) -> None:
+    # Core executemany insert: no ORM identity map or per-object flush
+    db.execute(PersonaModel.__table__.insert(), rows)
+    if commit:
+        db.commit()
+
+def _create_audience(db, name: str, audience_type: str, commit: bool = True) -> int:
+    audience = AudienceModel(name=name, type=audience_type, description=f"Target audience for {name}")
+    db.add(audience)
+    if commit:
+        db.commit()
+    else:
+        db.flush()
+    return audience.id
+
+def _touch_audience(db, audience_id: int) -> None:
+    # Servers reload cached panels of an audience whose revision changed
+    db.query(AudienceModel).filter(AudienceModel.id == audience_id).update(
+        {AudienceModel.revision: func.coalesce(AudienceModel.revision, 0) + 1}
+    )
+
+def generate_audience(db, config: dict, count: int, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                      workers: int = 1, seed: int = 0, audience_id: int = None) -> int:
+    """
+    Generates `count` personas for a preset in chunks and bulk-inserts each chunk as it arrives.
+    With workers > 1 the chunks are generated in a process pool.
+    Returns the audience id.
+    """
+    if audience_id is None:
+        audience_id = _create_audience(db, config["name"], config["type"])
+
+    chunks = [
+        (config, audience_id, min(chunk_size, count - start), seed + index)
+        for index, start in enumerate(range(0, count, chunk_size))
+    ]
+
+    started = time.time()
+    written = 0
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for rows in pool.map(_generate_chunk, chunks):
+                _bulk_insert(db, rows)
+                written += len(rows)
+                print(f"    {written}/{count} personas ({time.time() - started:.1f}s)")
+    else:
+        for chunk in chunks:
+            rows = _generate_chunk(chunk)
+            _bulk_insert(db, rows)
+            written += len(rows)
+            if len(chunks) > 1:
+                print(f"    {written}/{count} personas ({time.time() - started:.1f}s)")
+    _touch_audience(db, audience_id)
+    db.commit()
+    return audience_id
+
+def _read_records(path: str, file_format: str):
+    """Streams records from a CSV (with a header row) or JSONL file"""
+    with open(path, encoding="utf-8", newline="") as f:
+        if file_format == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    print(f"    Skipping line {line_number}: {e}")
+
+def _record_to_row(record: dict, audience_id: int):
+    record = dict(record)
+    # Accept the API's camelCase field name as well as the column name
+    if "past_behavior" not in record and "pastBehavior" in record:
+        record["past_behavior"] = record["pastBehavior"]
+    if not record.get("role"):
+        return None
+    row = {field: str(record.get(field) or "") for field in PERSONA_FIELDS}
+    row["id"] = str(record.get("id") or uuid.uuid4().hex)
+    row["audience_id"] = audience_id
+    return row
+
+def _check_ids(db, rows: list, seen: set) -> None:
+    """Raises PersonaImportError if an id repeats within the file or already exists in the database"""
+    ids = [row["id"] for row in rows]
+    for persona_id in ids:
+        if persona_id in seen:
+            raise PersonaImportError(f"Duplicate persona id {persona_id!r} in the import file")
+        seen.add(persona_id)
+    existing = db.execute(select(PersonaModel.__table__.c.id).where(PersonaModel.__table__.c.id.in_(ids))).scalars().first()
+    if existing is not None:
+        raise PersonaImportError(f"Persona id {existing!r} already exists in the database; "
+                                 f"was this file imported before?")
+
+def import_audience(db, path: str, name: str = None, audience_type: str = "B2B",
+                    audience_id: int = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Streams personas from a CSV or JSONL file into an audience with bulk inserts.
+    Columns: name, role, company, avatar, psychographics, past_behavior (or pastBehavior)
+    and an optional id. Records without a role are skipped.
+    The audience and all its personas are written in one transaction: an id that
+    repeats in the file or already exists raises PersonaImportError and nothing is kept.
+    Returns the audience id.
+    """
+    file_format = "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+    try:
+        if audience_id is None:
+            name = name or os.path.splitext(os.path.basename(path))[0]
+            audience_id = _create_audience(db, name, audience_type, commit=False)
+
+        started = time.time()
+        written = 0
+        skipped = 0
+        seen = set()
+        rows = []
+        for record in _read_records(path, file_format):
+            row = _record_to_row(record, audience_id)
+            if row is None:
+                skipped += 1
+                continue
+            rows.append(row)
+            if len(rows) >= chunk_size:
+                _check_ids(db, rows, seen)
+                _bulk_insert(db, rows, commit=False)
+                written += len(rows)
+                rows = []
+                print(f"    {written} personas ({time.time() - started:.1f}s)")
+        if rows:
+            _check_ids(db, rows, seen)
+            _bulk_insert(db, rows, commit=False)
+            written += len(rows)
+        _touch_audience(db, audience_id)
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        raise PersonaImportError(f"Import rejected by the database: {e.orig}") from e
+    except BaseException:
+        db.rollback()
+        raise
+
+    print(f"  Imported {written} personas into audience {audience_id} ({skipped} skipped)")
+    return audience_id
+
+def index_embeddings(audience_id: int) -> int:
+    """
+    Precomputes the persona embeddings of an audience (see embedding_store), so
+    its first simulation does not have to encode every persona. Returns the count.
+    """
+    # The backend modules import each other by their plain names
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    if backend_dir not in sys.path:
+        sys.path.insert(0, backend_dir)
+    from embedding_store import PersonaEmbeddingStore
+    from llm_service import EmbeddingService
+
+    started = time.time()
+    count = PersonaEmbeddingStore(EmbeddingService()).index_audience(audience_id)
+    if count:
+        print(f"  Encoded embeddings of {count} personas ({time.time() - started:.1f}s)")
+    return count
+
+def populate(embed: bool = True):
     print("Initializing DB...")
     init_db()
     db = SessionLocal()
-    
+
     # Clear existing data (optional, but good for clean state)
     # db.query(PersonaModel).delete()
     # db.query(AudienceModel).delete()
     # db.commit()
-    
-    if db.query(AudienceModel).count() > 0:
-        print("Audiences already exist. Skipping population.")
-        return
 
-    audiences_config = [
-        {
-            "name": "Технические лидеры (CTO, VP Eng)",
-            "type": "B2B",
-            "count": 12,
-            "roles": [('CTO', 'Технический директор'), ('VP Engineering', 'VP разработки'), ('Tech Lead', 'Тимлид')],
-            "industries": ['FinTech', 'SaaS', 'CyberSecurity'],
-            "avatars": ['👨‍💻', '🧑‍💻', '👓']
-        },
-        {
-            "name": "HR Директора",
-            "type": "B2B",
-            "count": 10,
-            "roles": [('HR Director', 'HR Директор'), ('Head of Recruitment', 'Руководитель подбора')],
-            "industries": ['Retail', 'IT', 'Banking'],
-            "avatars": ['👩‍💼', '🧑‍💼', '📋']
-        },
-        {
-            "name": "Маркетологи (SaaS)",
-            "type": "B2B",
-            "count": 15,
-            "roles": [('CMO', 'Директор по маркетингу'), ('Growth Manager', 'Менеджер по росту')],
-            "industries": ['SaaS', 'EdTech', 'MarTech'],
-            "avatars": ['🚀', '📈', '👩‍🎨']
-        },
-        {
-            "name": "E-commerce Owners",
-            "type": "B2C",
-            "count": 10,
-            "roles": [('Founder', 'Основатель'), ('Owner', 'Владелец')],
-            "industries": ['Fashion', 'Electronics', 'Home Decor'],
-            "avatars": ['🛍️', '📦', '💎']
-        }
-    ]
+    try:
+        if db.query(AudienceModel).count() > 0:
+            print("Audiences already exist. Skipping population.")
+            return
 
-    PSYCHOGRAPHICS = [
-        "Прагматик, ценит краткость и цифры.",
-        "Визионер, ищет новые возможности для роста.",
-        "Скептик, требует доказательств и кейсов.",
-        "Новатор, любит тестировать новые инструменты.",
-        "Консерватор, предпочитает проверенные решения."
-    ]
+        print("Generating audiences...")
+        for index, config in enumerate(AUDIENCE_PRESETS.values()):
+            print(f"  - Creating '{config['name']}' with {config['count']} personas...")
+            audience_id = generate_audience(db, config, config["count"], seed=index * 1_000_003)
+            if embed:
+                index_embeddings(audience_id)
+
+        print("Done! Database populated.")
+    finally:
+        db.close()
 
-    print("Generating audiences...")
-    
-    persona_id_counter = 1
-    
-    for config in audiences_config:
-        audience = AudienceModel(
-            name=config["name"],
-            type=config["type"],
-            description=f"Target audience for {config['name']}"
-        )
-        db.add(audience)
-        db.flush() # Get ID
-        
-        print(f"  - Creating '{config['name']}' with {config['count']} personas...")
-        
-        for _ in range(config["count"]):
-            role_en, role_ru = random.choice(config["roles"])
-            industry = random.choice(config["industries"])
-            
-            persona = PersonaModel(
-                id=str(persona_id_counter),
-                audience_id=audience.id,
-                name=fake.name(),
-                role=role_en,
-                company=f"{fake.company()} ({industry})",
-                avatar=random.choice(config["avatars"]),
-                psychographics=random.choice(PSYCHOGRAPHICS),
-                past_behavior=f"Часто открывает письма про {industry}, но редко отвечает."
+def main():
+    parser = argparse.ArgumentParser(description="Populate the persona database")
+    commands = parser.add_subparsers(dest="command")
+
+    parser.add_argument("--no-embed", action="store_true",
+                        help="Skip precomputing persona embeddings (they are then computed on first use)")
+    commands.add_parser("demo", help="Create the demo audiences (default)")
+
+    generate = commands.add_parser("generate", help="Generate a large synthetic audience")
+    generate.add_argument("--preset", choices=sorted(AUDIENCE_PRESETS), default="tech_leaders")
+    generate.add_argument("--count", type=int, required=True)
+    generate.add_argument("--name", help="Audience name (defaults to the preset name)")
+    generate.add_argument("--audience-id", type=int, help="Append to an existing audience")
+    generate.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    generate.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    generate.add_argument("--seed", type=int, default=0)
+
+    load = commands.add_parser("import", help="Import an audience from a CSV or JSONL file")
+    load.add_argument("path")
+    load.add_argument("--name", help="Audience name (defaults to the file name)")
+    load.add_argument("--type", default="B2B")
+    load.add_argument("--audience-id", type=int, help="Append to an existing audience")
+    load.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+
+    args = parser.parse_args()
+    if args.command in (None, "demo"):
+        populate(embed=not args.no_embed)
+        return
+
+    init_db()
+    db = SessionLocal()
+    try:
+        started = time.time()
+        if args.command == "generate":
+            config = dict(AUDIENCE_PRESETS[args.preset])
+            if args.name:
+                config["name"] = args.name
+            audience_id = generate_audience(
+                db, config, args.count, chunk_size=args.chunk_size,
+                workers=args.workers, seed=args.seed, audience_id=args.audience_id
             )
-            db.add(persona)
-            persona_id_counter += 1
-            
-    db.commit()
-    print("Done! Database populated.")
-    db.close()
+        else:
+            try:
+                audience_id = import_audience(
+                    db, args.path, name=args.name, audience_type=args.type,
+                    audience_id=args.audience_id, chunk_size=args.chunk_size
+                )
+            except PersonaImportError as e:
+                print(f"Import failed, nothing was written: {e}", file=sys.stderr)
+                sys.exit(1)
+        if not args.no_embed:
+            index_embeddings(audience_id)
+        print(f"Done! Audience {audience_id} ready in {time.time() - started:.1f}s")
+    finally:
+        db.close()
 
 if __name__ == "__main__":
-    populate()
+    # python -m backend.populate_db [--no-embed] [demo | generate --count N | import FILE]
+    main()
@@ -1,7 +1,8 @@
 from faker import Faker
 import random
 from models import Persona
-from database import SessionLocal, PersonaModel, init_db
+from sqlalchemy import and_, case, func
+from database import SessionLocal, PersonaModel
 
 fake = Faker('ru_RU')
 
@@ -24,63 +25,162 @@ PSYCHOGRAPHICS = [
     "Консерватор, предпочитает проверенные решения."
 ]
 
-def generate_personas(count: int = 5, audience_id: str = None) -> list[Persona]:
-    # Ensure DB is initialized (create tables if not exist)
-    try:
-        init_db()
-    except Exception as e:
-        print(f"DB Init failed (check connection): {e}")
-        # Fallback to in-memory generation if DB fails
-        return _generate_random_personas(count)
+# Only the columns Persona needs are selected, never full ORM objects
+PERSONA_COLUMNS = (
+    PersonaModel.id,
+    PersonaModel.name,
+    PersonaModel.role,
+    PersonaModel.company,
+    PersonaModel.avatar,
+    PersonaModel.psychographics,
+    PersonaModel.past_behavior
+)
 
+# Max bound parameters per IN (...) clause
+_IN_CHUNK_SIZE = 500
+
+SAMPLING_STRATEGIES = ('random', 'id_range', 'stratified_role', 'stratified_industry')
+
+def generate_personas(count: int = 5, audience_id: str = None, strategy: str = 'random') -> list[Persona]:
+    """
+    Samples `count` personas of an audience inside the database.
+    Strategies:
+      random              - ORDER BY random() LIMIT count
+      id_range            - orders only the indexed ids at random, then loads the chosen rows
+      stratified_role     - proportional allocation per role, random rows within each role
+      stratified_industry - proportional allocation per industry (from the company suffix);
+                            strata are counted with GROUP BY and sampled per stratum in SQL
+    The schema is created at application startup (init_db), not here.
+    """
     db = SessionLocal()
     
     try:
-        query = db.query(PersonaModel)
-        
+        aud_id_int = None
         if audience_id:
             try:
                 aud_id_int = int(audience_id)
-                query = query.filter(PersonaModel.audience_id == aud_id_int)
                 print(f"Filtering by audience_id: {aud_id_int}")
             except ValueError:
                 print(f"Invalid audience_id: {audience_id}")
+
+        if strategy == 'id_range':
+            rows = _sample_by_ids(db, aud_id_int, count)
+        elif strategy == 'stratified_role':
+            rows = _sample_stratified_by_role(db, aud_id_int, count)
+        elif strategy == 'stratified_industry':
+            rows = _sample_stratified_by_industry(db, aud_id_int, count)
+        else:
+            rows = _audience_query(db, aud_id_int, *PERSONA_COLUMNS).order_by(func.random()).limit(count).all()
         
-        # Get all matching personas first to see how many we have
-        available_personas = query.all()
-        
-        if not available_personas:
+        if not rows:
              print(f"No personas found for audience {audience_id}. Generating random ones.")
              return _generate_random_personas(count)
 
-        # If we need more than available, we might need to duplicate or just return what we have
-        # For now, let's just return a random sample of the requested size from the available ones
-        # If requested count is larger than available, return all available (or loop? let's return all available for now)
-        
-        import random
-        selected_models = []
-        if len(available_personas) <= count:
-            selected_models = available_personas
-        else:
-            selected_models = random.sample(available_personas, count)
-            
-        print(f"Loaded {len(selected_models)} personas from DB (requested {count}).")
+        # If requested count is larger than available, all available personas are returned
+        print(f"Loaded {len(rows)} personas from DB (requested {count}, strategy {strategy}).")
         
-        return [Persona(
-            id=p.id,
-            name=p.name,
-            role=p.role,
-            company=p.company,
-            avatar=p.avatar,
-            psychographics=p.psychographics,
-            pastBehavior=p.past_behavior
-        ) for p in selected_models]
+        return [row_to_persona(r) for r in rows]
     except Exception as e:
         print(f"DB Error: {e}")
         return _generate_random_personas(count)
     finally:
         db.close()
 
+def row_to_persona(row) -> Persona:
+    return Persona(
+        id=row.id,
+        name=row.name,
+        role=row.role,
+        company=row.company,
+        avatar=row.avatar,
+        psychographics=row.psychographics,
+        pastBehavior=row.past_behavior
+    )
+
+def _audience_query(db, audience_id, *columns):
+    query = db.query(*columns)
+    if audience_id is not None:
+        query = query.filter(PersonaModel.audience_id == audience_id)
+    return query
+
+def load_rows_by_ids(db, ids: list) -> list:
+    """Loads persona rows (projected columns) for the given ids, in the same order"""
+    rows = []
+    for start in range(0, len(ids), _IN_CHUNK_SIZE):
+        chunk = ids[start:start + _IN_CHUNK_SIZE]
+        rows.extend(db.query(*PERSONA_COLUMNS).filter(PersonaModel.id.in_(chunk)).all())
+    # Keep the sampled order
+    position = {pid: i for i, pid in enumerate(ids)}
+    return sorted(rows, key=lambda r: position[r.id])
+
+def _sample_by_ids(db, audience_id, count: int) -> list:
+    # The random order is computed over the (audience_id, id) index alone, so no
+    # persona text is read for rows that are not selected and no ids leave the database.
+    ids = [pid for (pid,) in _audience_query(db, audience_id, PersonaModel.id).order_by(func.random()).limit(count)]
+    return load_rows_by_ids(db, ids)
+
+def allocate_strata(strata_sizes: dict, count: int) -> dict:
+    """Proportional allocation of `count` draws over strata (largest remainder method)"""
+    total = sum(strata_sizes.values())
+    if total <= count:
+        return dict(strata_sizes)
+    quotas = {k: count * size / total for k, size in strata_sizes.items()}
+    allocation = {k: int(q) for k, q in quotas.items()}
+    remaining = count - sum(allocation.values())
+    for k in sorted(quotas, key=lambda k: quotas[k] - allocation[k], reverse=True)[:remaining]:
+        allocation[k] += 1
+    return allocation
+
+def _sample_stratified_by_role(db, audience_id, count: int) -> list:
+    strata = dict(
+        _audience_query(db, audience_id, PersonaModel.role, func.count(PersonaModel.id))
+        .group_by(PersonaModel.role).all()
+    )
+    rows = []
+    for role, k in allocate_strata(strata, count).items():
+        if k > 0:
+            rows.extend(
+                _audience_query(db, audience_id, *PERSONA_COLUMNS)
+                .filter(PersonaModel.role == role)
+                .order_by(func.random()).limit(k).all()
+            )
+    random.shuffle(rows)
+    return rows
+
+def industry_of(company: str) -> str:
+    """Industry is stored as a suffix of the company name: 'Acme (FinTech)'"""
+    if company and company.endswith(')') and '(' in company:
+        return company[company.rindex('(') + 1:-1]
+    return 'Other'
+
+# industry_of() in SQL. rtrim() with every character but '(' strips the company
+# name back to its last '(', so the prefix length locates the suffix.
+_company_prefix = func.rtrim(PersonaModel.company, func.replace(PersonaModel.company, '(', ''))
+INDUSTRY = case(
+    (
+        and_(PersonaModel.company.like('%)'), func.length(_company_prefix) > 0),
+        func.substr(
+            PersonaModel.company,
+            func.length(_company_prefix) + 1,
+            func.length(PersonaModel.company) - func.length(_company_prefix) - 1
+        )
+    ),
+    else_='Other'
+)
+
+def _sample_stratified_by_industry(db, audience_id, count: int) -> list:
+    strata = dict(_audience_query(db, audience_id, INDUSTRY, func.count(PersonaModel.id)).group_by(INDUSTRY).all())
+    ids = []
+    for industry, k in allocate_strata(strata, count).items():
+        if k > 0:
+            ids.extend(
+                pid for (pid,) in _audience_query(db, audience_id, PersonaModel.id)
+                .filter(INDUSTRY == industry)
+                .order_by(func.random()).limit(k)
+            )
+    random.shuffle(ids)
+    return load_rows_by_ids(db, ids)
+
 def _generate_random_personas(count: int) -> list[Persona]:
     print("Fallback: Generating random personas (DB unavailable)")
     personas = []
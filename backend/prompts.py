@@ -72,6 +72,41 @@ Respond ONLY with valid JSON (no extra text, no markdown):
 }}
 
 Valid final_action values: "clicked", "replied", "opened"
+"""
+
+    @staticmethod
+    def single_pass(persona: Persona, draft: EmailDraft, relevance_score: float) -> str:
+        return f"""
+You are {persona.name}, a {persona.role} at {persona.company}. 
+Your psychographic profile: {persona.psychographics}
+Your past behavior: {persona.pastBehavior}
+
+Task: You are checking your inbox. You see a new email.
+
+Email Subject: "{draft.subject}"
+Relevance Score: {relevance_score:.2f} (0.00 = irrelevant, 1.00 = perfect match)
+CTA: "{draft.cta}"
+
+Step 1 - Inbox scan. Based on the subject, relevance to your role and industry,
+and your psychographic profile, decide: "opened", "ignored", or "spam".
+
+Step 2 - Only if you opened the email: decide about the Call to Action (CTA).
+Make a final decision: "clicked" (clicked the CTA), "replied" (sent a reply), or "opened" (just read and closed).
+If replying, write a realistic response text in Russian matching your persona.
+If you did not open the email, set "final_action" to null.
+
+Respond ONLY with valid JSON (no extra text, no markdown):
+{{
+    "thought_process": "Brief explanation in Russian",
+    "action": "opened",
+    "reason": "One sentence explanation in Russian",
+    "internal_monologue": "Your thoughts about the CTA in Russian, or null",
+    "final_action": "clicked",
+    "reply_text": "Your reply if applicable, otherwise null, in Russian"
+}}
+
+Valid action values: "opened", "ignored", "spam"
+Valid final_action values: "clicked", "replied", "opened", null
 """
 
     @staticmethod
@@ -0,0 +1,148 @@
+import asyncio
+import bisect
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+from config import IDEMPOTENCY_TTL, IDEMPOTENCY_MAX_RUNS, IDEMPOTENCY_DETACH_GRACE, logger
+
+class IdempotencyConflictError(ValueError):
+    """An Idempotency-Key was reused with a different request body"""
+
+def fingerprint(payload: dict) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+class Run:
+    """
+    A simulation running independently of the request that started it.
+    Events are buffered so any number of subscribers can replay and follow it.
+    """
+    def __init__(self, key: str, request_fingerprint: str, detach_grace: float = None):
+        self.key = key
+        self.fingerprint = request_fingerprint
+        self.events = []  # (sequence number, event)
+        self.done = False
+        self.failed = False
+        self.finished_at = None
+        self.task = None
+        self._followers = 0
+        self._compacted = False
+        self.detach_grace = detach_grace if detach_grace is not None else IDEMPOTENCY_DETACH_GRACE
+        self._abandon_timer = None
+        self._changed = asyncio.Condition()
+
+    async def _publish(self, event: dict) -> None:
+        async with self._changed:
+            self.events.append((len(self.events), event))
+            self._changed.notify_all()
+
+    async def _drive(self, make_stream: Callable) -> None:
+        try:
+            async for event in make_stream():
+                await self._publish(event)
+        except asyncio.CancelledError:
+            logger.info(f"Run {self.key} cancelled: no client attached for {self.detach_grace}s")
+            self.failed = True
+            await self._publish({"type": "cancelled", "message": "All clients disconnected"})
+        except Exception as e:
+            logger.error(f"Run {self.key} failed: {e}")
+            self.failed = True
+            await self._publish({"type": "error", "message": str(e)})
+        finally:
+            async with self._changed:
+                self.done = True
+                self.finished_at = time.time()
+                if not self._followers:
+                    self._compact()
+                self._changed.notify_all()
+
+    def _compact(self) -> None:
+        # Finished runs only need to replay their outcome
+        self.events = [(seq, e) for seq, e in self.events if e["type"] != "progress"]
+        self._compacted = True
+
+    def _index_after(self, seq: int) -> int:
+        if not self._compacted:
+            return seq + 1  # Sequence numbers are still list positions
+        return bisect.bisect_right([s for s, _ in self.events], seq)
+
+    async def follow(self):
+        """Replays the run's events so far, then streams new ones until it ends"""
+        # Progress events are kept until the last follower is done with them
+        self._followers += 1
+        if self._abandon_timer is not None:
+            self._abandon_timer.cancel()
+            self._abandon_timer = None
+        last = -1
+        try:
+            while True:
+                async with self._changed:
+                    await self._changed.wait_for(lambda: self.done or (self.events and self.events[-1][0] > last))
+                    pending = self.events[self._index_after(last):]
+                    done = self.done
+                for seq, event in pending:
+                    last = seq
+                    yield event
+                if done:
+                    return
+        finally:
+            self._followers -= 1
+            if not self._followers:
+                if self.done:
+                    self._compact()
+                else:
+                    # Give a retry the chance to re-attach before the work is thrown away
+                    self._abandon_timer = asyncio.get_running_loop().call_later(self.detach_grace, self._abandon)
+
+    def _abandon(self) -> None:
+        self._abandon_timer = None
+        if not self._followers and not self.done:
+            self.task.cancel()
+
+class RunRegistry:
+    """
+    In-flight and recently finished runs by Idempotency-Key.
+    Finished runs are kept for IDEMPOTENCY_TTL seconds, at most IDEMPOTENCY_MAX_RUNS of them.
+    The registry is per process; workers do not see each other's in-flight runs.
+    """
+    def __init__(self, ttl: int = None, max_runs: int = None):
+        self.ttl = ttl if ttl is not None else IDEMPOTENCY_TTL
+        self.max_runs = max_runs if max_runs is not None else IDEMPOTENCY_MAX_RUNS
+        self._runs = OrderedDict()
+
+    def get(self, key: str, request_fingerprint: str) -> Optional[Run]:
+        self._evict()
+        run = self._runs.get(key)
+        if run is None:
+            return None
+        if run.fingerprint != request_fingerprint:
+            raise IdempotencyConflictError("Idempotency-Key was already used with a different request")
+        # A failed run is not an outcome worth replaying; a retry starts over
+        return None if run.failed else run
+
+    def start(self, key: str, request_fingerprint: str, make_stream: Callable) -> Run:
+        """Starts a run that drives `make_stream()` (an async event generator) in the background"""
+        run = Run(key, request_fingerprint)
+        run.task = asyncio.create_task(run._drive(make_stream))
+        self._runs[key] = run
+        return run
+
+    def _evict(self) -> None:
+        now = time.time()
+        for key in [k for k, r in self._runs.items() if r.done and now - r.finished_at > self.ttl]:
+            del self._runs[key]
+        finished = [k for k, r in self._runs.items() if r.done]
+        for key in finished[:max(0, len(finished) - self.max_runs)]:
+            del self._runs[key]
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_registry() -> RunRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = RunRegistry()
+        return _registry
@@ -1,26 +1,100 @@
+import asyncio
 import json
+import random
 import time
 import re
-from typing import List
-from models import EmailDraft, Persona, SimulationResult, Response, Metrics, Insight
-from llm_service import BaseLLM, MockLLM, OpenAILLM, EmbeddingService, LLMError
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+from models import EmailDraft, VariantBatch, Persona, SimulationResult, Response, Metrics, MetricInterval, Insight
+from llm_service import (
+    BaseLLM, AsyncBaseLLM, AsyncLLMAdapter, MockLLM, OpenAILLM, AsyncOpenAILLM,
+    EmbeddingService, LLMError
+)
+from llm_cache import LLMCache, AsyncCachedLLM, get_default_cache
+from llm_pool import PooledLLM, AsyncPooledLLM, get_pool
+from llm_scheduler import current_run
+from llm_streaming import current_prompt
+from embedding_store import PersonaEmbeddingStore, persona_context
 from profiles import generate_personas
+from panels import load_panel_personas
+from clustering import cluster_audience, pick_representatives
 from prompts import SimulationPrompts
-from config import logger
+from ids import new_id
+from stats import wilson_interval, paired_comparison
+from config import (
+    SIMULATION_CONCURRENCY, PRESCREEN_LOW_THRESHOLD, PRESCREEN_HIGH_THRESHOLD,
+    ADAPTIVE_BATCH_SIZE, ADAPTIVE_MAX_SAMPLE_SIZE, logger
+)
+
+# Actions counted by each rate in Metrics
+METRIC_ACTIONS = {
+    "openRate": ('opened',),
+    "clickRate": ('clicked',),
+    "replyRate": ('replied',),
+    "spamRate": ('spam',)
+}
+
+class RunStats:
+    """Per-run counters reported in simulation events"""
+    def __init__(self):
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.prescreened = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "cache": {"hits": self.cache_hits, "misses": self.cache_misses},
+            "prescreened": self.prescreened
+        }
+
+def _cancel_pending(tasks) -> None:
+    """Cancels persona tasks left over when a run's stream is closed early"""
+    pending = [task for task in tasks if not task.done()]
+    for task in pending:
+        task.cancel()
+    if pending:
+        logger.info(f"Run stopped early: cancelled {len(pending)} pending persona simulations")
 
 class Simulator:
-    def __init__(self, llm: BaseLLM = None):
+    def __init__(self, llm: BaseLLM = None, max_concurrency: int = None, async_llm: AsyncBaseLLM = None,
+                 cache: LLMCache = None):
         if llm:
             self.llm = llm
         else:
             try:
-                self.llm = OpenAILLM()
-                logger.info("Initialized OpenAI LLM for simulation")
+                if get_pool() is not None:
+                    self.llm = PooledLLM()
+                    logger.info(f"Initialized pooled LLM over {len(get_pool().endpoints)} servers for simulation")
+                else:
+                    self.llm = OpenAILLM()
+                    logger.info("Initialized OpenAI LLM for simulation")
             except Exception as e:
                 logger.warning(f"Failed to initialize OpenAI LLM: {e}, falling back to MockLLM")
                 self.llm = MockLLM()
         
+        if async_llm:
+            self.async_llm = async_llm
+        elif llm or isinstance(self.llm, MockLLM):
+            # An explicitly provided sync LLM is used by the async path as well
+            self.async_llm = AsyncLLMAdapter(self.llm)
+        else:
+            try:
+                self.async_llm = AsyncPooledLLM() if get_pool() is not None else AsyncOpenAILLM()
+            except Exception as e:
+                logger.warning(f"Failed to initialize async OpenAI LLM: {e}, using sync LLM in a thread pool")
+                self.async_llm = AsyncLLMAdapter(self.llm)
+        
         self.embedding_service = EmbeddingService()
+        self.embedding_store = PersonaEmbeddingStore(self.embedding_service)
+        self.max_concurrency = max(1, max_concurrency or SIMULATION_CONCURRENCY)
+        self.cache = cache if cache is not None else get_default_cache()
+
+    def warm_up(self) -> None:
+        """Loads the embedding model ahead of the first simulation"""
+        self.embedding_service.load()
+        if not self.embedding_service.use_fallback:
+            self.embedding_service.encode(["warm-up"])
 
     def _parse_llm_json(self, llm_response: str, fallback: dict = None) -> dict:
         """
@@ -64,98 +138,391 @@ class Simulator:
             return fallback or {}
 
     def run_simulation_stream(self, draft: EmailDraft):
+        """
+        Synchronous entry point. Drives the async engine on a private event loop,
+        running the sync LLM on a thread pool sized to max_concurrency.
+        """
+        yield from self._iterate_sync(lambda llm: self._simulation_events(draft, llm))
+
+    def run_batch_stream(self, batch: VariantBatch):
+        """Synchronous counterpart of run_batch_stream_async"""
+        yield from self._iterate_sync(lambda llm: self._batch_events(batch, llm))
+
+    def _iterate_sync(self, make_stream):
+        loop = asyncio.new_event_loop()
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        llm = AsyncLLMAdapter(self.llm, executor)
+        stream = make_stream(llm)
+        try:
+            while True:
+                try:
+                    event = loop.run_until_complete(stream.__anext__())
+                except StopAsyncIteration:
+                    break
+                yield event
+        finally:
+            # If the caller stopped early, queued LLM calls are dropped and retry
+            # sleeps end, so only requests already on the wire are waited for.
+            llm.cancel()
+            loop.run_until_complete(stream.aclose())
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.run_until_complete(loop.shutdown_default_executor())
+            executor.shutdown(wait=True, cancel_futures=True)
+            loop.close()
+
+    async def run_simulation_stream_async(self, draft: EmailDraft):
+        """Async entry point: LLM calls wait on the event loop instead of holding a thread"""
+        async for event in self._simulation_events(draft, self.async_llm):
+            yield event
+
+    async def run_batch_stream_async(self, batch: VariantBatch):
+        """
+        A/B simulation: every variant is run against the same persona panel.
+        Streams per-variant progress and results, then paired comparisons
+        of each variant against the first one.
+        """
+        async for event in self._batch_events(batch, self.async_llm):
+            yield event
+
+    async def _predict(self, llm: AsyncBaseLLM, prompt: str, stats: RunStats, step: str) -> str:
+        """One LLM call; `step` labels its latency samples (see llm_streaming.current_prompt)"""
+        token = current_prompt.set(step)
+        try:
+            if isinstance(llm, AsyncCachedLLM):
+                response, cache_hit = await llm.predict_with_info(prompt)
+                if cache_hit:
+                    stats.cache_hits += 1
+                else:
+                    stats.cache_misses += 1
+                return response
+            return await llm.predict(prompt)
+        finally:
+            current_prompt.reset(token)
+
+    async def _simulation_events(self, draft: EmailDraft, llm: AsyncBaseLLM):
         logger.info(f"Starting simulation for audience: {draft.audience}")
-        personas = generate_personas(draft.sample_size, audience_id=draft.audience)
-        responses = []
-        
-        open_count = 0
-        click_count = 0
-        reply_count = 0
-        spam_count = 0
-        ignore_count = 0
-        read_count = 0
-        forward_count = 0
+        if self.cache is not None:
+            llm = AsyncCachedLLM(llm, self.cache)
+        stats = RunStats()
+        result_id = new_id()
+        yield {"type": "start", "id": result_id}
+        adaptive = draft.adaptive and not draft.clustered
+        budget = draft.sample_size
+        if adaptive:
+            budget = max(draft.sample_size, draft.max_sample_size or ADAPTIVE_MAX_SAMPLE_SIZE)
+        weights = None
+        if draft.clustered:
+            # Representatives of persona clusters, weighted by cluster size
+            personas, weights, cluster_count, population = await asyncio.to_thread(self._draw_representatives, draft)
+            yield {
+                "type": "clusters",
+                "clusters": cluster_count,
+                "representatives": len(personas),
+                "population": population
+            }
+        else:
+            personas = await asyncio.to_thread(self._draw_personas, draft, budget)
 
         total = len(personas)
-        logger.info(f"Simulating {total} personas")
+        logger.info(f"Simulating up to {total} personas (concurrency: {self.max_concurrency})")
+        relevance_scores = await asyncio.to_thread(self._score_relevance, draft, personas)
+        self._warn_if_prescreen_skipped([draft])
+
+        # Responses are stored by persona position so the result does not
+        # depend on the order in which the personas finish.
+        responses = [None] * total
+        completed = 0
+        target_hits = 0
+        target_actions = METRIC_ACTIONS[draft.target_metric]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def simulate(index: int, persona: Persona):
+            current_run.set(result_id)
+            async with semaphore:
+                return index, await self._simulate_persona_safe(draft, persona, relevance_scores[index], llm, stats)
 
-        for i, p in enumerate(personas):
+        # Non-adaptive runs are a single round over the whole sample
+        round_end = min(draft.sample_size, total) if adaptive else total
+        while True:
+            tasks = [asyncio.ensure_future(simulate(i, personas[i])) for i in range(completed, round_end)]
             try:
-                response = self._simulate_single_persona(draft, p)
-                responses.append(response)
-                
-                # Update counts
-                if response.action == 'opened': open_count += 1
-                if response.action == 'clicked': click_count += 1
-                if response.action == 'replied': reply_count += 1
-                if response.action == 'spam': spam_count += 1
-                if response.action == 'ignored': ignore_count += 1
-                
-                # Heuristics for other metrics based on action
-                if response.action in ['opened', 'clicked', 'replied']:
-                    read_count += 1
-                
-                # Random forward
-                if response.action == 'clicked' and hash(p.id) % 5 == 0:
-                    forward_count += 1
-                
-            except Exception as e:
-                logger.error(f"Error simulating persona {p.name}: {e}")
-                # Add fallback response
-                responses.append(Response(
-                    persona=p,
-                    action='ignored',
-                    sentiment='neutral',
-                    comment='Simulation error occurred',
-                    detailedReasoning=f'Error: {str(e)}'
-                ))
-                ignore_count += 1
-            
-            # Yield progress
-            yield {
-                "type": "progress",
-                "current": i + 1,
-                "total": total
-            }
+                for next_done in asyncio.as_completed(tasks):
+                    index, response = await next_done
+                    if weights is not None:
+                        response.weight = weights[index]
+                    responses[index] = response
+                    completed += 1
+                    if response.action in target_actions:
+                        target_hits += 1
+                    low, high = wilson_interval(target_hits, completed)
+                    yield {
+                        "type": "progress",
+                        "current": completed,
+                        "total": total,
+                        "response": response.dict(),
+                        "interval": {
+                            "metric": draft.target_metric,
+                            "low": round(low * 100, 1),
+                            "high": round(high * 100, 1)
+                        },
+                        **stats.to_dict()
+                    }
+            finally:
+                _cancel_pending(tasks)
 
-        # Calculate metrics
-        metrics = Metrics(
-            openRate=int((open_count / total) * 100) if total > 0 else 0,
-            clickRate=int((click_count / total) * 100) if total > 0 else 0,
-            replyRate=int((reply_count / total) * 100) if total > 0 else 0,
-            spamRate=int((spam_count / total) * 100) if total > 0 else 0,
-            ignoreRate=int((ignore_count / total) * 100) if total > 0 else 0,
-            forwardRate=int((forward_count / total) * 100) if total > 0 else 0,
-            readRate=int((read_count / total) * 100) if total > 0 else 0
-        )
+            if completed >= total:
+                break
+            low, high = wilson_interval(target_hits, completed)
+            if (high - low) * 100 <= draft.ci_width:
+                logger.info(f"Adaptive stop after {completed} personas: {draft.target_metric} "
+                            f"interval {low * 100:.1f}-{high * 100:.1f}%")
+                break
+            round_end = min(completed + ADAPTIVE_BATCH_SIZE, total)
+
+        responses = responses[:completed]
+        result = await self._build_result(draft, responses, llm, stats, result_id=result_id)
+        
+        logger.info(f"Simulation LLM cache: {stats.cache_hits} hits, {stats.cache_misses} misses; "
+                    f"{stats.prescreened} personas pre-screened")
+        yield {
+            "type": "result",
+            "data": result.dict(),
+            **stats.to_dict()
+        }
+        logger.info("Simulation completed successfully")
+
+    def _draw_personas(self, draft: EmailDraft, count: int) -> List[Persona]:
+        if draft.panel_id:
+            personas = load_panel_personas(draft.panel_id, draft.audience)
+            # Panels are stored in a seeded random order, so adaptive runs can
+            # walk them as stored and stay repeatable
+            return personas[:count] if draft.adaptive else personas
+        personas = generate_personas(count, audience_id=draft.audience, strategy=draft.sampling)
+        if draft.adaptive:
+            # Adaptive rounds take a prefix of the sample, which must not follow any
+            # order the sampler returned the personas in
+            random.shuffle(personas)
+        return personas
+
+    def _draw_representatives(self, draft: EmailDraft):
+        """Clusters the audience and returns (personas, weights, cluster count, audience size)"""
+        try:
+            audience_id = int(draft.audience)
+        except ValueError:
+            audience_id = None
+        clusters, population = cluster_audience(audience_id, draft.max_clusters, self.embedding_service)
+        if not clusters:
+            personas = generate_personas(draft.sample_size, audience_id=draft.audience)
+            return personas, [1.0] * len(personas), 0, len(personas)
+        chosen = pick_representatives(clusters, draft.representatives_per_cluster)
+        return [p for p, _ in chosen], [w for _, w in chosen], len(clusters), population
+
+    async def _build_result(self, draft: EmailDraft, responses: List[Response], llm: AsyncBaseLLM,
+                            stats: RunStats, result_id: str = None) -> SimulationResult:
+        metrics = self._calculate_metrics(responses)
 
         logger.info(f"Simulation metrics: {metrics.dict()}")
-        insights = self._generate_insights(draft, metrics, responses)
+        insights = await self._generate_insights(draft, metrics, responses, llm, stats)
 
-        result = SimulationResult(
-            id=str(int(time.time())),
+        return SimulationResult(
+            id=result_id or new_id(),
             timestamp=int(time.time() * 1000),
             metrics=metrics,
             insights=insights,
             responses=responses
         )
-        
+
+    async def _batch_events(self, batch: VariantBatch, llm: AsyncBaseLLM):
+        variants = batch.variants
+        panel_draft = variants[0]
+        logger.info(f"Starting A/B simulation of {len(variants)} variants for audience: {panel_draft.audience}")
+        if self.cache is not None:
+            llm = AsyncCachedLLM(llm, self.cache)
+        stats = RunStats()
+        batch_id = new_id()
+        result_ids = [f"{batch_id}-{v}" for v in range(len(variants))]
+        yield {"type": "start", "ids": result_ids}
+
+        # One persona panel and one relevance pass for all subjects
+        personas = await asyncio.to_thread(self._draw_personas, panel_draft, panel_draft.sample_size)
+        total = len(personas)
+        relevance = await asyncio.to_thread(
+            self._score_relevance_many, [v.subject for v in variants], personas
+        )
+        self._warn_if_prescreen_skipped(variants)
+
+        responses = [[None] * total for _ in variants]
+        completed = [0] * len(variants)
+        results = [None] * len(variants)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def simulate(v: int, index: int):
+            current_run.set(batch_id)
+            async with semaphore:
+                response = await self._simulate_persona_safe(
+                    variants[v], personas[index], float(relevance[v][index]), llm, stats
+                )
+                return v, index, response
+
+        # All (variant, persona) calls go through the same scheduler, interleaved
+        # by persona so every variant progresses at the same pace.
+        tasks = [
+            asyncio.ensure_future(simulate(v, i))
+            for i in range(total) for v in range(len(variants))
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                v, index, response = await next_done
+                responses[v][index] = response
+                completed[v] += 1
+                yield {
+                    "type": "progress",
+                    "variant": v,
+                    "current": completed[v],
+                    "total": total,
+                    "response": response.dict(),
+                    **stats.to_dict()
+                }
+                if completed[v] == total:
+                    results[v] = await self._build_result(
+                        variants[v], responses[v], llm, stats, result_id=result_ids[v]
+                    )
+                    yield {
+                        "type": "variant_result",
+                        "variant": v,
+                        "data": results[v].dict()
+                    }
+        finally:
+            _cancel_pending(tasks)
+
+        if total == 0:
+            for v, draft in enumerate(variants):
+                results[v] = await self._build_result(draft, [], llm, stats, result_id=result_ids[v])
+                yield {"type": "variant_result", "variant": v, "data": results[v].dict()}
+
+        comparisons = []
+        for v in range(1, len(variants)):
+            comparison = {"baseline": 0, "variant": v}
+            for metric, actions in METRIC_ACTIONS.items():
+                comparison[metric] = paired_comparison(
+                    [r.action in actions for r in responses[0]],
+                    [r.action in actions for r in responses[v]]
+                )
+            comparisons.append(comparison)
+
         yield {
-            "type": "result",
-            "data": result.dict()
+            "type": "comparison",
+            "data": comparisons,
+            **stats.to_dict()
         }
-        logger.info("Simulation completed successfully")
+        logger.info("A/B simulation completed successfully")
 
-    def _simulate_single_persona(self, draft: EmailDraft, persona: Persona) -> Response:
-        # Calculate relevance score
-        persona_context = f"{persona.role} {persona.company} {persona.psychographics} {persona.pastBehavior}"
-        relevance_score = self.embedding_service.get_similarity(draft.subject, persona_context)
+    async def _simulate_persona_safe(self, draft: EmailDraft, persona: Persona, relevance_score: float,
+                                     llm: AsyncBaseLLM, stats: RunStats) -> Response:
+        """Simulate one persona, turning any failure into an 'ignored' response"""
+        try:
+            return await self._simulate_single_persona(draft, persona, relevance_score, llm, stats)
+        except Exception as e:
+            logger.error(f"Error simulating persona {persona.name}: {e}")
+            return Response(
+                persona=persona,
+                action='ignored',
+                sentiment='neutral',
+                comment='Simulation error occurred',
+                detailedReasoning=f'Error: {str(e)}'
+            )
+
+    def _score_relevance(self, draft: EmailDraft, personas: List[Persona]) -> List[float]:
+        """Relevance of the subject to every persona in the sample"""
+        return self._score_relevance_many([draft.subject], personas)[0].tolist()
+
+    def _score_relevance_many(self, subjects: List[str], personas: List[Persona]):
+        """
+        Relevance of each subject to each persona, as a (len(subjects), len(personas)) array.
+        Uses the persisted persona embeddings: one batched subject encode plus one
+        matrix product, instead of encoding both texts per persona.
+        """
+        matrix = self.embedding_store.matrix_for(personas)
+        if matrix is not None:
+            try:
+                return self.embedding_service.similarity_to_embeddings(subjects, matrix)
+            except Exception as e:
+                logger.error(f"Batch relevance scoring failed: {e}")
         
+        contexts = [persona_context(p) for p in personas]
+        return self.embedding_service.similarity_many_to_many(subjects, contexts)
+
+    def _calculate_metrics(self, responses: List[Response]) -> Metrics:
+        """
+        Rates over the sample. Responses carry a weight (1 unless they represent a
+        persona cluster); rates are weighted and intervals use the Kish effective
+        sample size.
+        """
+        total = sum(r.weight for r in responses)
+        effective_n = total ** 2 / sum(r.weight ** 2 for r in responses) if responses else 0
+
+        open_count = 0
+        click_count = 0
+        reply_count = 0
+        spam_count = 0
+        ignore_count = 0
+        read_count = 0
+        forward_count = 0
+
+        for response in responses:
+            w = response.weight
+            if response.action == 'opened': open_count += w
+            if response.action == 'clicked': click_count += w
+            if response.action == 'replied': reply_count += w
+            if response.action == 'spam': spam_count += w
+            if response.action == 'ignored': ignore_count += w
+
+            # Heuristics for other metrics based on action
+            if response.action in ['opened', 'clicked', 'replied']:
+                read_count += w
+
+            # Pseudo-random forward. crc32 is stable across processes, unlike the
+            # per-process salted hash(), so repeated runs give the same count.
+            if response.action == 'clicked' and zlib.crc32(response.persona.id.encode("utf-8")) % 5 == 0:
+                forward_count += w
+
+        counts = {
+            "openRate": open_count,
+            "clickRate": click_count,
+            "replyRate": reply_count,
+            "spamRate": spam_count,
+            "ignoreRate": ignore_count,
+            "forwardRate": forward_count,
+            "readRate": read_count
+        }
+        intervals = {}
+        if total > 0:
+            for name, count in counts.items():
+                low, high = wilson_interval(count / total * effective_n, effective_n)
+                intervals[name] = MetricInterval(low=round(low * 100, 1), high=round(high * 100, 1))
+
+        return Metrics(
+            **{name: int((count / total) * 100) if total > 0 else 0 for name, count in counts.items()},
+            sampleSize=len(responses),
+            populationSize=int(round(total)),
+            intervals=intervals
+        )
+
+    async def _simulate_single_persona(self, draft: EmailDraft, persona: Persona, relevance_score: float,
+                                       llm: AsyncBaseLLM, stats: RunStats) -> Response:
+        prescreened = self._prescreen(draft, persona, relevance_score)
+        if prescreened is not None:
+            stats.prescreened += 1
+            return prescreened
+
+        if draft.decision_mode == 'single_pass':
+            return await self._simulate_single_pass(draft, persona, relevance_score, llm, stats)
+
         # Phase A: Inbox Scan
         prompt_a = SimulationPrompts.inbox_scan(persona, draft, relevance_score)
         
         try:
-            res_a_str = self.llm.predict(prompt_a)
+            res_a_str = await self._predict(llm, prompt_a, stats, "inboxScan")
             res_a = self._parse_llm_json(res_a_str, fallback={
                 "action": "ignored", 
                 "reason": "Unable to parse response",
@@ -176,20 +543,13 @@ class Simulator:
                 "thought_process": str(e)
             }
         
-        action = res_a.get("action", "ignored").lower()
-        if action not in ['opened', 'ignored', 'spam']:
-            action = 'ignored'
-            
-        reason = res_a.get("reason", "Not relevant")
-        detailed_reasoning = res_a.get("thought_process", reason)
-        comment = reason
-        
-        if action == "opened":
+        res_c = None
+        if self._scan_action(res_a) == "opened":
             # Phase C: Action
             prompt_c = SimulationPrompts.take_action(persona, draft)
             
             try:
-                res_c_str = self.llm.predict(prompt_c)
+                res_c_str = await self._predict(llm, prompt_c, stats, "takeAction")
                 res_c = self._parse_llm_json(res_c_str, fallback={
                     "final_action": "opened",
                     "internal_monologue": "Read but no action taken"
@@ -200,8 +560,107 @@ class Simulator:
             except Exception as e:
                 logger.error(f"Unexpected error in Phase C for {persona.name}: {e}")
                 res_c = {"final_action": "opened", "internal_monologue": "Processing error"}
-            
-            final_action = res_c.get("final_action", "opened").lower()
+
+        return self._build_response(persona, res_a, res_c)
+
+    async def _simulate_single_pass(self, draft: EmailDraft, persona: Persona, relevance_score: float,
+                                    llm: AsyncBaseLLM, stats: RunStats) -> Response:
+        """Inbox decision and CTA outcome from a single LLM call"""
+        prompt = SimulationPrompts.single_pass(persona, draft, relevance_score)
+        
+        try:
+            res_str = await self._predict(llm, prompt, stats, "singlePass")
+            res = self._parse_llm_json(res_str, fallback={
+                "action": "ignored",
+                "reason": "Unable to parse response",
+                "thought_process": "LLM response parsing failed"
+            })
+        except LLMError as e:
+            logger.error(f"LLM error in single-pass decision for {persona.name}: {e}")
+            res = {
+                "action": "ignored",
+                "reason": "LLM unavailable",
+                "thought_process": str(e)
+            }
+        except Exception as e:
+            logger.error(f"Unexpected error in single-pass decision for {persona.name}: {e}")
+            res = {
+                "action": "ignored",
+                "reason": "Processing error",
+                "thought_process": str(e)
+            }
+
+        # The same object carries both the inbox decision and the CTA outcome
+        res_c = res if self._scan_action(res) == "opened" else None
+        return self._build_response(persona, res, res_c)
+
+    def _prescreen_thresholds(self, draft: EmailDraft) -> Optional[Tuple[float, float]]:
+        """
+        (low, high) relevance thresholds of tiered mode, or None when it does not apply.
+        The defaults are calibrated for embedding similarity. Keyword overlap scores far
+        lower, so without embeddings only thresholds set on the draft are used.
+        """
+        if not draft.prescreen:
+            return None
+        if self.embedding_service.use_fallback and draft.prescreen_low is None and draft.prescreen_high is None:
+            return None
+        low = draft.prescreen_low if draft.prescreen_low is not None else PRESCREEN_LOW_THRESHOLD
+        high = draft.prescreen_high if draft.prescreen_high is not None else PRESCREEN_HIGH_THRESHOLD
+        return low, high
+
+    def _warn_if_prescreen_skipped(self, drafts: List[EmailDraft]) -> None:
+        if any(d.prescreen and self._prescreen_thresholds(d) is None for d in drafts):
+            logger.warning("Pre-screening skipped: relevance is scored by keyword overlap (no embedding model) "
+                           "and the default thresholds only fit embedding similarity. Set prescreen_low/"
+                           "prescreen_high on the draft to pre-screen anyway.")
+
+    def _prescreen(self, draft: EmailDraft, persona: Persona, relevance_score: float) -> Optional[Response]:
+        """
+        Tiered mode: decides personas outside the uncertain relevance band without
+        an LLM call. Returns None when the persona should go to the LLM.
+        """
+        thresholds = self._prescreen_thresholds(draft)
+        if thresholds is None:
+            return None
+        low, high = thresholds
+
+        if relevance_score < low:
+            return Response(
+                persona=persona,
+                action='ignored',
+                sentiment='neutral',
+                comment='Not relevant (pre-screened)',
+                detailedReasoning=f'Relevance score {relevance_score:.2f} is below the pre-screen threshold {low:.2f}; decided without an LLM call.',
+                decisionSource='prescreen'
+            )
+
+        if relevance_score >= high and not draft.prescreen_high_to_llm:
+            return Response(
+                persona=persona,
+                action='opened',
+                sentiment='neutral',
+                comment='Highly relevant subject (pre-screened)',
+                detailedReasoning=f'Relevance score {relevance_score:.2f} is above the pre-screen threshold {high:.2f}; decided without an LLM call.',
+                decisionSource='prescreen'
+            )
+
+        return None
+
+    def _scan_action(self, res_a: dict) -> str:
+        action = str(res_a.get("action", "ignored")).lower()
+        if action not in ['opened', 'ignored', 'spam']:
+            action = 'ignored'
+        return action
+
+    def _build_response(self, persona: Persona, res_a: dict, res_c: Optional[dict]) -> Response:
+        """Combines the inbox decision (res_a) and, for opened emails, the CTA outcome (res_c)"""
+        action = self._scan_action(res_a)
+        reason = res_a.get("reason", "Not relevant")
+        detailed_reasoning = res_a.get("thought_process", reason)
+        comment = reason
+        
+        if action == "opened" and res_c is not None:
+            final_action = str(res_c.get("final_action", "opened")).lower()
             if final_action in ['clicked', 'replied']:
                 action = final_action
             
@@ -216,13 +675,14 @@ class Simulator:
             detailedReasoning=detailed_reasoning or "No detailed reasoning"
         )
 
-    def _generate_insights(self, draft: EmailDraft, metrics: Metrics, responses: list) -> List[Insight]:
+    async def _generate_insights(self, draft: EmailDraft, metrics: Metrics, responses: list, llm: AsyncBaseLLM,
+                                 stats: RunStats) -> List[Insight]:
         insights = []
         
         # Try to get smart insights from LLM
         try:
             prompt = SimulationPrompts.analyze_results(draft, metrics, responses)
-            llm_response = self.llm.predict(prompt)
+            llm_response = await self._predict(llm, prompt, stats, "insights")
             logger.debug(f"LLM insights response length: {len(llm_response)}")
             
             data = self._parse_llm_json(llm_response)
@@ -0,0 +1,58 @@
+import math
+from typing import List, Tuple
+
+Z_95 = 1.959964  # Two-sided 95% normal quantile
+
+def wilson_interval(successes: float, n: float, z: float = Z_95) -> Tuple[float, float]:
+    """
+    Wilson score interval for a binomial proportion.
+    Returns (low, high) as fractions in 0..1. Stays well-behaved for small n
+    and proportions near 0 or 1, unlike the normal approximation.
+    """
+    if n <= 0:
+        return 0.0, 1.0
+
+    p = successes / n
+    z2 = z * z
+    denominator = 1 + z2 / n
+    center = (p + z2 / (2 * n)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / n + z2 / (4 * n * n)) / denominator
+    return max(0.0, center - half_width), min(1.0, center + half_width)
+
+def paired_comparison(baseline: List[bool], variant: List[bool], z: float = Z_95) -> dict:
+    """
+    Compares two binary outcomes measured on the same personas.
+    Returns the rate difference (variant - baseline) in percentage points with a
+    confidence interval, and the two-sided McNemar p-value on the discordant pairs.
+    """
+    n = len(baseline)
+    baseline_only = sum(1 for a, b in zip(baseline, variant) if a and not b)
+    variant_only = sum(1 for a, b in zip(baseline, variant) if b and not a)
+    discordant = baseline_only + variant_only
+
+    if n == 0:
+        return {"difference": 0.0, "low": 0.0, "high": 0.0, "pValue": 1.0, "discordant": 0, "n": 0}
+
+    difference = (variant_only - baseline_only) / n
+    standard_error = math.sqrt(max(discordant - (variant_only - baseline_only) ** 2 / n, 0.0)) / n
+
+    if discordant == 0:
+        p_value = 1.0
+    elif discordant < 25:
+        # Exact binomial test on the discordant pairs
+        k = min(baseline_only, variant_only)
+        tail = sum(math.comb(discordant, i) for i in range(k + 1)) / 2 ** discordant
+        p_value = min(1.0, 2 * tail)
+    else:
+        # Chi-square with continuity correction, 1 degree of freedom
+        chi2 = (abs(variant_only - baseline_only) - 1) ** 2 / discordant
+        p_value = math.erfc(math.sqrt(chi2 / 2))
+
+    return {
+        "difference": round(difference * 100, 1),
+        "low": round((difference - z * standard_error) * 100, 1),
+        "high": round((difference + z * standard_error) * 100, 1),
+        "pValue": round(p_value, 4),
+        "discordant": discordant,
+        "n": n
+    }
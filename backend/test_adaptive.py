@@ -0,0 +1,56 @@
+import json
+from llm_cache import LLMCache
+from llm_service import BaseLLM
+from models import EmailDraft, Persona
+from simulation import Simulator
+from test_concurrency import fixed_personas
+
+class IgnoringLLM(BaseLLM):
+    """Every persona ignores the email, so the open rate interval only narrows with n"""
+    def predict(self, prompt: str) -> str:
+        return json.dumps({"action": "ignored", "reason": "test"})
+
+# In id order, like a sampler reading an index
+PERSONAS = [
+    Persona(id=f"p{i:03d}", name=f"name {i}", role="CTO", company="Acme", avatar="",
+            psychographics="Pragmatic", pastBehavior="None")
+    for i in range(200)
+]
+
+def _run(**kwargs) -> list:
+    draft = EmailDraft(subject="s", body="b", cta="c", audience="Tech", adaptive=True, **kwargs)
+    simulator = Simulator(llm=IgnoringLLM(), max_concurrency=8, cache=LLMCache())
+    with fixed_personas(PERSONAS):
+        return list(simulator.run_simulation_stream(draft))
+
+def test_adaptive_stops_when_interval_is_narrow():
+    # 0 opens in n: the interval is 0..z^2/(n+z^2), 10.7 points wide at n=32 and 7.4 at n=48
+    events = _run(sample_size=16, ci_width=10.0, max_sample_size=200)
+    progress = [e for e in events if e["type"] == "progress"]
+    responses = events[-1]["data"]["responses"]
+    assert len(progress) == len(responses) == 48
+    assert progress[0]["total"] == 200
+    assert progress[-1]["interval"] == {"metric": "openRate", "low": 0.0, "high": 7.4}
+
+    # Rounds are taken from a shuffled sample, not from the sampler's id order
+    ids = [r["persona"]["id"] for r in responses]
+    assert len(set(ids)) == 48 and ids != [f"p{i:03d}" for i in range(48)]
+
+    print("Test Passed!")
+
+def test_adaptive_stops_at_budget():
+    events = _run(sample_size=16, ci_width=1.0, max_sample_size=40)
+    assert len(events[-1]["data"]["responses"]) == 40
+    assert [e["current"] for e in events if e["type"] == "progress"] == list(range(1, 41))
+
+    # Without adaptive mode the run is a single round of sample_size
+    draft = EmailDraft(subject="s", body="b", cta="c", audience="Tech", sample_size=16, ci_width=1.0)
+    with fixed_personas(PERSONAS):
+        events = list(Simulator(llm=IgnoringLLM(), cache=LLMCache()).run_simulation_stream(draft))
+    assert len(events[-1]["data"]["responses"]) == 16
+
+    print("Test Passed!")
+
+if __name__ == "__main__":
+    test_adaptive_stops_when_interval_is_narrow()
+    test_adaptive_stops_at_budget()
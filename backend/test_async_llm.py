@@ -0,0 +1,129 @@
+import asyncio
+import json
+from types import SimpleNamespace
+import httpx
+import openai
+from config import LLM_BACKOFF_MAX
+from llm_cache import LLMCache
+from llm_service import AsyncBaseLLM, AsyncOpenAILLM, LLMError, LLMTimeoutError, _backoff_delay
+from models import EmailDraft
+from profiles import _generate_random_personas
+from simulation import Simulator
+from test_concurrency import SlowPersonaLLM, fixed_personas
+
+class FakeCompletions:
+    """chat.completions of an OpenAI client: raises the queued errors, then answers"""
+    def __init__(self, errors, log):
+        self.errors = list(errors)
+        self.log = log
+
+    async def create(self, **kwargs):
+        self.log.append("call")
+        if self.errors:
+            raise self.errors.pop(0)
+        message = SimpleNamespace(content='{"action": "opened"}')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+def _llm(errors, log) -> AsyncOpenAILLM:
+    llm = AsyncOpenAILLM(base_url="http://127.0.0.1:9/v1", api_key="test")
+    llm.streaming = False
+    llm.max_retries = 3
+    llm.client = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(errors, log)))
+    return llm
+
+def test_backoff_delay_is_jittered_and_capped():
+    for attempt in range(12):
+        delays = [_backoff_delay(attempt) for _ in range(50)]
+        assert all(0 <= d <= min(LLM_BACKOFF_MAX, 2 ** attempt) for d in delays)
+    assert len(set(_backoff_delay(3) for _ in range(10))) > 1
+
+    print("Test Passed!")
+
+def test_async_retry_does_not_block_the_loop():
+    log, delays = [], []
+    real_sleep = asyncio.sleep
+
+    async def recorded_sleep(delay, *args, **kwargs):
+        delays.append(delay)
+        await real_sleep(0)
+
+    async def other_task():
+        log.append("other")
+
+    async def scenario():
+        llm = _llm([openai.APIConnectionError(request=httpx.Request("POST", "http://llm")),
+                    httpx.ReadTimeout("timed out")], log)
+        other = asyncio.create_task(other_task())
+        result = await llm.predict("prompt")
+        await other
+        return result
+
+    asyncio.sleep = recorded_sleep
+    try:
+        assert asyncio.run(scenario()) == '{"action": "opened"}'
+    finally:
+        asyncio.sleep = real_sleep
+    # Two backoffs, each yielding to the loop: the other task ran during the first one
+    assert log == ["call", "other", "call", "call"]
+    assert len(delays) == 2 and 0 <= delays[0] <= 1 and 0 <= delays[1] <= 2
+
+    # A timeout on every attempt ends with LLMTimeoutError after max_retries calls
+    log.clear()
+    asyncio.sleep = recorded_sleep
+    try:
+        asyncio.run(_llm([httpx.ReadTimeout("timed out")] * 3, log).predict("prompt"))
+        assert False, "expected LLMTimeoutError"
+    except LLMTimeoutError:
+        pass
+    finally:
+        asyncio.sleep = real_sleep
+    assert log == ["call"] * 3
+
+    print("Test Passed!")
+
+def test_async_client_error_is_not_retried():
+    log = []
+    request = httpx.Request("POST", "http://llm/v1/chat/completions")
+    error = openai.BadRequestError("Error code: 400 - unknown model", response=httpx.Response(400, request=request),
+                                   body=None)
+    try:
+        asyncio.run(_llm([error], log).predict("prompt"))
+        assert False, "expected LLMError"
+    except LLMError as e:
+        assert "400" in str(e)
+    assert log == ["call"]
+
+    print("Test Passed!")
+
+class AsyncPersonaLLM(AsyncBaseLLM):
+    def __init__(self):
+        self.sync = SlowPersonaLLM()
+
+    async def predict(self, prompt: str) -> str:
+        await asyncio.sleep(0)
+        return self.sync.predict(prompt)
+
+def test_async_stream_events_in_order():
+    draft = EmailDraft(subject="s", body="b", cta="c", audience="Tech", sample_size=6)
+    simulator = Simulator(llm=SlowPersonaLLM(), async_llm=AsyncPersonaLLM(), max_concurrency=3, cache=LLMCache())
+
+    async def collect():
+        return [event async for event in simulator.run_simulation_stream_async(draft)]
+
+    with fixed_personas(_generate_random_personas(draft.sample_size)):
+        events = asyncio.run(collect())
+
+    assert [e["type"] for e in events] == ["start"] + ["progress"] * 6 + ["result"]
+    assert [e["current"] for e in events[1:-1]] == list(range(1, 7))
+    result = events[-1]["data"]
+    assert result["id"] == events[0]["id"] and len(result["responses"]) == 6
+    assert {json.dumps(e["response"], sort_keys=True) for e in events[1:-1]} == \
+        {json.dumps(r, sort_keys=True) for r in result["responses"]}
+
+    print("Test Passed!")
+
+if __name__ == "__main__":
+    test_backoff_delay_is_jittered_and_capped()
+    test_async_retry_does_not_block_the_loop()
+    test_async_client_error_is_not_retried()
+    test_async_stream_events_in_order()
@@ -0,0 +1,82 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from database import Base, AudienceModel, PersonaModel, get_db
+import main
+
+def _client():
+    """A TestClient whose requests use a private in-memory database"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    db = session_factory()
+    db.add_all([AudienceModel(id=1, name="Tech", type="B2B"), AudienceModel(id=2, name="Retail", type="B2C"),
+                AudienceModel(id=3, name="Empty", type="B2B")])
+    db.add_all([
+        PersonaModel(id=f"p{i:02d}", audience_id=1 if i < 23 else 2, name=f"Person {i}",
+                     role="CTO" if i % 3 == 0 else "Engineer", company="Acme (SaaS)" if i % 2 else "Globex (FinTech)",
+                     avatar="", psychographics="long text", past_behavior="long text")
+        for i in range(30)
+    ])
+    db.commit()
+    db.close()
+
+    def override():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    main.app.dependency_overrides[get_db] = override
+    return TestClient(main.app)
+
+def test_summary_counts():
+    client = _client()
+    try:
+        summary = client.get("/api/audiences/summary").json()
+    finally:
+        main.app.dependency_overrides.clear()
+    assert [(a["id"], a["name"], a["size"]) for a in summary] == [(1, "Tech", 23), (2, "Retail", 7), (3, "Empty", 0)]
+    assert all("personas" not in a for a in summary)
+
+    print("Test Passed!")
+
+def test_persona_pages():
+    client = _client()
+    try:
+        ids, cursor, pages = [], None, 0
+        while True:
+            params = {"limit": 5, **({"cursor": cursor} if cursor else {})}
+            page = client.get("/api/audiences/1/personas", params=params).json()
+            ids.extend(p["id"] for p in page["items"])
+            pages += 1
+            cursor = page["nextCursor"]
+            if cursor is None:
+                break
+        # Every persona of the audience exactly once, in id order
+        assert ids == [f"p{i:02d}" for i in range(23)] and pages == 5
+
+        page = client.get("/api/audiences/1/personas", params={"fields": "name, role", "limit": 2}).json()
+        assert page["items"] == [{"id": "p00", "name": "Person 0", "role": "CTO"},
+                                 {"id": "p01", "name": "Person 1", "role": "Engineer"}]
+        response = client.get("/api/audiences/1/personas", params={"fields": "name,salary"})
+        assert response.status_code == 400 and "salary" in response.json()["detail"]
+        assert client.get("/api/audiences/1/personas", params={"limit": 0}).status_code == 422
+
+        # q matches name, role or company, case-insensitively, and combines with the cursor
+        cto = client.get("/api/audiences/1/personas", params={"q": "cto", "fields": "role"}).json()["items"]
+        assert [p["id"] for p in cto] == [f"p{i:02d}" for i in range(0, 23, 3)]
+        fintech = client.get("/api/audiences/1/personas", params={"q": "FINTECH", "cursor": "p10"}).json()
+        assert [p["id"] for p in fintech["items"]] == [f"p{i:02d}" for i in range(12, 23, 2)]
+        assert client.get("/api/audiences/1/personas", params={"q": "Person 25"}).json()["items"] == []
+        assert client.get("/api/audiences/3/personas").json() == {"items": [], "nextCursor": None}
+    finally:
+        main.app.dependency_overrides.clear()
+
+    print("Test Passed!")
+
+if __name__ == "__main__":
+    test_summary_counts()
+    test_persona_pages()
@@ -0,0 +1,41 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+from config import MAX_BATCH_VARIANTS
+from database import Base
+from jobs import JobQueue
+import main
+
+def _variant(audience: str = "1", subject: str = "s") -> dict:
+    return {"subject": subject, "body": "b", "cta": "c", "audience": audience}
+
+def test_batch_variant_validation():
+    # No lifespan: the requests are rejected before a simulator is needed.
+    # A job that got through would land in a private in-memory queue.
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    original = main.job_queue
+    main.job_queue = JobQueue(main.run_job, engine=engine)
+    client = TestClient(main.app)
+    invalid = [
+        ([_variant()], "Provide between 2"),
+        ([_variant(subject=str(i)) for i in range(MAX_BATCH_VARIANTS + 1)], "Provide between 2"),
+        ([_variant("1"), _variant("2")], "same audience")
+    ]
+    try:
+        for variants, message in invalid:
+            for path, body in (("/api/simulate/batch", {"variants": variants}), ("/api/jobs", {"variants": variants})):
+                response = client.post(path, json=body)
+                assert response.status_code == 400 and message in response.json()["detail"], (path, response.text)
+
+        response = client.post("/api/jobs", json={"draft": _variant(), "variants": [_variant(), _variant()]})
+        assert response.status_code == 400
+        assert client.post("/api/simulate/batch", json={"variants": "not a list"}).status_code == 422
+        assert main.job_queue.stats()["byStatus"] == {}
+    finally:
+        main.job_queue = original
+
+    print("Test Passed!")
+
+if __name__ == "__main__":
+    test_batch_variant_validation()
@@ -0,0 +1,73 @@
+import random
+import numpy as np
+from pydantic import ValidationError
+from clustering import (
+    GROUPING_LEVELS, PersonaCluster, _group, _cluster_groups, _weighted_kmeans, _representative_weights,
+    cluster_audience
+)
+from models import EmailDraft
+
+GROUPS = {
+    ("CTO", "FinTech", "Skeptical", "Ignores cold email"): ["p1", "p2"],
+    ("CTO", "FinTech", "Skeptical", "Replies to peers"): ["p3"],
+    ("CTO", "Retail", "Curious", "Clicks demos"): ["p4"],
+    ("HR Director", "Retail", "Busy", "Ignores cold email"): ["p5", "p6", "p7"]
+}
+
+def test_grouping_levels():
+    assert len(_group(GROUPS, GROUPING_LEVELS[0])) == 4
+    assert _group(GROUPS, GROUPING_LEVELS[1])["CTO | FinTech | Skeptical"] == ["p1", "p2", "p3"]
+    assert _group(GROUPS, ("role",)) == {"CTO": ["p1", "p2", "p3", "p4"], "HR Director": ["p5", "p6", "p7"]}
+
+    # Too many groups without embeddings: coarser levels, then the long tail is pooled
+    clusters = _cluster_groups(GROUPS, 2, None, seed=0)
+    assert sorted(c.key for c in clusters) == ["CTO", "HR Director"]
+    clusters = _cluster_groups(GROUPS, 1, None, seed=0)
+    assert [(c.key, c.size) for c in clusters] == [("other", 7)]
+
+    print("Test Passed!")
+
+def test_weighted_kmeans():
+    rng = np.random.default_rng(0)
+    left = rng.normal([1.0, 0.0], 0.05, size=(20, 2))
+    right = rng.normal([0.0, 1.0], 0.05, size=(20, 2))
+    vectors = np.vstack([left, right])
+    weights = np.concatenate([np.full(20, 5.0), np.ones(20)])
+
+    labels = _weighted_kmeans(vectors, weights, 2, random.Random(0))
+    assert len(set(labels[:20])) == 1 and len(set(labels[20:])) == 1
+    assert labels[0] != labels[20]
+
+    # Duplicate points: fewer distinct centers than k, every point still gets a label
+    labels = _weighted_kmeans(np.ones((5, 2)), np.ones(5), 3, random.Random(0))
+    assert list(labels) == [0] * 5
+
+    print("Test Passed!")
+
+def test_cluster_weights():
+    clusters = [PersonaCluster("a", ["p1", "p2", "p3", "p4"]), PersonaCluster("b", ["p5"])]
+    chosen = _representative_weights(clusters, 3, random.Random(0))
+    assert len(chosen) == 4
+    assert sum(weight for _, weight in chosen) == 5
+    assert dict(chosen)["p5"] == 1
+
+    for call in (lambda: _representative_weights(clusters, 0, random.Random(0)),
+                 lambda: cluster_audience(None, 0)):
+        try:
+            call()
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+    for field in ("max_clusters", "representatives_per_cluster"):
+        try:
+            EmailDraft(subject="s", body="b", cta="c", audience="Tech", **{field: 0})
+            assert False, "expected ValidationError"
+        except ValidationError:
+            pass
+
+    print("Test Passed!")
+
+if __name__ == "__main__":
+    test_grouping_levels()
+    test_weighted_kmeans()
+    test_cluster_weights()
@@ -0,0 +1,103 @@
+import json
+import random
+import time
+from contextlib import contextmanager
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from database import Base
+from llm_cache import LLMCache
+from llm_service import BaseLLM
+from models import EmailDraft
+from profiles import _generate_random_personas
+from simulation import Simulator
+import embedding_store
+import simulation
+
+@contextmanager
+def fixed_personas(personas):
+    """Simulations sample from these personas in order; embeddings go to a private in-memory database"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    original = simulation.generate_personas, embedding_store.SessionLocal
+    simulation.generate_personas = lambda count, **kwargs: personas[:count]
+    embedding_store.SessionLocal = sessionmaker(bind=engine)
+    try:
+        yield
+    finally:
+        simulation.generate_personas, embedding_store.SessionLocal = original
+
+class SlowPersonaLLM(BaseLLM):
+    """Deterministic LLM: the decision depends only on the persona in the prompt"""
+    def predict(self, prompt: str) -> str:
+        time.sleep(random.uniform(0.0, 0.02))  # Make workers finish out of order
+        seed = sum(ord(c) for c in prompt.split("\n")[1])
+        if "Email Subject" in prompt:
+            return json.dumps({"action": ["opened", "ignored", "spam"][seed % 3], "reason": "test"})
+        return json.dumps({"final_action": ["clicked", "replied", "opened"][seed % 3], "internal_monologue": "test"})
+
+def test_concurrent_metrics_match_sequential():
+    draft = EmailDraft(
+        subject="Test Subject",
+        body="This is a test body.",
+        cta="Click here",
+        audience="Tech",
+        sample_size=12
+    )
+    llm = SlowPersonaLLM()
+
+    sequential = Simulator(llm=llm, max_concurrency=1, cache=LLMCache())
+    concurrent = Simulator(llm=llm, max_concurrency=8, cache=LLMCache())
+
+    with fixed_personas(_generate_random_personas(draft.sample_size)):
+        seq_events = list(sequential.run_simulation_stream(draft))
+        con_events = list(concurrent.run_simulation_stream(draft))
+
+    assert [e["current"] for e in con_events if e["type"] == "progress"] == list(range(1, 13))
+
+    seq_result = seq_events[-1]["data"]
+    con_result = con_events[-1]["data"]
+    assert seq_result["metrics"] == con_result["metrics"]
+    assert [r["action"] for r in seq_result["responses"]] == [r["action"] for r in con_result["responses"]]
+
+    print("Test Passed!")
+
+class CountingLLM(SlowPersonaLLM):
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, prompt: str) -> str:
+        self.calls += 1
+        time.sleep(0.1)
+        return super().predict(prompt)
+
+def test_closing_stream_cancels_pending_calls():
+    draft = EmailDraft(
+        subject="Test Subject",
+        body="This is a test body.",
+        cta="Click here",
+        audience="Tech",
+        sample_size=40
+    )
+    llm = CountingLLM()
+    with fixed_personas(_generate_random_personas(draft.sample_size)):
+        stream = Simulator(llm=llm, max_concurrency=2, cache=LLMCache()).run_simulation_stream(draft)
+
+        progress = 0
+        for event in stream:
+            if event["type"] == "progress":
+                progress += 1
+                if progress == 2:
+                    break
+        started = time.time()
+        stream.close()
+
+    # Only the calls already running finish; the other personas never reach the LLM
+    assert time.time() - started < 0.5
+    assert llm.calls <= 8
+
+    print("Test Passed!")
+
+if __name__ == "__main__":
+    test_concurrent_metrics_match_sequential()
+    test_closing_stream_cancels_pending_calls()
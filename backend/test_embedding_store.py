@@ -0,0 +1,107 @@
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from database import Base, PersonaModel, PersonaEmbeddingModel
+import embedding_store
+from embedding_store import PersonaEmbeddingStore
+from models import Persona
+
+class FakeEmbeddingService:
+    """Deterministic 8-dimensional unit vectors; counts the texts it encodes"""
+    model_name = "fake"
+    use_fallback = False
+
+    def __init__(self):
+        self.encoded = 0
+
+    def encode(self, texts):
+        self.encoded += len(texts)
+        vectors = np.array([[(hash(t) >> i) % 7 + 1 for i in range(8)] for t in texts], dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def _persona(i: int, psychographics: str = "Pragmatic") -> Persona:
+    return Persona(id=f"p{i:02d}", name="n", role="CTO", company="Acme (SaaS)", avatar="",
+                   psychographics=psychographics, pastBehavior="opens")
+
+def _session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    db = session_factory()
+    db.add_all([
+        PersonaModel(id=p.id, audience_id=1, name=p.name, role=p.role, company=p.company, avatar=p.avatar,
+                     psychographics=p.psychographics, past_behavior=p.pastBehavior)
+        for p in (_persona(i) for i in range(25))
+    ])
+    db.commit()
+    db.close()
+    return session_factory
+
+def test_matrix_is_encoded_once_per_content():
+    session_factory = _session_factory()
+    original = embedding_store.SessionLocal
+    embedding_store.SessionLocal = session_factory
+    try:
+        service = FakeEmbeddingService()
+        store = PersonaEmbeddingStore(service)
+        personas = [_persona(i) for i in range(5)]
+
+        first = store.matrix_for(personas)
+        assert first.shape == (5, 8) and first.dtype == np.float32 and service.encoded == 5
+        assert np.array_equal(store.matrix_for(personas), first) and service.encoded == 5
+
+        # Changed content is encoded again; personas missing from the database are never stored
+        changed = [_persona(0, "Skeptical"), _persona(99)]
+        store.matrix_for(changed)
+        assert service.encoded == 7
+        db = session_factory()
+        assert db.query(PersonaEmbeddingModel).count() == 5
+        assert db.query(PersonaEmbeddingModel).filter_by(persona_id="p99").count() == 0
+        db.close()
+    finally:
+        embedding_store.SessionLocal = original
+
+    print("Test Passed!")
+
+def test_index_audience_in_pages():
+    session_factory = _session_factory()
+    original = embedding_store.SessionLocal
+    embedding_store.SessionLocal = session_factory
+    try:
+        service = FakeEmbeddingService()
+        store = PersonaEmbeddingStore(service)
+        assert store.index_audience(1, chunk_size=10) == 25
+        assert service.encoded == 25
+        assert store.index_audience(2) == 0
+        # Already indexed: nothing is encoded again
+        store.index_audience(1, chunk_size=10)
+        assert service.encoded == 25
+    finally:
+        embedding_store.SessionLocal = original
+
+    print("Test Passed!")
+
+def test_lookups_are_chunked():
+    session_factory = _session_factory()
+    original = embedding_store.SessionLocal, embedding_store._IN_CHUNK_SIZE
+    embedding_store.SessionLocal, embedding_store._IN_CHUNK_SIZE = session_factory, 4
+    try:
+        service = FakeEmbeddingService()
+        store = PersonaEmbeddingStore(service)
+        personas = [_persona(i) for i in range(25)]
+        first = store.matrix_for(personas)
+        db = session_factory()
+        assert db.query(PersonaEmbeddingModel).count() == 25
+        db.close()
+        # Every stored vector is found again across the chunks
+        assert np.array_equal(store.matrix_for(personas), first) and service.encoded == 25
+    finally:
+        embedding_store.SessionLocal, embedding_store._IN_CHUNK_SIZE = original
+
+    print("Test Passed!")
+
+if __name__ == "__main__":
+    test_matrix_is_encoded_once_per_content()
+    test_index_audience_in_pages()
+    test_lookups_are_chunked()
@@ -1,9 +1,11 @@
 from openai import OpenAI
 import sys
+from config import LLM_BASE_URL, LLM_API_KEY
+from http_clients import get_http_client
 
 def test_embeddings():
     print("Testing embeddings on LM Studio...")
-    client = OpenAI(base_url="http://192.168.0.113:1234/v1", api_key="lm-studio")
+    client = OpenAI(base_url=LLM_BASE_URL, api_key=LLM_API_KEY, http_client=get_http_client())
     
     try:
         response = client.embeddings.create(
@@ -17,5 +19,20 @@ def test_embeddings():
         print("Local server might not support embeddings or model is not loaded.")
         return False
 
+def test_keyword_similarity_matrix():
+    from llm_service import EmbeddingService
+    service = EmbeddingService()
+    service.use_fallback = True  # Exercise the vectorized keyword path
+
+    queries = ["FinTech CTO news", "the and", "SaaS growth"]
+    documents = ["CTO Acme (FinTech) reads fintech news", "", "HR Director Retail", "saas growth hacks", "the"]
+    matrix = service.similarity_many_to_many(queries, documents)
+
+    assert matrix.shape == (3, 5)
+    for qi, q in enumerate(queries):
+        for di, d in enumerate(documents):
+            assert abs(matrix[qi, di] - service._keyword_similarity(q, d)) < 1e-6
+
 if __name__ == "__main__":
     test_embeddings()
+    test_keyword_similarity_matrix()
@@ -0,0 +1,189 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+import database
+from database import Base, PersonaModel, ResponseModel, SimulationModel, get_db
+import main
+
+def _engine():
+    return create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+def _client(engine):
+    """A TestClient whose requests use the given database"""
+    session_factory = sessionmaker(bind=engine)
+
+    def override():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    main.app.dependency_overrides[get_db] = override
+    return TestClient(main.app)
+
+def _simulations(engine):
+    db = sessionmaker(bind=engine)()
+    # Five runs share timestamp 2000: pages must split ties by id without skipping or repeating
+    rows = [(f"s{i:02d}", 1000 * (i // 5 + 1), "Tech" if i % 2 else "Retail") for i in range(15)]
+    db.add_all([
+        SimulationModel(id=sim_id, timestamp=timestamp, subject=f"Subject {sim_id}", audience_target=audience,
+                        metrics={}, insights=[], status="completed")
+        for sim_id, timestamp, audience in rows
+    ])
+    db.commit()
+    db.close()
+    return rows
+
+def _walk(client, limit: int, **params) -> list:
+    ids, cursors, cursor = [], [], None
+    while True:
+        response = client.get("/api/history", params={"limit": limit, **params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        ids.extend(s["id"] for s in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        cursors.append(cursor)
+        if cursor is None:
+            return ids, cursors
+
+def test_history_pages_and_filters():
+    engine = _engine()
+    Base.metadata.create_all(engine)
+    rows = _simulations(engine)
+    client = _client(engine)
+    try:
+        newest_first = [sim_id for sim_id, _, _ in sorted(rows, key=lambda r: (r[1], r[0]), reverse=True)]
+        ids, cursors = _walk(client, 2)
+        assert ids == newest_first
+        # The header is set on every page but the last
+        assert len(cursors) == 8 and all(cursors[:-1]) and cursors[-1] is None
+        assert cursors[0] == "3000:s13"
+
+        # A page ending exactly at the last row has no next cursor
+        response = client.get("/api/history", params={"limit": 15})
+        assert len(response.json()) == 15 and "X-Next-Cursor" not in response.headers
+        assert client.get("/api/history", params={"cursor": "not-a-cursor"}).status_code == 400
+
+        ids, _ = _walk(client, 2, audience="Tech")
+        assert ids == [i for i in newest_first if int(i[1:]) % 2]
+        ids, _ = _walk(client, 3, since=2000, until=2000)
+        assert ids == ["s09", "s08", "s07", "s06", "s05"]
+        assert [s["id"] for s in client.get("/api/history", params={"q": "subject S1"}).json()] == \
+            ["s14", "s13", "s12", "s11", "s10"]
+        assert client.get("/api/history", params={"audience": "Tech", "q": "s05"}).json()[0]["audience"] == "Tech"
+    finally:
+        main.app.dependency_overrides.clear()
+
+    print("Test Passed!")
+
+# Schema of the first release, before history pagination and incremental runs
+BASELINE_SCHEMA = [
+    "CREATE TABLE audiences (id INTEGER PRIMARY KEY, name VARCHAR, type VARCHAR, description VARCHAR)",
+    "CREATE TABLE personas (id VARCHAR PRIMARY KEY, audience_id INTEGER REFERENCES audiences (id), name VARCHAR, "
+    "role VARCHAR, company VARCHAR, avatar VARCHAR, psychographics TEXT, past_behavior TEXT)",
+    "CREATE INDEX ix_personas_audience_id ON personas (audience_id)",
+    "CREATE TABLE simulations (id VARCHAR PRIMARY KEY, timestamp INTEGER, subject VARCHAR, body TEXT, cta VARCHAR, "
+    "audience_target VARCHAR, metrics JSON, insights JSON)",
+    "CREATE TABLE responses (id INTEGER PRIMARY KEY, simulation_id VARCHAR REFERENCES simulations (id), "
+    "persona_id VARCHAR REFERENCES personas (id), action VARCHAR, sentiment VARCHAR, comment TEXT, "
+    "detailed_reasoning TEXT)",
+    "INSERT INTO simulations VALUES ('old', 500, 'Old subject', 'b', 'c', 'Tech', '{}', '[]')",
+    "INSERT INTO responses (simulation_id, persona_id, action) VALUES ('old', NULL, 'opened')"
+]
+
+def test_migrate_baseline_database():
+    engine = _engine()
+    with engine.begin() as conn:
+        for statement in BASELINE_SCHEMA:
+            conn.execute(text(statement))
+
+    original = database.engine
+    database.engine = engine
+    try:
+        database.init_db()
+        database.init_db()  # Idempotent
+    finally:
+        database.engine = original
+
+    inspector = inspect(engine)
+    columns = {c["name"] for c in inspector.get_columns("simulations")}
+    assert {"status", "error", "idempotency_key", "request_fingerprint", "owner"} <= columns
+    assert {"decision_source", "weight"} <= {c["name"] for c in inspector.get_columns("responses")}
+    assert {"ix_simulations_timestamp_id", "ix_simulations_audience_target_timestamp_id"} <= \
+        {i["name"] for i in inspector.get_indexes("simulations")}
+    assert {i["name"] for i in inspector.get_indexes("personas")} == {"ix_personas_audience_id_id"}
+    assert "jobs" in inspector.get_table_names()
+
+    # Existing rows get the column defaults and are served by the new endpoints
+    client = _client(engine)
+    try:
+        assert client.get("/api/history").json() == [
+            {"id": "old", "timestamp": 500, "subject": "Old subject", "metrics": {}, "audience": "Tech",
+             "status": "completed"}
+        ]
+        detail = client.get("/api/history/old").json()
+        assert detail["responses"][0]["decisionSource"] == "llm" and detail["responses"][0]["weight"] == 1.0
+    finally:
+        main.app.dependency_overrides.clear()
+
+    print("Test Passed!")
+
+def test_simulation_detail_and_reasoning():
+    engine = _engine()
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all([
+        PersonaModel(id="p1", audience_id=1, name="Alex", role="CTO", company="Acme", avatar="A",
+                     psychographics="p", past_behavior="b"),
+        SimulationModel(id="sim", timestamp=1, subject="s", body="b", cta="c", audience_target="1",
+                        metrics={"openRate": 50}, insights=[], status="completed"),
+        SimulationModel(id="other", timestamp=2, subject="s", status="completed")
+    ])
+    db.add_all([
+        ResponseModel(id=1, simulation_id="sim", persona_id="p1", action="opened", comment="ok",
+                      detailed_reasoning="Long reasoning 1"),
+        # The persona was deleted after the run
+        ResponseModel(id=2, simulation_id="sim", persona_id="gone", action="ignored", comment="no",
+                      detailed_reasoning="Long reasoning 2"),
+        ResponseModel(id=3, simulation_id="other", persona_id="p1", action="spam", detailed_reasoning="Other run")
+    ])
+    db.commit()
+    db.close()
+
+    selects = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_selects(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            selects.append(statement)
+
+    client = _client(engine)
+    try:
+        detail = client.get("/api/history/sim").json()
+        # The run, then its responses joined with their personas
+        assert len(selects) == 2
+        assert [r["id"] for r in detail["responses"]] == [1, 2]
+        first, orphan = detail["responses"]
+        assert first["persona"]["name"] == "Alex" and first["detailedReasoning"] == "Long reasoning 1"
+        assert orphan["persona"] == main.UNKNOWN_PERSONA and orphan["action"] == "ignored"
+        assert detail["metrics"] == {"openRate": 50}
+
+        compact = client.get("/api/history/sim", params={"compact": True}).json()
+        assert all("detailedReasoning" not in r for r in compact["responses"])
+        assert [r["comment"] for r in compact["responses"]] == ["ok", "no"]
+
+        assert client.get("/api/history/sim/responses/2").json() == {"id": 2, "detailedReasoning": "Long reasoning 2"}
+        # A response of another run is not found through this one
+        assert client.get("/api/history/sim/responses/3").status_code == 404
+        assert client.get("/api/history/other/responses/3").json()["detailedReasoning"] == "Other run"
+        assert client.get("/api/history/missing").status_code == 404
+    finally:
+        main.app.dependency_overrides.clear()
+
+    print("Test Passed!")
+
+if __name__ == "__main__":
+    test_history_pages_and_filters()
+    test_migrate_baseline_database()
+    test_simulation_detail_and_reasoning()
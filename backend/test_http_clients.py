@@ -0,0 +1,30 @@
+from http_clients import connection_stats
+from llm_scheduler import LLMScheduler
+import llm_scheduler
+from llm_service import OpenAILLM
+from test_llm_pool import start_server, url
+
+def test_llm_clients_reuse_connections():
+    server, _ = start_server()
+    original = llm_scheduler._scheduler
+    llm_scheduler._scheduler = LLMScheduler(max_in_flight=10, rate_limit="", token_rate_limit="")
+    try:
+        before = connection_stats.to_dict()
+        # Separate LLM instances draw on the same kept-alive connection
+        for _ in range(5):
+            llm = OpenAILLM(base_url=url(server))
+            for _ in range(4):
+                assert llm.predict("prompt") == str(server.server_port)
+        after = connection_stats.to_dict()
+    finally:
+        llm_scheduler._scheduler = original
+        server.shutdown()
+
+    assert after["requests"] - before["requests"] == 20
+    assert after["connectionsOpened"] - before["connectionsOpened"] == 1
+    assert after["reuseRatio"] > 0.9
+
+    print("Test Passed!")
+
+if __name__ == "__main__":
+    test_llm_clients_reuse_connections()
@@ -0,0 +1,128 @@
+import asyncio
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import StaticPool
+from database import Base, JobModel, JobEventModel
+from jobs import JobQueue
+
+def test_priority_cancel_and_replay():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    order = []
+
+    async def run(kind, payload):
+        order.append(payload["name"])
+        yield {"type": "start", "id": payload["name"]}
+        for i in range(3):
+            await asyncio.sleep(0.02)
+            yield {"type": "progress", "current": i + 1}
+        yield {"type": "result", "data": {}}
+
+    async def scenario():
+        queue = JobQueue(run, engine=engine, workers=1, poll_interval=0.05)
+        await queue.start()
+        first = await queue.submit("simulate", {"name": "first"})
+        while queue.get(first["id"])["status"] == "queued":
+            await asyncio.sleep(0.01)
+        low = await queue.submit("simulate", {"name": "low"})
+        high = await queue.submit("simulate", {"name": "high"}, priority=5)
+        dropped = await queue.submit("simulate", {"name": "dropped"})
+        await queue.cancel(dropped["id"])
+
+        live = [event["type"] async for _, event in queue.events(first["id"])]
+        await asyncio.sleep(0.3)
+        # Re-attaching from an offset replays only the tail
+        tail = [seq async for seq, _ in queue.events(first["id"], offset=4)]
+        await queue.stop()
+        return live, tail, [queue.get(j["id"])["status"] for j in (first, low, high, dropped)]
+
+    live, tail, statuses = asyncio.run(scenario())
+    assert live == ["start", "progress", "progress", "progress", "result", "end"]
+    assert tail == [4, 5]
+    assert order == ["first", "high", "low"]
+    assert statuses == ["completed", "completed", "completed", "cancelled"]
+
+    print("Test Passed!")
+
+def test_stale_jobs_and_event_retention():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    now = time.time()
+    with engine.begin() as conn:
+        jobs = [
+            # Another live process is running this one
+            {"id": "live", "status": "running", "owner": "other", "heartbeat_at": now, "finished_at": None},
+            {"id": "dead", "status": "running", "owner": "gone", "heartbeat_at": now - 600, "finished_at": None},
+            {"id": "old", "status": "completed", "owner": None, "heartbeat_at": None, "finished_at": now - 7200},
+            {"id": "recent", "status": "completed", "owner": None, "heartbeat_at": None, "finished_at": now - 10}
+        ]
+        conn.execute(JobModel.__table__.insert(), [{"kind": "simulate", "payload": {}, **job} for job in jobs])
+        conn.execute(JobEventModel.__table__.insert(), [
+            {"job_id": job_id, "seq": seq, "event": {"type": "progress"}} for job_id in ("old", "recent") for seq in range(3)
+        ])
+
+    queue = JobQueue(lambda kind, payload: None, engine=engine, heartbeat_interval=10, event_retention=3600)
+    queue._maintain()
+    assert queue.get("live")["status"] == "running"
+    assert queue.get("dead")["status"] == "queued"
+    assert queue.get("old")["events"] == 0
+    assert queue.get("recent")["events"] == 3
+
+    print("Test Passed!")
+
+def test_events_are_batched_without_duplicate_responses():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+
+    async def run(kind, payload):
+        yield {"type": "start", "id": "sim"}
+        for i in range(50):
+            yield {"type": "progress", "current": i + 1, "response": {"id": i}}
+        yield {"type": "result", "data": {"metrics": {}, "responses": [{"id": i} for i in range(50)]}}
+
+    queue = JobQueue(run, engine=engine, workers=1, poll_interval=0.05)
+    transactions = []
+    store_events = queue._store_events
+    queue._store_events = lambda job_id, batch: (transactions.append(len(batch)), store_events(job_id, batch))
+
+    async def scenario():
+        await queue.start()
+        job = await queue.submit("simulate", {})
+        events = [event async for _, event in queue.events(job["id"])]
+        await queue.stop()
+        return events
+
+    events = asyncio.run(scenario())
+    assert [e["type"] for e in events] == ["start"] + ["progress"] * 50 + ["result", "end"]
+    assert sum(transactions) == 53 and len(transactions) < 53
+    assert "responses" not in events[-2]["data"] and events[-2]["responsesOmitted"]
+
+    print("Test Passed!")
+
+def test_claim_skips_jobs_taken_by_another_process():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    queue = JobQueue(lambda kind, payload: None, engine=engine)
+    first = queue._insert("simulate", {}, 0)
+    second = queue._insert("simulate", {}, 0)
+    raced = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def rival_claims_first(conn, cursor, statement, parameters, context, executemany):
+        # Another process claims the first job between the select and the update
+        if statement.startswith("UPDATE jobs") and not raced:
+            raced.append(True)
+            cursor.execute("UPDATE jobs SET status = 'running', owner = 'rival' WHERE id = ?", (first["id"],))
+
+    claimed = queue._claim_next()
+    assert raced and claimed["id"] == second["id"]
+    assert queue._claim_next() is None
+    assert queue.get(first["id"])["status"] == "running"
+
+    print("Test Passed!")
+
+if __name__ == "__main__":
+    test_priority_cancel_and_replay()
+    test_stale_jobs_and_event_retention()
+    test_events_are_batched_without_duplicate_responses()
+    test_claim_skips_jobs_taken_by_another_process()
@@ -0,0 +1,122 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from llm_pool import CLOSED, OPEN, Endpoint, LLMPool, PooledLLM, AsyncPooledLLM
+from llm_scheduler import LLMScheduler
+
+def start_server(delay: float = 0.0):
+    """Stand-in LLM server answering chat completions with its own port number"""
+    state = {"delay": delay, "fail": False, "requests": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, like a real inference server
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            state["requests"] += 1
+            time.sleep(state["delay"])
+            if state["fail"]:
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = json.dumps({
+                "id": "test", "object": "chat.completion", "created": 0, "model": "test",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": str(self.server.server_port)}}]
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 64
+
+    server = Server(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+def url(server) -> str:
+    return f"http://127.0.0.1:{server.server_port}/v1"
+
+def unlimited() -> LLMScheduler:
+    return LLMScheduler(max_in_flight=100, rate_limit="", token_rate_limit="")
+
+def test_least_loaded_routing():
+    fast, _ = start_server(0.01)
+    slow, _ = start_server(0.1)
+    pool = LLMPool([Endpoint(url(fast)), Endpoint(url(slow))])
+    llm = PooledLLM(pool, unlimited())
+
+    with ThreadPoolExecutor(4) as executor:
+        answers = list(executor.map(llm.predict, ["prompt"] * 60))
+
+    # The faster server answers most requests, the slow one still gets some
+    served_by_fast = answers.count(str(fast.server_port))
+    assert served_by_fast > 40
+    assert served_by_fast < 60
+    assert pool.endpoints[0].latency < pool.endpoints[1].latency
+    for server in (fast, slow):
+        server.shutdown()
+
+    print("Test Passed!")
+
+def test_circuit_opens_and_recovers():
+    healthy, _ = start_server(0.01)
+    flaky, flaky_state = start_server()
+    flaky_state["fail"] = True
+    pool = LLMPool([Endpoint(url(healthy)), Endpoint(url(flaky))], failure_threshold=2, reset_timeout=0.3)
+    llm = PooledLLM(pool, unlimited())
+
+    # Failed requests fail over, so callers only see the healthy server
+    with ThreadPoolExecutor(4) as executor:
+        assert set(executor.map(llm.predict, ["prompt"] * 20)) == {str(healthy.server_port)}
+    assert pool.endpoints[1].state == OPEN
+    failed_requests = flaky_state["requests"]
+    for _ in range(10):
+        llm.predict("prompt")
+    assert flaky_state["requests"] == failed_requests
+
+    # After the reset timeout a single probe brings the recovered server back
+    flaky_state["fail"] = False
+    time.sleep(0.35)
+    with ThreadPoolExecutor(4) as executor:
+        answers = set(executor.map(llm.predict, ["prompt"] * 20))
+    assert pool.endpoints[1].state == CLOSED
+    assert str(flaky.server_port) in answers
+    for server in (healthy, flaky):
+        server.shutdown()
+
+    print("Test Passed!")
+
+def test_async_failover():
+    healthy, _ = start_server(0.01)
+    down, down_state = start_server()
+    down_state["fail"] = True
+    pool = LLMPool([Endpoint(url(down)), Endpoint(url(healthy))], failure_threshold=100)
+    llm = AsyncPooledLLM(pool, unlimited())
+
+    async def predict_all():
+        return await asyncio.gather(*[llm.predict("prompt") for _ in range(10)])
+
+    assert set(asyncio.run(predict_all())) == {str(healthy.server_port)}
+    assert down_state["requests"] > 0
+    assert pool.endpoints[0].in_flight == pool.endpoints[1].in_flight == 0
+    for server in (healthy, down):
+        server.shutdown()
+
+    print("Test Passed!")
+
+if __name__ == "__main__":
+    test_least_loaded_routing()
+    test_circuit_opens_and_recovers()
+    test_async_failover()
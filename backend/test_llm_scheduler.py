@@ -0,0 +1,68 @@
+import asyncio
+import threading
+import time
+from llm_scheduler import LLMScheduler, TokenBucket, current_run, parse_rate
+
+def test_parse_rate():
+    assert parse_rate("100/minute") == (100, 60)
+    assert parse_rate("5/seconds") == (5, 1)
+    assert parse_rate("") is None
+    assert parse_rate("0/minute") is None
+
+def test_in_flight_limit_and_fair_order():
+    scheduler = LLMScheduler(max_in_flight=2, rate_limit="", token_rate_limit="")
+    order = []
+    peak = [0]
+    active = [0]
+
+    async def call(run: str, i: int):
+        current_run.set(run)
+        async with scheduler.aslot():
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            order.append(run)
+            await asyncio.sleep(0.01)
+            active[0] -= 1
+
+    async def scenario():
+        # The big run queues first; the small one still gets every other slot
+        big = [asyncio.create_task(call("big", i)) for i in range(10)]
+        await asyncio.sleep(0)
+        small = [asyncio.create_task(call("small", i)) for i in range(3)]
+        await asyncio.gather(*big, *small)
+
+    asyncio.run(scenario())
+    assert peak[0] == 2
+    assert order.index("small") <= 3
+    assert order[-1] == "big"
+    stats = scheduler.stats()
+    assert stats["granted"] == 13 and stats["inFlight"] == 0 and stats["queued"] == 0
+
+    print("Test Passed!")
+
+def test_rate_limit_across_threads():
+    scheduler = LLMScheduler(max_in_flight=10, rate_limit="20/second", token_rate_limit="")
+    scheduler._requests = TokenBucket(20, 5)  # Burst of 5, then 20 per second
+    granted = []
+
+    def call():
+        with scheduler.slot():
+            granted.append(time.monotonic())
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=call) for _ in range(15)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # 5 immediately, the other 10 at 20 per second
+    assert time.monotonic() - started >= 0.45
+    assert scheduler.stats()["rateLimited"] > 0
+
+    print("Test Passed!")
+
+if __name__ == "__main__":
+    test_parse_rate()
+    test_in_flight_limit_and_fair_order()
+    test_rate_limit_across_threads()
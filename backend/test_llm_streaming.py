@@ -0,0 +1,114 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import llm_scheduler
+from llm_scheduler import LLMScheduler
+from llm_cache import LLMCache
+from llm_service import BaseLLM, OpenAILLM
+from llm_streaming import JSONObjectScanner, LatencyStats, PhaseTimer, latency_stats
+from models import EmailDraft
+from profiles import _generate_random_personas
+from simulation import Simulator
+from test_concurrency import fixed_personas
+
+def test_scanner_finds_first_object():
+    scanner = JSONObjectScanner()
+    pieces = ['Sure! ```json\n{"action": "op', 'ened", "reason": "a } in {text", "n": {"x": "\\"}"}', '}\n``` Hope this helps {']
+    results = [scanner.feed(piece) for piece in pieces]
+    assert results[:2] == [None, None]
+    assert json.loads(results[2]) == {"action": "opened", "reason": "a } in {text", "n": {"x": '"}'}}
+
+    # Balanced braces that are not JSON are skipped
+    scanner = JSONObjectScanner()
+    assert scanner.feed('Format: {action} -> {"action": "spam"}') == '{"action": "spam"}'
+
+def start_streaming_server(answer: str, rambling_chunks: int, delay: float):
+    """Stand-in LLM server that streams the answer, then keeps generating filler"""
+    sent = {"chunks": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            pieces = [answer[i:i + 8] for i in range(0, len(answer), 8)]
+            pieces += [" and some more thoughts"] * rambling_chunks
+            try:
+                for piece in pieces:
+                    chunk = {"id": "test", "object": "chat.completion.chunk", "created": 0, "model": "test",
+                             "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                    sent["chunks"] += 1
+                    time.sleep(delay)
+                self.wfile.write(b"data: [DONE]\n\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # The client stopped reading
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, sent
+
+def test_streaming_stops_after_json():
+    answer = json.dumps({"action": "opened", "reason": "Relevant subject"})
+    server, sent = start_streaming_server(answer, rambling_chunks=40, delay=0.02)
+    original = llm_scheduler._scheduler
+    llm_scheduler._scheduler = LLMScheduler(max_in_flight=10, rate_limit="", token_rate_limit="")
+    try:
+        llm = OpenAILLM(base_url=f"http://127.0.0.1:{server.server_port}/v1")
+        llm.streaming = True
+        stopped_before = latency_stats.stopped_early
+        started = time.time()
+        result = llm.predict("prompt")
+        elapsed = time.time() - started
+    finally:
+        llm_scheduler._scheduler = original
+        time.sleep(0.1)
+        server.shutdown()
+
+    assert json.loads(result) == json.loads(answer)
+    # The filler would take another 0.8s to arrive
+    assert elapsed < 0.5
+    assert sent["chunks"] < 20
+    assert latency_stats.stopped_early == stopped_before + 1
+    assert latency_stats.to_dict()["phases"]["jsonComplete"]["count"] > 0
+
+    print("Test Passed!")
+
+def test_latency_by_simulation_step():
+    stats = LatencyStats()
+
+    class TimedLLM(BaseLLM):
+        """Times each call the way _complete does, without a server"""
+        def predict(self, prompt: str) -> str:
+            PhaseTimer(stats).done()
+            if "Email Subject" in prompt:
+                return json.dumps({"action": "opened", "reason": "r"})
+            if "Email Marketing expert" in prompt:
+                return "{}"
+            return json.dumps({"final_action": "clicked", "internal_monologue": "m"})
+
+    llm = TimedLLM()
+    draft = EmailDraft(subject="s", body="b", cta="c", audience="Tech", sample_size=4)
+    with fixed_personas(_generate_random_personas(4)):
+        list(Simulator(llm=llm, cache=LLMCache()).run_simulation_stream(draft))
+
+    # The step set on the event loop reaches the executor thread the sync client runs on
+    by_prompt = stats.to_dict()["byPrompt"]
+    assert {step: phases["total"]["count"] for step, phases in by_prompt.items()} == \
+        {"inboxScan": 4, "takeAction": 4, "insights": 1}
+    assert stats.to_dict()["phases"]["total"]["count"] == 9
+    PhaseTimer(stats).done()  # Outside a simulation: only the overall phases
+    assert stats.to_dict()["phases"]["total"]["count"] == 10 and len(stats.to_dict()["byPrompt"]) == 3
+
+    print("Test Passed!")
+
+if __name__ == "__main__":
+    test_scanner_finds_first_object()
+    test_streaming_stops_after_json()
+    test_latency_by_simulation_step()
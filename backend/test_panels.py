@@ -0,0 +1,74 @@
+from collections import Counter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from database import Base, AudienceModel, PanelModel, PersonaModel, register_sqlite_functions
+import panels
+from panels import PanelAudienceMismatchError, _draw_panel, load_panel_personas
+
+ROLES = ["CTO", "CTO", "CTO", "CEO"]
+
+def _session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    register_sqlite_functions(engine)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    db = session_factory()
+    db.add_all([AudienceModel(id=1, name="a", revision=1), AudienceModel(id=2, name="b", revision=1)])
+    db.add_all([
+        PersonaModel(id=f"p{i:03d}", audience_id=1 if i < 200 else 2, name=f"name {i}", role=ROLES[i % 4],
+                     company="Acme (SaaS)", avatar="", psychographics="", past_behavior="")
+        for i in range(240)
+    ])
+    db.commit()
+    db.close()
+    return session_factory
+
+def test_draw_is_deterministic_and_stratified():
+    db = _session_factory()()
+
+    first = _draw_panel(db, 1, 40, 7, "role")
+    assert first == _draw_panel(db, 1, 40, 7, "role")
+    assert first != _draw_panel(db, 1, 40, 8, "role")
+    assert len(set(first)) == 40 and all(int(pid[1:]) < 200 for pid in first)
+    roles = Counter(db.query(PersonaModel.role).filter(PersonaModel.id == pid).scalar() for pid in first)
+    assert roles == {"CTO": 30, "CEO": 10}
+    assert len(_draw_panel(db, 2, 100, 0, None)) == 40
+    db.close()
+
+    print("Test Passed!")
+
+def test_panel_audience_and_cache_revision():
+    session_factory = _session_factory()
+    db = session_factory()
+    db.add(PanelModel(id="pnl_test", audience_id=1, size=2, seed=0, persona_ids=["p001", "p000"], created_at=0))
+    db.commit()
+
+    original = panels.SessionLocal
+    panels.SessionLocal = session_factory
+    panels._panel_cache.clear()
+    try:
+        assert [p.id for p in load_panel_personas("pnl_test", "1")] == ["p001", "p000"]
+        try:
+            load_panel_personas("pnl_test", "2")
+            assert False, "expected PanelAudienceMismatchError"
+        except PanelAudienceMismatchError:
+            pass
+
+        db.query(PersonaModel).filter(PersonaModel.id == "p001").update({PersonaModel.name: "renamed"})
+        db.commit()
+        assert load_panel_personas("pnl_test")[0].name == "name 1"  # Cached
+        # Writing the audience again (populate_db) bumps its revision
+        db.query(AudienceModel).filter(AudienceModel.id == 1).update({AudienceModel.revision: 2})
+        db.commit()
+        assert load_panel_personas("pnl_test")[0].name == "renamed"
+    finally:
+        panels.SessionLocal = original
+        panels._panel_cache.clear()
+        db.close()
+
+    print("Test Passed!")
+
+if __name__ == "__main__":
+    test_draw_is_deterministic_and_stratified()
+    test_panel_audience_and_cache_revision()
@@ -0,0 +1,98 @@
+import asyncio
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+from database import Base, SimulationModel, ResponseModel
+from models import EmailDraft
+from persistence import SimulationWriter, mark_interrupted
+
+def _response(persona_id: str) -> dict:
+    return {
+        "persona": {"id": persona_id},
+        "action": "opened",
+        "sentiment": "neutral",
+        "comment": "ok",
+        "detailedReasoning": "test",
+        "decisionSource": "llm",
+        "weight": 1.0
+    }
+
+def _writer():
+    # In-memory SQLite lives in one connection; StaticPool shares it with the writer thread
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    return engine, SimulationWriter(engine=engine, max_queue=8, batch_size=4)
+
+def test_incremental_and_failed_runs():
+    engine, writer = _writer()
+    draft = EmailDraft(subject="S", body="B", cta="C", audience="1")
+
+    writer.begin("done", draft)
+    for i in range(20):  # More than the queue holds: producers wait for the writer
+        writer.add_response("done", _response(str(i)))
+    writer.finish("done", {"timestamp": 1, "metrics": {"openRate": 100}, "insights": []})
+
+    writer.begin("crashed", draft)
+    writer.add_response("crashed", _response("a"))
+    writer.fail("crashed", "boom")
+
+    writer.begin("running", draft)
+    writer.begin("done", draft)  # Duplicate id: fails alone, the rest is written
+    writer.stop()
+
+    with engine.connect() as conn:
+        sims = {r.id: r for r in conn.execute(SimulationModel.__table__.select())}
+        counts = {}
+        for r in conn.execute(ResponseModel.__table__.select()):
+            counts[r.simulation_id] = counts.get(r.simulation_id, 0) + 1
+
+    assert sims["done"].status == "completed" and sims["done"].metrics == {"openRate": 100}
+    assert counts["done"] == 20
+    assert sims["crashed"].status == "failed" and sims["crashed"].error == "boom"
+    assert counts["crashed"] == 1
+    assert writer.stats()["failed"] == 1
+
+    # Runs of the current process are still in progress; only the others' were interrupted
+    assert mark_interrupted(engine, owner=writer.owner) == 0
+    assert mark_interrupted(engine, owner="next-process") == 1
+    with engine.connect() as conn:
+        status = conn.execute(
+            SimulationModel.__table__.select().where(SimulationModel.__table__.c.id == "running")
+        ).first().status
+    assert status == "interrupted"
+
+    print("Test Passed!")
+
+def test_put_async_waits_off_the_loop():
+    engine, writer = _writer()
+    draft = EmailDraft(subject="S", body="B", cta="C", audience="1")
+
+    async def produce():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        ticker = asyncio.create_task(tick())
+        await writer.put_async("begin", "run", draft)
+        for i in range(50):  # The queue holds 8: puts beyond that wait in a thread
+            await writer.put_async("add_response", "run", _response(str(i)))
+        await writer.put_async("fail", "run", "stopped", status="cancelled")
+        ticker.cancel()
+        return ticks
+
+    assert asyncio.run(produce()) > 0
+    writer.stop()
+    with engine.connect() as conn:
+        sim = conn.execute(SimulationModel.__table__.select()).first()
+        responses = conn.execute(ResponseModel.__table__.select()).all()
+    assert sim.status == "cancelled" and sim.error == "stopped"
+    assert len(responses) == 50
+
+    print("Test Passed!")
+
+if __name__ == "__main__":
+    test_incremental_and_failed_runs()
+    test_put_async_waits_off_the_loop()
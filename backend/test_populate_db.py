@@ -0,0 +1,88 @@
+import csv
+import json
+import os
+import tempfile
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from backend.database import Base, AudienceModel, PersonaModel
+from backend.populate_db import PersonaImportError, _record_to_row, import_audience
+
+def _session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)()
+
+def _write(directory: str, name: str, records: list) -> str:
+    path = os.path.join(directory, name)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if name.endswith(".csv"):
+            writer = csv.DictWriter(f, fieldnames=["id", "name", "role", "company", "past_behavior"])
+            writer.writeheader()
+            writer.writerows(records)
+        else:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return path
+
+def test_import_csv_and_jsonl():
+    db = _session()
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = _write(directory, "crm.csv", [
+            {"id": "c1", "name": "Anna", "role": "CTO", "company": "Acme", "past_behavior": "opens"},
+            {"id": "c2", "name": "Boris", "role": "", "company": "Acme", "past_behavior": ""},  # No role: skipped
+            {"id": "c3", "name": "Vera", "role": "CMO", "company": "Beta", "past_behavior": ""}
+        ])
+        jsonl_path = _write(directory, "leads.jsonl", [
+            {"name": "Gleb", "role": "Founder", "pastBehavior": "replies"},
+            {"id": "j2", "name": "Dina", "role": "CEO"}
+        ])
+        csv_audience = import_audience(db, csv_path, chunk_size=1)
+        jsonl_audience = import_audience(db, jsonl_path)
+
+        assert db.query(AudienceModel).get(csv_audience).name == "crm"
+        assert sorted(p.id for p in db.query(PersonaModel).filter_by(audience_id=csv_audience)) == ["c1", "c3"]
+        leads = db.query(PersonaModel).filter_by(audience_id=jsonl_audience).all()
+        assert len(leads) == 2
+        assert {p.past_behavior for p in leads} == {"replies", ""}
+
+        # Importing the same export again writes nothing, not even the audience
+        audiences = db.query(AudienceModel).count()
+        try:
+            import_audience(db, csv_path)
+            assert False, "re-import should fail"
+        except PersonaImportError as e:
+            assert "already exists" in str(e)
+        assert db.query(AudienceModel).count() == audiences
+        assert db.query(PersonaModel).count() == 4
+
+        # Appending to an audience bumps its revision, so servers reload cached panels
+        revision = db.query(AudienceModel.revision).filter_by(id=jsonl_audience).scalar()
+        import_audience(db, _write(directory, "more.jsonl", [{"name": "Egor", "role": "CTO"}]), audience_id=jsonl_audience)
+        assert db.query(AudienceModel.revision).filter_by(id=jsonl_audience).scalar() == revision + 1
+
+    print("Test Passed!")
+
+def test_import_rejects_duplicate_ids():
+    db = _session()
+    with tempfile.TemporaryDirectory() as directory:
+        path = _write(directory, "dupes.jsonl", [
+            {"id": "x", "role": "CTO"}, {"id": "y", "role": "CTO"}, {"id": "x", "role": "CMO"}
+        ])
+        try:
+            # The duplicate is in a later chunk than the first rows written
+            import_audience(db, path, chunk_size=2)
+            assert False, "duplicate ids should fail"
+        except PersonaImportError as e:
+            assert "'x'" in str(e)
+    assert db.query(AudienceModel).count() == 0
+    assert db.query(PersonaModel).count() == 0
+
+    record = {"role": "CTO", "pastBehavior": "opens"}
+    _record_to_row(record, 1)
+    assert record == {"role": "CTO", "pastBehavior": "opens"}
+
+    print("Test Passed!")
+
+if __name__ == "__main__":
+    test_import_csv_and_jsonl()
+    test_import_rejects_duplicate_ids()
@@ -0,0 +1,65 @@
+from pydantic import ValidationError
+from llm_cache import LLMCache
+from llm_service import BaseLLM
+from models import EmailDraft, Persona
+from simulation import Simulator
+
+class UnusedLLM(BaseLLM):
+    def predict(self, prompt: str) -> str:
+        raise AssertionError("pre-screen tests make no LLM calls")
+
+PERSONA = Persona(
+    id="p1", name="Alex", role="CTO", company="Acme", avatar="", psychographics="Skeptical", pastBehavior="None"
+)
+
+def _draft(**kwargs) -> EmailDraft:
+    return EmailDraft(subject="s", body="b", cta="c", audience="Tech", prescreen=True, **kwargs)
+
+def test_prescreen_bands():
+    simulator = Simulator(llm=UnusedLLM(), cache=LLMCache())
+    simulator.embedding_service.use_fallback = False
+    draft = _draft(prescreen_low=0.2, prescreen_high=0.6, prescreen_high_to_llm=False)
+
+    low = simulator._prescreen(draft, PERSONA, 0.1)
+    assert low.action == "ignored" and low.decisionSource == "prescreen"
+    assert simulator._prescreen(draft, PERSONA, 0.2) is None  # The uncertain band goes to the LLM
+    assert simulator._prescreen(draft, PERSONA, 0.59) is None
+    high = simulator._prescreen(draft, PERSONA, 0.6)
+    assert high.action == "opened" and high.decisionSource == "prescreen"
+
+    # The top band reaches the LLM when prescreen_high_to_llm is set
+    assert simulator._prescreen(_draft(prescreen_low=0.2, prescreen_high=0.6), PERSONA, 0.9) is None
+    assert simulator._prescreen(draft.model_copy(update={"prescreen": False}), PERSONA, 0.1) is None
+
+    print("Test Passed!")
+
+def test_prescreen_keyword_fallback():
+    simulator = Simulator(llm=UnusedLLM(), cache=LLMCache())
+    simulator.embedding_service.use_fallback = True
+
+    # Keyword overlap scores are far below the default thresholds: nobody is pre-screened
+    assert simulator._prescreen(_draft(prescreen_high_to_llm=False), PERSONA, 0.05) is None
+    # Explicit thresholds still apply
+    assert simulator._prescreen(_draft(prescreen_low=0.02), PERSONA, 0.01).action == "ignored"
+
+    print("Test Passed!")
+
+def test_prescreen_band_validation():
+    try:
+        _draft(prescreen_low=0.7, prescreen_high=0.3)
+        assert False, "expected ValidationError"
+    except ValidationError:
+        pass
+    try:
+        _draft(prescreen_low=0.9)  # Above the default high threshold
+        assert False, "expected ValidationError"
+    except ValidationError:
+        pass
+    _draft(prescreen_low=0.5, prescreen_high=0.5)
+
+    print("Test Passed!")
+
+if __name__ == "__main__":
+    test_prescreen_bands()
+    test_prescreen_keyword_fallback()
+    test_prescreen_band_validation()
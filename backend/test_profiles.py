@@ -0,0 +1,51 @@
+from collections import Counter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database import Base, PersonaModel
+from profiles import INDUSTRY, industry_of, _sample_by_ids, _sample_stratified_by_industry
+
+COMPANIES = [
+    "Acme (FinTech)", "Beta (FinTech)", "Gamma (SaaS)", "Delta (Group) (EdTech)",
+    "No suffix", "Broken (SaaS", "Empty ()", None
+]
+
+def _session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all([
+        PersonaModel(id=f"p{i}", audience_id=1 if i < 80 else 2, name="n", role="CTO", company=COMPANIES[i % len(COMPANIES)],
+                     avatar="", psychographics="", past_behavior="")
+        for i in range(100)
+    ])
+    db.commit()
+    return db
+
+def test_sql_industry_matches_industry_of():
+    db = _session()
+    for company, industry in db.query(PersonaModel.company, INDUSTRY).distinct():
+        assert industry == industry_of(company), company
+    db.close()
+
+    print("Test Passed!")
+
+def test_sampling_in_the_database():
+    db = _session()
+
+    rows = _sample_by_ids(db, 1, 10)
+    assert len({r.id for r in rows}) == 10
+    assert all(int(r.id[1:]) < 80 for r in rows)
+
+    # 80 personas over 6 industries: FinTech is a quarter of the audience
+    rows = _sample_stratified_by_industry(db, 1, 20)
+    counts = Counter(industry_of(r.company) for r in rows)
+    assert len(rows) == 20 and len({r.id for r in rows}) == 20
+    assert counts["FinTech"] == 5 and counts["Other"] == 7
+    assert len(_sample_stratified_by_industry(db, 2, 1000)) == 20
+    db.close()
+
+    print("Test Passed!")
+
+if __name__ == "__main__":
+    test_sql_industry_matches_industry_of()
+    test_sampling_in_the_database()
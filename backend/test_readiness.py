@@ -0,0 +1,100 @@
+import asyncio
+import threading
+import time
+from fastapi.testclient import TestClient
+import main
+
+class FakeSimulator:
+    created = 0
+
+    def __init__(self):
+        FakeSimulator.created += 1
+        time.sleep(0.05)  # Give concurrent callers a chance to race the construction
+        self.warmed = False
+
+    def warm_up(self):
+        self.warmed = True
+
+class BrokenSimulator(FakeSimulator):
+    def warm_up(self):
+        raise RuntimeError("model download failed")
+
+def _reset(simulator_class):
+    main.Simulator = simulator_class
+    main.simulator = None
+    main._warmup_task = None
+    main.readiness.update(ready=False, error=None, startedAt=time.time(), readyAt=None)
+
+def _restore(saved):
+    main.Simulator, main.simulator, main._warmup_task = saved[:3]
+    main.readiness.clear()
+    main.readiness.update(saved[3])
+
+def test_simulator_is_built_once():
+    saved = (main.Simulator, main.simulator, main._warmup_task, dict(main.readiness))
+    try:
+        _reset(FakeSimulator)
+        FakeSimulator.created = 0
+        simulators = []
+        threads = [threading.Thread(target=lambda: simulators.append(main.get_simulator())) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert FakeSimulator.created == 1 and all(s is simulators[0] for s in simulators)
+    finally:
+        _restore(saved)
+
+    print("Test Passed!")
+
+def test_warm_up_and_readiness():
+    saved = (main.Simulator, main.simulator, main._warmup_task, dict(main.readiness))
+    # No lifespan: warm-up is driven by hand
+    client = TestClient(main.app)
+    try:
+        _reset(FakeSimulator)
+        response = client.get("/health/ready")
+        assert response.status_code == 503 and response.json()["status"] == "starting"
+
+        async def first_request():
+            # A request arriving during the warm-up waits for it
+            main._warmup_task = asyncio.create_task(asyncio.to_thread(main._warm_up))
+            return await main.ensure_simulator()
+
+        simulator = asyncio.run(first_request())
+        assert simulator.warmed and main.readiness["ready"]
+        assert main.readiness["readyAt"] >= main.readiness["startedAt"]
+        response = client.get("/health/ready")
+        assert response.status_code == 200 and response.json()["warmupSeconds"] >= 0
+
+        _reset(BrokenSimulator)
+        main._warm_up()
+        response = client.get("/health/ready")
+        assert response.status_code == 503
+        assert response.json() == {"status": "error", "error": "model download failed"}
+    finally:
+        _restore(saved)
+
+    print("Test Passed!")
+
+class LockedQueue:
+    def stats(self):
+        raise AssertionError("liveness must not query the job database")
+
+def test_liveness_is_trivial():
+    original = main.job_queue
+    main.job_queue = LockedQueue()
+    client = TestClient(main.app)
+    try:
+        response = client.get("/health")
+        assert response.status_code == 200 and response.json()["status"] == "ok"
+        assert set(response.json()) == {"status", "ready"}
+    finally:
+        main.job_queue = original
+
+    print("Test Passed!")
+
+if __name__ == "__main__":
+    test_simulator_is_built_once()
+    test_warm_up_and_readiness()
+    test_liveness_is_trivial()
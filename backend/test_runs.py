@@ -0,0 +1,118 @@
+import asyncio
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from database import Base
+from ids import new_id
+from models import EmailDraft
+from persistence import SimulationWriter
+from runs import RunRegistry, IdempotencyConflictError, fingerprint
+
+def test_ids_are_unique_and_sorted():
+    ids = [new_id() for _ in range(10000)]
+    assert len(set(ids)) == len(ids)
+    assert ids == sorted(ids)
+    assert all(len(i) == 26 for i in ids)
+
+def test_retries_attach_to_one_run():
+    started = []
+
+    async def make_stream():
+        started.append(1)
+        yield {"type": "start", "id": "x"}
+        for i in range(3):
+            await asyncio.sleep(0.01)
+            yield {"type": "progress", "current": i + 1}
+        yield {"type": "result", "data": {"id": "x"}}
+
+    async def collect(stream):
+        return [event["type"] async for event in stream]
+
+    async def scenario():
+        registry = RunRegistry()
+        run = registry.start("key", "fp", make_stream)
+        await asyncio.sleep(0.015)
+        # A retry while the run is in flight replays the start and follows it
+        first, second = await asyncio.gather(collect(run.follow()), collect(registry.get("key", "fp").follow()))
+        # After completion only the outcome is replayed
+        third = await collect(registry.get("key", "fp").follow())
+        try:
+            registry.get("key", "other")
+            conflict = False
+        except IdempotencyConflictError:
+            conflict = True
+        return first, second, third, conflict
+
+    first, second, third, conflict = asyncio.run(scenario())
+    assert len(started) == 1
+    assert first == second == ["start", "progress", "progress", "progress", "result"]
+    assert third == ["start", "result"]
+    assert conflict
+
+    print("Test Passed!")
+
+def test_abandoned_run_is_cancelled():
+    produced = []
+
+    async def make_stream():
+        yield {"type": "start", "id": "x"}
+        for i in range(100):
+            await asyncio.sleep(0.01)
+            produced.append(i)
+            yield {"type": "progress", "current": i + 1}
+        yield {"type": "result", "data": {"id": "x"}}
+
+    async def scenario():
+        registry = RunRegistry()
+        run = registry.start("key", "fp", make_stream)
+        run.detach_grace = 0.05
+        follower = run.follow()
+        async for event in follower:
+            if event["type"] == "progress":
+                break
+        await follower.aclose()
+        await asyncio.sleep(0.2)
+        return run, registry.get("key", "fp")
+
+    run, retry = asyncio.run(scenario())
+    assert run.done and run.failed
+    assert run.events[-1][1]["type"] == "cancelled"
+    assert len(produced) < 100
+    # A cancelled run is not replayed; a retry starts over
+    assert retry is None
+
+    print("Test Passed!")
+
+def test_stored_run_compares_the_request_fingerprint():
+    import main
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    draft = EmailDraft(subject="S", body="B", cta="C", audience="Tech", sample_size=10)
+    writer = SimulationWriter(engine=engine)
+    writer.begin("sim", draft, "key-1", fingerprint(draft.dict()))
+    writer.finish("sim", {"timestamp": 1, "metrics": {}, "insights": []})
+    writer.stop()
+
+    session_factory = main.SessionLocal
+    main.SessionLocal = sessionmaker(bind=engine)
+    try:
+        assert main.load_completed_run("key-1", fingerprint(draft.dict()), draft)["id"] == "sim"
+        assert main.load_completed_run("key-2", fingerprint(draft.dict()), draft) is None
+        # Same subject, body, CTA and audience, but a different request
+        other = draft.model_copy(update={"sample_size": 50})
+        try:
+            main.load_completed_run("key-1", fingerprint(other.dict()), other)
+            assert False, "expected IdempotencyConflictError"
+        except IdempotencyConflictError:
+            pass
+    finally:
+        main.SessionLocal = session_factory
+
+    print("Test Passed!")
+
+if __name__ == "__main__":
+    test_ids_are_unique_and_sorted()
+    test_retries_attach_to_one_run()
+    test_abandoned_run_is_cancelled()
+    test_stored_run_compares_the_request_fingerprint()
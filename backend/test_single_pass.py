@@ -0,0 +1,65 @@
+import json
+from collections import Counter
+from llm_cache import LLMCache
+from llm_service import BaseLLM
+from models import EmailDraft, Persona
+from simulation import Simulator
+from test_concurrency import fixed_personas
+
+REPLIES = {
+    "clicker": {"action": "opened", "reason": "r", "internal_monologue": "Useful", "final_action": "clicked"},
+    "replier": {"action": "opened", "reason": "r", "internal_monologue": "m", "final_action": "Replied",
+                "reply_text": "Tell me more"},
+    "reader": {"action": "opened", "reason": "r", "internal_monologue": None, "final_action": None},
+    "no_cta": {"action": "opened", "reason": "r"},
+    # A CTA outcome without opening the email is not counted
+    "ignorer": {"action": "ignored", "reason": "Not for me", "final_action": "clicked"},
+    "spammer": {"action": "spam", "reason": "r", "final_action": None},
+    "broken": "Sorry, I cannot answer that",
+    "truncated": '{"action": "opened", "reason": "Looks rel'
+}
+
+class SinglePassLLM(BaseLLM):
+    """Answers each persona's combined prompt from REPLIES; counts the calls per persona"""
+    def __init__(self):
+        self.calls = Counter()
+
+    def predict(self, prompt: str) -> str:
+        if "Step 2" not in prompt:
+            return "{}"  # Insights
+        name = prompt.split(",")[0].split("You are ")[1]
+        self.calls[name] += 1
+        reply = REPLIES[name]
+        return reply if isinstance(reply, str) else json.dumps(reply)
+
+def test_single_pass_decisions():
+    personas = [
+        Persona(id=name, name=name, role="CTO", company="Acme", avatar="", psychographics="p", pastBehavior="b")
+        for name in REPLIES
+    ]
+    draft = EmailDraft(subject="s", body="b", cta="c", audience="Tech", sample_size=len(personas),
+                       decision_mode="single_pass")
+    llm = SinglePassLLM()
+    with fixed_personas(personas):
+        events = list(Simulator(llm=llm, cache=LLMCache()).run_simulation_stream(draft))
+
+    # One LLM call per persona covers the inbox scan and the CTA
+    assert llm.calls == Counter({name: 1 for name in REPLIES})
+    responses = {r["persona"]["id"]: r for r in events[-1]["data"]["responses"]}
+    assert {pid: r["action"] for pid, r in responses.items()} == {
+        "clicker": "clicked", "replier": "replied", "reader": "opened", "no_cta": "opened",
+        "ignorer": "ignored", "spammer": "spam", "broken": "ignored",
+        "truncated": "ignored"
+    }
+    assert responses["replier"]["comment"] == "Tell me more"
+    assert responses["clicker"]["detailedReasoning"] == "Useful"
+    assert responses["ignorer"]["comment"] == "Not for me"
+    assert responses["broken"]["comment"] == responses["truncated"]["comment"] == "Unable to parse response"
+
+    metrics = events[-1]["data"]["metrics"]
+    assert metrics["clickRate"] == 12 and metrics["openRate"] == 25 and metrics["spamRate"] == 12
+
+    print("Test Passed!")
+
+if __name__ == "__main__":
+    test_single_pass_decisions()
@@ -0,0 +1,52 @@
+import math
+from stats import wilson_interval, paired_comparison
+
+def test_wilson_interval():
+    low, high = wilson_interval(5, 10)
+    assert math.isclose(low, 0.2366, abs_tol=1e-4) and math.isclose(high, 0.7634, abs_tol=1e-4)
+
+    # Stays inside 0..1 at the edges, where the normal approximation collapses to a point
+    low, high = wilson_interval(0, 10)
+    assert low == 0.0 and math.isclose(high, 0.2775, abs_tol=1e-4)
+    low, high = wilson_interval(10, 10)
+    assert math.isclose(low, 0.7225, abs_tol=1e-4) and math.isclose(high, 1.0)
+
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+    # Narrows as n grows; weighted (fractional) counts are accepted
+    assert wilson_interval(50, 100)[1] - wilson_interval(50, 100)[0] < high - low
+    low, high = wilson_interval(2.5, 7.5)
+    assert 0.0 < low < 1 / 3 < high < 1.0
+
+    print("Test Passed!")
+
+def _pairs(both: int, baseline_only: int, variant_only: int, neither: int):
+    """Outcome lists for a 2x2 contingency table of paired results"""
+    baseline = [True] * (both + baseline_only) + [False] * (variant_only + neither)
+    variant = [True] * both + [False] * baseline_only + [True] * variant_only + [False] * neither
+    return baseline, variant
+
+def test_paired_comparison():
+    # 10 discordant pairs: exact binomial test, P(X <= 2 | 10, 0.5) = 56/1024, doubled.
+    # Difference 6/50; SE = sqrt(10 - 6^2/50) / 50.
+    result = paired_comparison(*_pairs(10, 2, 8, 30))
+    assert result == {"difference": 12.0, "low": 0.1, "high": 23.9, "pValue": 0.1094, "discordant": 10, "n": 50}
+
+    # 40 discordant pairs: continuity-corrected chi-square (|30 - 10| - 1)^2 / 40 = 9.025.
+    # SE = sqrt(40 - 20^2/100) / 100 = 0.06.
+    result = paired_comparison(*_pairs(0, 10, 30, 60))
+    assert result == {"difference": 20.0, "low": 8.2, "high": 31.8, "pValue": 0.0027, "discordant": 40, "n": 100}
+
+    # Swapping baseline and variant flips the difference, not the p-value
+    baseline, variant = _pairs(10, 2, 8, 30)
+    swapped = paired_comparison(variant, baseline)
+    assert swapped["difference"] == -12.0 and swapped["pValue"] == 0.1094
+
+    same = paired_comparison(*_pairs(5, 0, 0, 5))
+    assert same["difference"] == 0.0 and same["pValue"] == 1.0 and same["low"] == same["high"] == 0.0
+    assert paired_comparison([], [])["n"] == 0
+
+    print("Test Passed!")
+
+if __name__ == "__main__":
+    test_wilson_interval()
+    test_paired_comparison()
@@ -10,19 +10,22 @@ interface Audience {
   type: string;
   size: number;
   lastUpdated: string;
-  personas: any[];
 }
 
+const PERSONA_PAGE_SIZE = 50;
+
 export function Audiences() {
   const [audiences, setAudiences] = useState<Audience[]>([]);
   const [loading, setLoading] = useState(true);
   const [selectedAudience, setSelectedAudience] = useState<Audience | null>(null);
   const [selectedPersona, setSelectedPersona] = useState<any>(null);
+  const [personas, setPersonas] = useState<any[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [isCreateModalOpen, setIsCreateModalOpen] = useState(false);
   const [newAudienceName, setNewAudienceName] = useState('');
 
   useEffect(() => {
-    fetch('http://localhost:8000/api/audiences')
+    fetch('http://localhost:8000/api/audiences/summary')
       .then(res => res.json())
       .then(data => {
         setAudiences(data);
@@ -34,6 +37,25 @@ export function Audiences() {
       });
   }, []);
 
+  const loadPersonas = (audienceId: number, cursor: string | null) => {
+    const params = new URLSearchParams({ limit: String(PERSONA_PAGE_SIZE) });
+    if (cursor) params.set('cursor', cursor);
+    fetch(`http://localhost:8000/api/audiences/${audienceId}/personas?${params}`)
+      .then(res => res.json())
+      .then(data => {
+        setPersonas(prev => cursor ? [...prev, ...data.items] : data.items);
+        setNextCursor(data.nextCursor);
+      })
+      .catch(err => console.error("Failed to fetch personas:", err));
+  };
+
+  const openAudience = (audience: Audience) => {
+    setSelectedAudience(audience);
+    setPersonas([]);
+    setNextCursor(null);
+    loadPersonas(audience.id, null);
+  };
+
   const handleCreateAudience = () => {
     // TODO: Implement create API
     if (newAudienceName) {
@@ -76,7 +98,7 @@ export function Audiences() {
             {audiences.map((audience) => (
               <div
                 key={audience.id}
-                onClick={() => setSelectedAudience(audience)}
+                onClick={() => openAudience(audience)}
                 className="group flex items-center justify-between py-6 border-b border-border/40 cursor-pointer hover:opacity-60 transition-opacity"
               >
                 <div className="flex items-center gap-6">
@@ -183,7 +205,7 @@ export function Audiences() {
               <div className="py-4">
                 <h4 className="text-xs font-bold text-muted uppercase tracking-wider mb-6">Профили</h4>
                 <div className="space-y-2 max-h-[400px] overflow-y-auto pr-2 -mr-2">
-                  {selectedAudience?.personas.map((member: any) => (
+                  {personas.map((member: any) => (
                     <div
                       key={member.id}
                       onClick={() => setSelectedPersona(member)}
@@ -199,6 +221,15 @@ export function Audiences() {
                       </div>
                     </div>
                   ))}
+                  {nextCursor && selectedAudience && (
+                    <Button
+                      variant="ghost"
+                      onClick={() => loadPersonas(selectedAudience.id, nextCursor)}
+                      className="w-full hover:bg-transparent hover:text-foreground/70"
+                    >
+                      Показать ещё
+                    </Button>
+                  )}
                 </div>
               </div>
 
@@ -24,7 +24,7 @@ export function EmailEditor({ draft, setDraft, onSimulate, isSimulating, current
   const dropdownRef = useRef<HTMLDivElement>(null);
 
   useEffect(() => {
-    fetch('http://localhost:8000/api/audiences')
+    fetch('http://localhost:8000/api/audiences/summary')
       .then(res => res.json())
       .then(data => setAudiences(data))
       .catch(err => console.error("Failed to fetch audiences:", err));
@@ -12,10 +12,18 @@ interface HistoryItem {
   metrics: {
     openRate: number;
     clickRate: number;
-  };
+  } | null; // null until the run completes
   audience: string;
+  status?: 'running' | 'completed' | 'failed' | 'cancelled' | 'interrupted';
 }
 
+const STATUS_LABELS: Record<string, string> = {
+  running: 'Выполняется',
+  failed: 'Ошибка',
+  cancelled: 'Отменена',
+  interrupted: 'Прервана'
+};
+
 interface DetailedSimulationResult extends SimulationResult {
   subject: string;
   body: string;
@@ -24,6 +32,7 @@ interface DetailedSimulationResult extends SimulationResult {
 
 export function History() {
   const [history, setHistory] = useState<HistoryItem[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
   const [selectedResult, setSelectedResult] = useState<DetailedSimulationResult | null>(null);
   const [detailLoading, setDetailLoading] = useState(false);
@@ -38,9 +47,16 @@ export function History() {
 
   const fetchHistory = () => {
     fetch('http://localhost:8000/api/history')
-      .then(res => res.json())
-      .then(data => {
-        setHistory(data);
+      .then(async res => {
+        const data: HistoryItem[] = await res.json();
+        // Refresh the first page and keep older pages that were already loaded
+        setHistory(prev => {
+          if (data.length === 0) return data;
+          const oldest = data[data.length - 1];
+          const ids = new Set(data.map(item => item.id));
+          return [...data, ...prev.filter(item => !ids.has(item.id) && item.timestamp <= oldest.timestamp)];
+        });
+        setNextCursor(prev => prev ?? res.headers.get('X-Next-Cursor'));
         setLoading(false);
       })
       .catch(err => {
@@ -49,6 +65,20 @@ export function History() {
       });
   };
 
+  const fetchMore = () => {
+    if (!nextCursor) return;
+    fetch(`http://localhost:8000/api/history?cursor=${encodeURIComponent(nextCursor)}`)
+      .then(async res => {
+        const data: HistoryItem[] = await res.json();
+        setHistory(prev => {
+          const ids = new Set(prev.map(item => item.id));
+          return [...prev, ...data.filter(item => !ids.has(item.id))];
+        });
+        setNextCursor(res.headers.get('X-Next-Cursor'));
+      })
+      .catch(err => console.error("Failed to fetch history:", err));
+  };
+
   const handleClearHistory = async () => {
     if (!confirm('Вы уверены, что хотите очистить всю историю? Это действие нельзя отменить.')) {
       return;
@@ -58,6 +88,8 @@ export function History() {
       await fetch('http://localhost:8000/api/history', {
         method: 'DELETE',
       });
+      setHistory([]);
+      setNextCursor(null);
       fetchHistory();
     } catch (err) {
       console.error("Failed to clear history:", err);
@@ -67,7 +99,7 @@ export function History() {
 
   const handleViewResult = (id: string) => {
     setDetailLoading(true);
-    fetch(`http://localhost:8000/api/history/${id}`)
+    fetch(`http://localhost:8000/api/history/${id}?compact=true`)
       .then(res => res.json())
       .then(data => {
         setSelectedResult(data);
@@ -146,13 +178,22 @@ export function History() {
               <div className="flex items-center gap-12">
                 <div className="text-right hidden md:block">
                   <div className="text-xs font-bold text-muted uppercase tracking-wider mb-1">Open Rate</div>
-                  <div className="font-bold text-2xl text-foreground">{item.metrics.openRate}%</div>
+                  {item.metrics ? (
+                    <div className="font-bold text-2xl text-foreground">{item.metrics.openRate}%</div>
+                  ) : (
+                    <div className="text-sm text-muted-foreground">{STATUS_LABELS[item.status ?? ''] ?? '—'}</div>
+                  )}
                 </div>
                 <ArrowRight className="h-6 w-6 text-foreground opacity-0 group-hover:opacity-100 transition-opacity" />
               </div>
             </div>
           ))
         )}
+        {nextCursor && (
+          <Button variant="ghost" onClick={fetchMore} className="w-full mt-4 text-muted-foreground">
+            Показать ещё
+          </Button>
+        )}
       </div>
 
       <Dialog open={!!selectedResult || detailLoading} onOpenChange={() => setSelectedResult(null)}>
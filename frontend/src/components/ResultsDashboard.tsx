@@ -3,7 +3,7 @@ import { cn } from '../lib/utils';
 import { useState } from 'react';
 import { Dialog, DialogContent, DialogHeader, DialogTitle, DialogDescription } from './ui/dialog';
 import { generateMockResult } from '../lib/mockData';
-import type { SimulationResult } from '../types';
+import type { SimulationResult, SimulationResponse } from '../types';
 
 export function ResultsDashboard({ result: propResult }: { result?: SimulationResult | null }) {
   const [internalResult] = useState(() => generateMockResult({
@@ -16,6 +16,22 @@ export function ResultsDashboard({ result: propResult }: { result?: SimulationRe
   const result = propResult || internalResult;
   const [selectedPersona, setSelectedPersona] = useState<any>(null);
 
+  const selectResponse = (response: SimulationResponse) => {
+    setSelectedPersona(response);
+    // Compact history details leave out the reasoning; load it when it is shown
+    if (response.detailedReasoning === undefined && response.id !== undefined) {
+      fetch(`http://localhost:8000/api/history/${result.id}/responses/${response.id}`)
+        .then(res => res.json())
+        .then(data => {
+          // A copy: the response belongs to the result passed in by the parent
+          setSelectedPersona((current: any) =>
+            current === response ? { ...response, detailedReasoning: data.detailedReasoning } : current
+          );
+        })
+        .catch(err => console.error("Failed to fetch reasoning:", err));
+    }
+  };
+
   return (
     <div className="space-y-8 lg:space-y-12 animate-in fade-in duration-700 h-full flex flex-col">
       <div className="grid gap-8 lg:gap-12 grid-cols-2 lg:grid-cols-4 shrink-0">
@@ -46,7 +62,7 @@ export function ResultsDashboard({ result: propResult }: { result?: SimulationRe
           <h3 className="text-lg font-serif font-semibold mb-6 text-foreground">Реакции</h3>
           <div className="space-y-0 flex-1 overflow-y-auto max-h-[600px] pr-2">
             {result.responses.map((response, idx) => (
-              <ResponseItem key={idx} response={response} onClick={() => setSelectedPersona(response)} />
+              <ResponseItem key={idx} response={response} onClick={() => selectResponse(response)} />
             ))}
           </div>
         </div>
@@ -100,7 +116,7 @@ export function ResultsDashboard({ result: propResult }: { result?: SimulationRe
             <div>
               <h4 className="text-xs font-bold text-muted uppercase tracking-wider mb-2">Мысли</h4>
               <p className="text-lg text-foreground italic leading-relaxed">
-                "{selectedPersona?.detailedReasoning}"
+                "{selectedPersona?.detailedReasoning ?? '…'}"
               </p>
             </div>
           </div>
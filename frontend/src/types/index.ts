@@ -4,6 +4,20 @@ export interface EmailDraft {
   cta: string;
   audience: string;
   sample_size: number;
+  sampling?: 'random' | 'id_range' | 'stratified_role' | 'stratified_industry';
+  panel_id?: string;
+  decision_mode?: 'two_step' | 'single_pass';
+  prescreen?: boolean;
+  prescreen_low?: number;
+  prescreen_high?: number;
+  prescreen_high_to_llm?: boolean;
+  adaptive?: boolean;
+  target_metric?: 'openRate' | 'clickRate' | 'replyRate' | 'spamRate';
+  ci_width?: number;
+  max_sample_size?: number;
+  clustered?: boolean;
+  max_clusters?: number;
+  representatives_per_cluster?: number;
 }
 
 export interface Persona {
@@ -18,11 +32,14 @@ export interface Persona {
 }
 
 export interface SimulationResponse {
+  id?: number; // Set on responses loaded from history
   persona: Persona;
   action: 'opened' | 'ignored' | 'clicked' | 'spam' | 'replied';
   sentiment: 'positive' | 'neutral' | 'negative';
   comment: string;
-  detailedReasoning: string; // Why they took this action
+  detailedReasoning?: string; // Why they took this action (left out of compact history details)
+  decisionSource?: 'llm' | 'prescreen'; // 'prescreen' = decided without an LLM call
+  weight?: number; // Personas represented by this response (clustered mode)
 }
 
 export interface Insight {
@@ -39,6 +56,10 @@ export interface SimulationMetrics {
   ignoreRate: number;
   forwardRate: number;
   readRate: number; // Attentive reading
+  sampleSize?: number;
+  populationSize?: number;
+  confidenceLevel?: number;
+  intervals?: Record<string, { low: number; high: number }>; // Percent bounds per rate
 }
 
 export interface SimulationResult {